@@ -158,6 +158,12 @@ async def lifespan(app: FastAPI):
             except asyncio.CancelledError:
                 pass
         
+        try:
+            from core.billing.credits.usage_ledger import usage_ledger
+            await usage_ledger.close()
+        except Exception as e:
+            logger.warning(f"Failed to drain usage ledger: {e}")
+        
         try:
             logger.debug("Closing Redis connection")
             await redis.close()
@@ -204,7 +210,7 @@ async def rate_limit_middleware(request: Request, call_next):
         rate_limiter = auth_rate_limiter
     
     if rate_limiter:
-        is_limited, retry_after = rate_limiter.is_rate_limited(client_id)
+        is_limited, retry_after = await rate_limiter.check(client_id)
         if is_limited:
             logger.warning(f"Rate limited: {path} from {client_id[:8]}...")
             return JSONResponse(
@@ -381,6 +387,13 @@ async def worker_metrics_endpoint():
         logger.error(f"Failed to get worker metrics: {e}")
         raise HTTPException(status_code=500, detail="Failed to get worker metrics")
 
+@api_router.get("/metrics/prometheus", summary="Prometheus Metrics", operation_id="prometheus_metrics", tags=["system"])
+async def prometheus_metrics_endpoint():
+    """Agent run phase and tool timing histograms in Prometheus text format."""
+    from core.utils import timing
+    body, content_type = timing.render_latest()
+    return Response(content=body, media_type=content_type)
+
 @api_router.get("/metrics", summary="All Metrics", operation_id="all_metrics", tags=["system"])
 async def all_metrics_endpoint():
     """Get combined queue and worker metrics for monitoring."""
@@ -11,7 +11,8 @@ from core.utils.auth_utils import verify_and_get_user_id_from_jwt, get_user_id_f
 from core.utils.logger import logger, structlog
 from core.billing.credits.integration import billing_integration
 from core.utils.config import config, EnvMode
-from core.services import redis
+from core.services import redis, stream_envelope
+from core.services.stream_hub import stream_hub, parse_stream_id
 from core.sandbox.sandbox import create_sandbox, delete_sandbox, get_or_start_sandbox
 from core.utils.sandbox_utils import generate_unique_filename, get_uploads_directory
 from run_agent_background import run_agent_background
@@ -25,8 +26,9 @@ from . import core_utils as utils
 from .core_utils import (
     stop_agent_run_with_helpers as stop_agent_run,
     _get_version_service, generate_and_update_project_name,
-    check_agent_run_limit, check_project_count_limit
+    check_agent_run_limit, reserve_agent_run_slot, check_project_count_limit
 )
+from core.services.run_admission import run_admission
 
 router = APIRouter(tags=["agent-runs"])
 
@@ -169,7 +171,12 @@ async def _load_agent_config(client, agent_id: Optional[str], account_id: str, u
     return agent_config
 
 
-async def _check_billing_and_limits(client, account_id: str, model_name: Optional[str], check_project_limit: bool = False, check_thread_limit: bool = False):
+async def _check_billing_and_limits(client, account_id: str, model_name: Optional[str], check_project_limit: bool = False, check_thread_limit: bool = False, agent_run_id: Optional[str] = None):
+    """Raise HTTPException if the account may not start a run.
+
+    With `agent_run_id`, a concurrent run slot is reserved for it; the slot is
+    released again if any other check fails.
+    """
     import time
     from core.utils.limits_checker import check_thread_limit as _check_thread_limit
     t_start = time.time()
@@ -184,6 +191,8 @@ async def _check_billing_and_limits(client, account_id: str, model_name: Optiona
     async def check_agent_runs():
         if config.ENV_MODE == EnvMode.LOCAL:
             return {'can_start': True}
+        if agent_run_id:
+            return await reserve_agent_run_slot(client, account_id, agent_run_id)
         return await check_agent_run_limit(client, account_id)
     
     async def check_projects():
@@ -196,15 +205,32 @@ async def _check_billing_and_limits(client, account_id: str, model_name: Optiona
             return {'can_create': True}
         return await _check_thread_limit(client, account_id)
     
-    billing_result, agent_run_result, project_result, thread_result = await asyncio.gather(
-        check_billing(),
-        check_agent_runs(),
-        check_projects(),
-        check_threads()
-    )
-    
-    logger.debug(f"⏱️ [TIMING] Parallel billing/limit checks: {(time.time() - t_start) * 1000:.1f}ms")
-    
+    try:
+        # return_exceptions: wait for every check, so the slot reservation has
+        # landed (or failed) before it can be released below
+        results = await asyncio.gather(
+            check_billing(),
+            check_agent_runs(),
+            check_projects(),
+            check_threads(),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        billing_result, agent_run_result, project_result, thread_result = results
+        
+        logger.debug(f"⏱️ [TIMING] Parallel billing/limit checks: {(time.time() - t_start) * 1000:.1f}ms")
+        
+        _raise_for_limits(account_id, billing_result, agent_run_result, project_result, thread_result, check_project_limit, check_thread_limit)
+    except BaseException:
+        # No-op if the slot was not taken
+        if agent_run_id:
+            await asyncio.shield(run_admission.release(account_id, agent_run_id))
+        raise
+
+
+def _raise_for_limits(account_id: str, billing_result, agent_run_result, project_result, thread_result, check_project_limit: bool, check_thread_limit: bool):
     can_proceed, error_message, context = billing_result
     if not can_proceed:
         if context.get("error_type") == "model_access_denied":
@@ -275,7 +301,8 @@ async def _create_agent_run_record(
     agent_config: Optional[dict], 
     effective_model: str, 
     actual_user_id: str,
-    extra_metadata: Optional[Dict[str, Any]] = None
+    extra_metadata: Optional[Dict[str, Any]] = None,
+    agent_run_id: Optional[str] = None
 ) -> str:
     run_metadata = {
         "model_name": effective_model,
@@ -285,25 +312,23 @@ async def _create_agent_run_record(
     if extra_metadata:
         run_metadata.update(extra_metadata)
     
-    agent_run = await client.table('agent_runs').insert({
+    agent_run_record = {
         "thread_id": thread_id,
         "status": "running",
         "started_at": datetime.now(timezone.utc).isoformat(),
         "agent_id": agent_config.get('agent_id') if agent_config else None,
         "agent_version_id": agent_config.get('current_version_id') if agent_config else None,
         "metadata": run_metadata
-    }).execute()
+    }
+    # Pre-generated ids are the ones admission control reserved a run slot for
+    if agent_run_id:
+        agent_run_record["id"] = agent_run_id
+    agent_run = await client.table('agent_runs').insert(agent_run_record).execute()
 
     agent_run_id = agent_run.data[0]['id']
     structlog.contextvars.bind_contextvars(agent_run_id=agent_run_id)
     logger.debug(f"Created new agent run: {agent_run_id}")
 
-    try:
-        from core.runtime_cache import invalidate_running_runs_cache
-        await invalidate_running_runs_cache(actual_user_id)
-    except Exception as cache_error:
-        logger.warning(f"Failed to invalidate running runs cache: {cache_error}")
-    
     try:
         from core.billing.shared.cache_utils import invalidate_account_state_cache
         await invalidate_account_state_cache(actual_user_id)
@@ -741,6 +766,8 @@ async def start_agent_run(
     is_new_thread = thread_id is None
     
     final_message_content = message_content or prompt
+    # Generated up front so the limits check can reserve a run slot under this id
+    agent_run_id = str(uuid.uuid4())
     
     t_parallel = time.time()
     
@@ -753,114 +780,122 @@ async def start_agent_run(
         await _check_billing_and_limits(
             client, account_id, model_name or "default", 
             check_project_limit=is_new_thread, 
-            check_thread_limit=is_new_thread
+            check_thread_limit=is_new_thread,
+            agent_run_id=agent_run_id
         )
     
-    agent_config, _ = await asyncio.gather(load_config(), check_limits())
-    logger.debug(f"⏱️ [TIMING] Parallel config+limits: {(time.time() - t_parallel) * 1000:.1f}ms")
+    try:
+        agent_config, _ = await asyncio.gather(load_config(), check_limits())
+        logger.debug(f"⏱️ [TIMING] Parallel config+limits: {(time.time() - t_parallel) * 1000:.1f}ms")
     
-    effective_model = await _get_effective_model(model_name, agent_config, client, account_id)
+        effective_model = await _get_effective_model(model_name, agent_config, client, account_id)
     
-    if is_new_thread:
-        project_created_here = False
+        if is_new_thread:
+            project_created_here = False
         
-        if not project_id:
-            t_project = time.time()
-            project_id = str(uuid.uuid4())
-            placeholder_name = f"{prompt[:30]}..." if len(prompt) > 30 else prompt
+            if not project_id:
+                t_project = time.time()
+                project_id = str(uuid.uuid4())
+                placeholder_name = f"{prompt[:30]}..." if len(prompt) > 30 else prompt
             
-            await client.table('projects').insert({
-                "project_id": project_id,
-                "account_id": account_id,
-                "name": placeholder_name,
-                "created_at": datetime.now(timezone.utc).isoformat()
-            }).execute()
-            project_created_here = True
-            logger.debug(f"⏱️ [TIMING] Project created: {(time.time() - t_project) * 1000:.1f}ms")
+                await client.table('projects').insert({
+                    "project_id": project_id,
+                    "account_id": account_id,
+                    "name": placeholder_name,
+                    "created_at": datetime.now(timezone.utc).isoformat()
+                }).execute()
+                project_created_here = True
+                logger.debug(f"⏱️ [TIMING] Project created: {(time.time() - t_project) * 1000:.1f}ms")
             
-            try:
-                from core.runtime_cache import set_cached_project_metadata
-                await set_cached_project_metadata(project_id, {})
-            except Exception:
-                pass
+                try:
+                    from core.runtime_cache import set_cached_project_metadata
+                    await set_cached_project_metadata(project_id, {})
+                except Exception:
+                    pass
             
-            asyncio.create_task(generate_and_update_project_name(project_id=project_id, prompt=prompt))
+                asyncio.create_task(generate_and_update_project_name(project_id=project_id, prompt=prompt))
         
-        t_thread = time.time()
-        thread_id = str(uuid.uuid4())
-        try:
-            # Create thread with default name, will be updated by LLM in background
-            await client.table('threads').insert({
-                "thread_id": thread_id,
-                "project_id": project_id,
-                "account_id": account_id,
-                "name": "New Chat",
-                "created_at": datetime.now(timezone.utc).isoformat()
-            }).execute()
-            logger.debug(f"⏱️ [TIMING] Thread created: {(time.time() - t_thread) * 1000:.1f}ms")
+            t_thread = time.time()
+            thread_id = str(uuid.uuid4())
+            try:
+                # Create thread with default name, will be updated by LLM in background
+                await client.table('threads').insert({
+                    "thread_id": thread_id,
+                    "project_id": project_id,
+                    "account_id": account_id,
+                    "name": "New Chat",
+                    "created_at": datetime.now(timezone.utc).isoformat()
+                }).execute()
+                logger.debug(f"⏱️ [TIMING] Thread created: {(time.time() - t_thread) * 1000:.1f}ms")
             
-            # Generate proper thread name in background using LLM (fire-and-forget)
-            if prompt:
-                from core.utils.thread_name_generator import generate_and_update_thread_name
-                asyncio.create_task(generate_and_update_thread_name(thread_id=thread_id, prompt=prompt))
+                # Generate proper thread name in background using LLM (fire-and-forget)
+                if prompt:
+                    from core.utils.thread_name_generator import generate_and_update_thread_name
+                    asyncio.create_task(generate_and_update_thread_name(thread_id=thread_id, prompt=prompt))
             
-            if project_id and project_id != thread_id:
-                try:
-                    old_cache_key = f"file_context:{project_id}"
-                    new_cache_key = f"file_context:{thread_id}"
-                    cached_data = await redis.get(old_cache_key)
-                    if cached_data:
-                        await redis.set(new_cache_key, cached_data, ex=3600)
-                        await redis.delete(old_cache_key)
-                        logger.debug(f"Migrated file cache from {project_id} to {thread_id}")
-                except Exception as cache_migrate_error:
-                    logger.warning(f"Failed to migrate file cache: {cache_migrate_error}")
-        except Exception as thread_error:
-            if project_created_here:
-                logger.warning(f"Thread creation failed, rolling back project {project_id}: {str(thread_error)}")
-                try:
-                    await client.table('projects').delete().eq('project_id', project_id).execute()
-                    logger.debug(f"✅ Rolled back orphan project {project_id}")
-                except Exception as rollback_error:
-                    logger.error(f"Failed to rollback orphan project {project_id}: {str(rollback_error)}")
-            raise thread_error
+                if project_id and project_id != thread_id:
+                    try:
+                        old_cache_key = f"file_context:{project_id}"
+                        new_cache_key = f"file_context:{thread_id}"
+                        cached_data = await redis.get(old_cache_key)
+                        if cached_data:
+                            await redis.set(new_cache_key, cached_data, ex=3600)
+                            await redis.delete(old_cache_key)
+                            logger.debug(f"Migrated file cache from {project_id} to {thread_id}")
+                    except Exception as cache_migrate_error:
+                        logger.warning(f"Failed to migrate file cache: {cache_migrate_error}")
+            except Exception as thread_error:
+                if project_created_here:
+                    logger.warning(f"Thread creation failed, rolling back project {project_id}: {str(thread_error)}")
+                    try:
+                        await client.table('projects').delete().eq('project_id', project_id).execute()
+                        logger.debug(f"✅ Rolled back orphan project {project_id}")
+                    except Exception as rollback_error:
+                        logger.error(f"Failed to rollback orphan project {project_id}: {str(rollback_error)}")
+                raise thread_error
         
-        structlog.contextvars.bind_contextvars(thread_id=thread_id, project_id=project_id, account_id=account_id)
+            structlog.contextvars.bind_contextvars(thread_id=thread_id, project_id=project_id, account_id=account_id)
         
-        try:
-            from core.runtime_cache import increment_thread_count_cache
-            asyncio.create_task(increment_thread_count_cache(account_id))
-        except Exception:
-            pass
+            try:
+                from core.runtime_cache import increment_thread_count_cache
+                asyncio.create_task(increment_thread_count_cache(account_id))
+            except Exception:
+                pass
     
-    t_parallel2 = time.time()
+        t_parallel2 = time.time()
     
-    async def create_message():
-        if not final_message_content or not final_message_content.strip():
-            if is_new_thread:
-                logger.warning(f"Attempted to create empty message for new thread - this shouldn't happen (validation should catch this)")
-            else:
-                logger.debug(f"No prompt provided for existing thread {thread_id} - assuming message already exists")
-            return
+        async def create_message():
+            if not final_message_content or not final_message_content.strip():
+                if is_new_thread:
+                    logger.warning(f"Attempted to create empty message for new thread - this shouldn't happen (validation should catch this)")
+                else:
+                    logger.debug(f"No prompt provided for existing thread {thread_id} - assuming message already exists")
+                return
             
-        await client.table('messages').insert({
-            "message_id": str(uuid.uuid4()),
-            "thread_id": thread_id,
-            "type": "user",
-            "is_llm_message": True,
-            "content": {"role": "user", "content": final_message_content},
-            "created_at": datetime.now(timezone.utc).isoformat()
-        }).execute()
-        logger.debug(f"Created user message for thread {thread_id}")
-    
-    async def create_agent_run():
-        return await _create_agent_run_record(client, thread_id, agent_config, effective_model, account_id, metadata)
-    
-    _, agent_run_id = await asyncio.gather(create_message(), create_agent_run())
-    logger.debug(f"⏱️ [TIMING] Parallel message+agent_run: {(time.time() - t_parallel2) * 1000:.1f}ms")
-    
-    t_dispatch = time.time()
-    await _trigger_agent_background(agent_run_id, thread_id, project_id, effective_model, agent_id, account_id)
+            await client.table('messages').insert({
+                "message_id": str(uuid.uuid4()),
+                "thread_id": thread_id,
+                "type": "user",
+                "is_llm_message": True,
+                "content": {"role": "user", "content": final_message_content},
+                "created_at": datetime.now(timezone.utc).isoformat()
+            }).execute()
+            logger.debug(f"Created user message for thread {thread_id}")
+    
+        async def create_agent_run():
+            return await _create_agent_run_record(client, thread_id, agent_config, effective_model, account_id, metadata, agent_run_id=agent_run_id)
+    
+        _, agent_run_id = await asyncio.gather(create_message(), create_agent_run())
+        logger.debug(f"⏱️ [TIMING] Parallel message+agent_run: {(time.time() - t_parallel2) * 1000:.1f}ms")
+    
+        t_dispatch = time.time()
+        await _trigger_agent_background(agent_run_id, thread_id, project_id, effective_model, agent_id, account_id)
+    except Exception:
+        # The run never reached a worker; give its slot back (no-op if none was taken)
+        if not skip_limits_check:
+            await run_admission.release(account_id, agent_run_id)
+        raise
+
     logger.debug(f"⏱️ [TIMING] Worker dispatch: {(time.time() - t_dispatch) * 1000:.1f}ms")
     
     logger.info(f"⏱️ [TIMING] start_agent_run total: {(time.time() - t_start) * 1000:.1f}ms")
@@ -930,8 +965,10 @@ async def unified_agent_start(
             else:
                 resolved_model = model_manager.resolve_model_id(resolved_model)
             
+            # The run record is created by the background init job; reserve its slot now
+            agent_run_id = str(uuid.uuid4())
             t_billing = time.time()
-            await _check_billing_and_limits(client, account_id, resolved_model, check_project_limit=True, check_thread_limit=True)
+            await _check_billing_and_limits(client, account_id, resolved_model, check_project_limit=True, check_thread_limit=True, agent_run_id=agent_run_id)
             logger.debug(f"⏱️ [TIMING] Optimistic billing check: {(time.time() - t_billing) * 1000:.1f}ms")
             
             structlog.contextvars.bind_contextvars(thread_id=thread_id, project_id=project_id, account_id=account_id)
@@ -942,17 +979,22 @@ async def unified_agent_start(
             if memory_enabled is not None:
                 memory_enabled_bool = memory_enabled.lower() == 'true'
             
-            result = await create_thread_optimistically(
-                thread_id=thread_id,
-                project_id=project_id,
-                account_id=account_id,
-                prompt=prompt,
-                agent_id=agent_id,
-                model_name=resolved_model,
-                files=files if len(files) > 0 else None,
-                staged_files=staged_files_data,
-                memory_enabled=memory_enabled_bool,
-            )
+            try:
+                result = await create_thread_optimistically(
+                    thread_id=thread_id,
+                    project_id=project_id,
+                    account_id=account_id,
+                    prompt=prompt,
+                    agent_id=agent_id,
+                    model_name=resolved_model,
+                    files=files if len(files) > 0 else None,
+                    staged_files=staged_files_data,
+                    memory_enabled=memory_enabled_bool,
+                    agent_run_id=agent_run_id,
+                )
+            except Exception:
+                await run_admission.release(account_id, agent_run_id)
+                raise
             
             logger.info(f"⏱️ [TIMING] 🎯 Optimistic API Request Total: {(time.time() - api_request_start) * 1000:.1f}ms")
             
@@ -1311,68 +1353,6 @@ async def stream_agent_run(
 
     stream_key = f"agent_run:{agent_run_id}:stream"
 
-    def find_last_safe_boundary(entries):
-        """Find the last safe boundary for trimming stream entries.
-        
-        Structure-aware: Only trims at COMPLETE response boundaries.
-        A safe boundary is defined as:
-        1. `llm_response_end` - marks the complete end of an LLM response cycle
-        2. Final status messages (completed, failed, stopped, error) - marks agent run end
-        
-        NOTE: We do NOT treat individual assistant messages with stream_status='complete'
-        as safe boundaries because with multiple tool calls in a single response,
-        the assistant message completes before all tool executions finish.
-        Only `llm_response_end` signals that the ENTIRE response (including all tool calls)
-        has been processed.
-        """
-        last_safe_index = -1
-        
-        # Track response boundaries to ensure we only trim complete cycles
-        # Each llm_response_start must have a matching llm_response_end
-        open_responses = 0  # Count of llm_response_start without matching llm_response_end
-        last_complete_response_end_index = -1
-        
-        for i, (entry_id, fields) in enumerate(entries):
-            try:
-                data = json.loads(fields.get('data', '{}'))
-                msg_type = data.get('type')
-                
-                if msg_type == 'llm_response_start':
-                    open_responses += 1
-                    logger.debug(f"Found llm_response_start at index {i}, open_responses={open_responses}")
-                
-                elif msg_type == 'llm_response_end':
-                    open_responses = max(0, open_responses - 1)
-                    if open_responses == 0:
-                        # This llm_response_end closes a complete response cycle
-                        last_complete_response_end_index = i
-                        last_safe_index = i
-                        logger.debug(f"Found safe boundary at index {i}: llm_response_end (complete cycle)")
-                    else:
-                        logger.debug(f"Found llm_response_end at index {i}, but {open_responses} responses still open")
-                
-                elif msg_type == 'status':
-                    status = data.get('status')
-                    if status in ['completed', 'failed', 'stopped', 'error']:
-                        # Final status - safe to trim up to here
-                        last_safe_index = i
-                        logger.debug(f"Found safe boundary at index {i}: status={status}")
-                
-                # NOTE: We intentionally do NOT treat assistant stream_status='complete' as safe
-                # because with multiple tool calls, the assistant message completes but tools
-                # may still be executing. Only llm_response_end signals full completion.
-                
-            except (json.JSONDecodeError, KeyError, TypeError) as e:
-                logger.debug(f"Skipping malformed entry at index {i}: {e}")
-                continue
-        
-        # Safety check: if there are still open responses, don't trim
-        if open_responses > 0 and last_safe_index == last_complete_response_end_index:
-            logger.debug(f"Still have {open_responses} open responses - skipping trim for safety")
-            return -1
-        
-        return last_safe_index
-
     async def stream_generator(agent_run_data):
         logger.debug(f"Streaming responses for {agent_run_id} (stream: {stream_key})")
         terminate_stream = False
@@ -1380,101 +1360,78 @@ async def stream_agent_run(
         last_id = "0"  # Start from beginning for initial read
 
         try:
-            initial_entries = await redis.stream_range(stream_key)
-            if initial_entries:
-                logger.debug(f"Sending {len(initial_entries)} catch-up responses for {agent_run_id}")
-                for entry_id, fields in initial_entries:
-                    response = json.loads(fields.get('data', '{}'))
-                    yield f"data: {json.dumps(response)}\n\n"
-                    last_id = entry_id
-                    if response.get('type') == 'status' and response.get('status') in ['completed', 'failed', 'stopped', 'error']:
-                        logger.debug(f"Detected completion in catch-up: {response.get('status')}")
-                        terminate_stream = True
-                        return
+            # Subscribe to the shared per-run reader BEFORE the catch-up read so
+            # entries written in between are queued rather than lost.
+            async with stream_hub.subscribe(stream_key) as subscription:
+                # The worker keeps the stream short; the latest snapshot stands in for everything before it
+                initial_entries = stream_envelope.from_latest_snapshot(await redis.stream_range(stream_key))
+                if initial_entries:
+                    logger.debug(f"Sending {len(initial_entries)} catch-up entries for {agent_run_id}")
+                    for entry_id, fields in initial_entries:
+                        for frame in stream_envelope.sse_frames(fields):
+                            yield frame
+                        last_id = entry_id
+                        if stream_envelope.is_terminal(fields):
+                            logger.debug(f"Detected completion in catch-up: {stream_envelope.entry_status(fields)}")
+                            terminate_stream = True
+                            return
                 
-                if last_id != "0":
-                    try:
-                        last_safe_index = find_last_safe_boundary(initial_entries)
-                        
-                        if last_safe_index >= 0:
-                            safe_boundary_entry_id = initial_entries[last_safe_index][0]
-                            
-                            if '-' in safe_boundary_entry_id:
-                                parts = safe_boundary_entry_id.split('-')
-                                if len(parts) == 2:
-                                    try:
-                                        timestamp = parts[0]
-                                        sequence = int(parts[1])
-                                        next_id = f"{timestamp}-{sequence + 1}"
-                                        trimmed_count = await redis.xtrim_minid(stream_key, next_id, approximate=True)
-                                        logger.debug(f"Trimmed {trimmed_count} entries from stream {stream_key} up to safe boundary at index {last_safe_index} (entry: {safe_boundary_entry_id})")
-                                    except (ValueError, IndexError):
-                                        trimmed_count = await redis.xtrim_minid(stream_key, safe_boundary_entry_id, approximate=True)
-                                        logger.debug(f"Trimmed {trimmed_count} entries from stream {stream_key} up to safe boundary (fallback)")
-                                else:
-                                    trimmed_count = await redis.xtrim_minid(stream_key, safe_boundary_entry_id, approximate=True)
-                                    logger.debug(f"Trimmed {trimmed_count} entries from stream {stream_key} up to safe boundary")
-                            else:
-                                trimmed_count = await redis.xtrim_minid(stream_key, safe_boundary_entry_id, approximate=True)
-                                logger.debug(f"Trimmed {trimmed_count} entries from stream {stream_key} up to safe boundary")
-                        else:
-                            logger.debug(f"No safe boundary found in {len(initial_entries)} entries - skipping trim to prevent race conditions")
-                    except Exception as trim_error:
-                        logger.warning(f"Failed to trim stream after catch-up read: {trim_error}")
-            
-            initial_yield_complete = True
+                initial_yield_complete = True
 
-            if terminate_stream:
-                return
+                if terminate_stream:
+                    return
 
-            current_status = agent_run_data.get('status') if agent_run_data else None
-            if current_status != 'running':
-                logger.debug(f"Agent run {agent_run_id} is not running (status: {current_status}). Ending stream.")
-                yield f"data: {json.dumps({'type': 'status', 'status': 'completed'})}\n\n"
-                return
+                current_status = agent_run_data.get('status') if agent_run_data else None
+                if current_status != 'running':
+                    logger.debug(f"Agent run {agent_run_id} is not running (status: {current_status}). Ending stream.")
+                    yield f"data: {json.dumps({'type': 'status', 'status': 'completed'})}\n\n"
+                    return
 
-            structlog.contextvars.bind_contextvars(
-                thread_id=agent_run_data.get('thread_id'),
-            )
+                structlog.contextvars.bind_contextvars(
+                    thread_id=agent_run_data.get('thread_id'),
+                )
 
-            # Use blocking XREAD to wait for new stream entries
-            # After catch-up, only read new entries
-            if last_id != "0":
-                last_id = "$"  # "$" means only new entries
-            
-            while not terminate_stream:
-                try:
-                    # Blocking XREAD - waits up to 5 seconds for new entries
-                    entries = await redis.stream_read(stream_key, last_id, block_ms=5000)
-                    
-                    if entries:
-                        for entry_id, fields in entries:
-                            data = fields.get('data', '{}')
-                            yield f"data: {data}\n\n"
-                            last_id = entry_id
-                            
-                            # Check for completion status
-                            try:
-                                response = json.loads(data)
-                                if response.get('type') == 'status' and response.get('status') in ['completed', 'failed', 'stopped', 'error']:
-                                    logger.debug(f"Detected completion via stream: {response.get('status')}")
+                # Entries already sent during catch-up are skipped by the subscription
+                subscription.advance(last_id)
+                
+                while not terminate_stream:
+                    try:
+                        # Waits up to 5 seconds for entries fanned out by the shared reader
+                        entries = await subscription.next_batch(timeout=5.0)
+                        
+                        if entries:
+                            for entry_id, fields in entries:
+                                if stream_envelope.is_snapshot(fields):
+                                    # Snapshots repeat frames this client already received, unless
+                                    # entries it had not read yet were trimmed before it got to them
+                                    covers = stream_envelope.snapshot_covers(fields)
+                                    if covers and parse_stream_id(last_id) < parse_stream_id(covers):
+                                        logger.debug(f"Replaying snapshot {entry_id} for {agent_run_id} (behind at {last_id})")
+                                        for frame in stream_envelope.sse_frames(fields):
+                                            yield frame
+                                    last_id = entry_id
+                                    continue
+                                last_id = entry_id
+                                yield stream_envelope.sse_frame(fields)
+                                
+                                # Check for completion status (from stream fields, no payload parse)
+                                if stream_envelope.is_terminal(fields):
+                                    logger.debug(f"Detected completion via stream: {stream_envelope.entry_status(fields)}")
                                     terminate_stream = True
                                     break
-                            except json.JSONDecodeError:
-                                pass
-                    else:
-                        # Timeout - send ping to keep connection alive
-                        yield f"data: {json.dumps({'type': 'ping'})}\n\n"
-
-                except asyncio.CancelledError:
-                    logger.debug(f"Stream generator cancelled for {agent_run_id}")
-                    terminate_stream = True
-                    break
-                except Exception as e:
-                    logger.error(f"Error processing message for {agent_run_id}: {e}", exc_info=True)
-                    yield f"data: {json.dumps({'type': 'status', 'status': 'error', 'message': f'Stream failed: {e}'})}\n\n"
-                    terminate_stream = True
-                    break
+                        else:
+                            # Timeout - send ping to keep connection alive
+                            yield f"data: {json.dumps({'type': 'ping'})}\n\n"
+
+                    except asyncio.CancelledError:
+                        logger.debug(f"Stream generator cancelled for {agent_run_id}")
+                        terminate_stream = True
+                        break
+                    except Exception as e:
+                        logger.error(f"Error processing message for {agent_run_id}: {e}", exc_info=True)
+                        yield f"data: {json.dumps({'type': 'status', 'status': 'error', 'message': f'Stream failed: {e}'})}\n\n"
+                        terminate_stream = True
+                        break
 
         except Exception as e:
             logger.error(f"Error setting up stream for agent run {agent_run_id}: {e}", exc_info=True)
@@ -1483,7 +1440,7 @@ async def stream_agent_run(
 
         finally:
             terminate_stream = True
-            # No cleanup needed - streams don't hold connections
+            # Leaving the subscription context detaches from the shared reader
 
             logger.debug(f"Streaming cleanup complete for agent run: {agent_run_id}")
 
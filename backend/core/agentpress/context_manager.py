@@ -7,7 +7,7 @@ reaching the context window limitations of LLM models.
 
 import json
 import os
-from typing import List, Dict, Any, Optional, Union
+from typing import Callable, List, Dict, Any, Optional, Union
 
 from litellm.utils import token_counter
 from anthropic import Anthropic
@@ -15,6 +15,7 @@ from core.services.supabase import DBConnection
 from core.utils.logger import logger
 from core.ai_models import model_manager
 from core.agentpress.prompt_caching import apply_anthropic_caching_strategy
+from core.agentpress.token_accounting import TokenTally, TOKEN_COUNT_MODE, token_count_cache, token_estimator
 
 DEFAULT_TOKEN_THRESHOLD = 120000
 
@@ -51,14 +52,17 @@ def _get_bedrock_client_singleton():
 class ContextManager:
     """Manages thread context including token counting and summarization."""
     
-    def __init__(self, token_threshold: int = DEFAULT_TOKEN_THRESHOLD):
+    def __init__(self, token_threshold: int = DEFAULT_TOKEN_THRESHOLD, on_compressed: Optional[Callable[[List[Dict[str, Any]]], None]] = None):
         """Initialize the ContextManager.
         
         Args:
             token_threshold: Token count threshold to trigger summarization
+            on_compressed: Called with the entries written by save_compressed_messages
+                (e.g. to keep a ThreadMessageCache in sync)
         """
         self.db = DBConnection()
         self.token_threshold = token_threshold
+        self.on_compressed = on_compressed
         # Tool output management
         self.keep_recent_tool_outputs = 5  # Number of recent tool outputs to preserve
         # Compression strategy
@@ -92,6 +96,7 @@ class ContextManager:
         
         saved_count = 0
         upgraded_count = 0
+        saved_entries: List[Dict[str, Any]] = []
         client = await self.db.client
         
         for msg_data in compressed_messages:
@@ -121,6 +126,7 @@ class ContextManager:
                         'metadata': existing_metadata
                     }).eq('message_id', message_id).execute()
                     
+                    saved_entries.append(msg_data)
                     if was_already_compressed:
                         upgraded_count += 1
                     else:
@@ -132,31 +138,55 @@ class ContextManager:
         if saved_count > 0 or upgraded_count > 0:
             logger.info(f"💾 Compression save: {saved_count} new, {upgraded_count} upgraded")
         
+        if saved_entries and self.on_compressed:
+            self.on_compressed(saved_entries)
+        
         return saved_count + upgraded_count
     
     def _get_bedrock_client(self):
         """Get the singleton Bedrock client."""
         return _get_bedrock_client_singleton()
 
-    async def count_tokens(self, model: str, messages: List[Dict[str, Any]], system_prompt: Optional[Dict[str, Any]] = None, apply_caching: bool = True) -> int:
+    async def count_tokens(self, model: str, messages: List[Dict[str, Any]], system_prompt: Optional[Dict[str, Any]] = None, apply_caching: bool = True, remote: Optional[bool] = None) -> int:
         """Count tokens using the correct tokenizer for the model.
         
+        By default (TOKEN_COUNT_MODE=local) this is an in-process estimate: local
+        tokenizers via LiteLLM, memoized per message and calibrated against the
+        usage providers actually report. No network round-trip.
+        
+        Remote verification mode (TOKEN_COUNT_MODE=remote, or remote=True):
         For Anthropic/Claude models: Uses Anthropic's official tokenizer
         For Bedrock models: Uses Bedrock's count_tokens API
         For other models: Uses LiteLLM's token_counter
         
-        IMPORTANT: By default, applies caching transformation before counting to match
-        the actual token count that will be sent to the API.
+        IMPORTANT: In remote mode, by default applies caching transformation before counting
+        to match the actual token count that will be sent to the API.
         
         Args:
             model: Model name
             messages: List of messages
             system_prompt: Optional system prompt
             apply_caching: If True, temporarily apply caching transformation before counting
+            remote: Override TOKEN_COUNT_MODE for this call
             
         Returns:
             Token count (with caching overhead if apply_caching=True)
         """
+        if remote is None:
+            remote = TOKEN_COUNT_MODE == "remote"
+        
+        await token_estimator.load_calibration(model)
+        if not remote:
+            # cache_control markers add a handful of tokens; the calibration factor absorbs them
+            return token_estimator.estimate(model, messages, system_prompt)
+        
+        exact = await self._count_tokens_remote(model, messages, system_prompt, apply_caching)
+        # Remote counts double as calibration samples for the local estimator
+        token_estimator.observe(model, token_estimator.raw_estimate(model, messages, system_prompt), exact)
+        return exact
+
+    async def _count_tokens_remote(self, model: str, messages: List[Dict[str, Any]], system_prompt: Optional[Dict[str, Any]], apply_caching: bool) -> int:
+        """Provider count-tokens APIs (verification mode), falling back to LiteLLM."""
         # Apply caching transformation if requested (to match API reality)
         messages_to_count = messages
         system_to_count = system_prompt
@@ -303,8 +333,8 @@ class ContextManager:
         Estimate token usage for billing when exact usage is unavailable.
         This is critical for billing on timeouts, crashes, disconnects, etc.
         
-        Uses provider-specific APIs (Anthropic/Bedrock) when available for accuracy,
-        with fallbacks to LiteLLM token_counter and word count estimation.
+        Always uses provider-specific APIs (Anthropic/Bedrock) when available for accuracy
+        (this is off the hot path), with fallbacks to LiteLLM token_counter and word count estimation.
         
         Args:
             prompt_messages: The prompt messages sent to the LLM
@@ -316,7 +346,7 @@ class ContextManager:
         """
         try:
             # Count prompt tokens using accurate provider APIs
-            prompt_tokens = await self.count_tokens(model, prompt_messages, apply_caching=False)
+            prompt_tokens = await self.count_tokens(model, prompt_messages, apply_caching=False, remote=True)
             
             # Count completion tokens (just the text)
             completion_tokens = 0
@@ -971,7 +1001,7 @@ class ContextManager:
                     continue  # Skip non-dict messages
                 if self.is_tool_result_message(msg):  # Only compress ToolResult messages
                     _i += 1  # Count the number of ToolResult messages
-                    msg_token_count = token_counter(messages=[msg])  # Count the number of tokens in the message
+                    msg_token_count = token_count_cache.count_message(msg, llm_model)  # Cached per-message token count
                     if msg_token_count > token_threshold:  # If the message is too long
                         if _i > self.keep_recent_tool_outputs:  # If this is not one of the most recent N ToolResult messages
                             message_id = msg.get('message_id')  # Get the message_id
@@ -1001,7 +1031,7 @@ class ContextManager:
                     continue  # Skip non-dict messages
                 if msg.get('role') == 'user':  # Only compress User messages
                     _i += 1  # Count the number of User messages
-                    msg_token_count = token_counter(messages=[msg])  # Count the number of tokens in the message
+                    msg_token_count = token_count_cache.count_message(msg, llm_model)  # Cached per-message token count
                     if msg_token_count > token_threshold:  # If the message is too long
                         if _i > self.keep_recent_user_messages:  # If this is not one of the most recent N User messages
                             message_id = msg.get('message_id')  # Get the message_id
@@ -1031,7 +1061,7 @@ class ContextManager:
                     continue  # Skip non-dict messages
                 if msg.get('role') == 'assistant':  # Only compress Assistant messages
                     _i += 1  # Count the number of Assistant messages
-                    msg_token_count = token_counter(messages=[msg])  # Count the number of tokens in the message
+                    msg_token_count = token_count_cache.count_message(msg, llm_model)  # Cached per-message token count
                     if msg_token_count > token_threshold:  # If the message is too long
                         if _i > self.keep_recent_assistant_messages:  # If this is not one of the most recent N Assistant messages
                             message_id = msg.get('message_id')  # Get the message_id
@@ -1121,6 +1151,11 @@ class ContextManager:
             logger.info(f"✅ Token count ({uncompressed_total_token_count}) under threshold ({max_tokens}), skipping compression")
             return await self.middle_out_messages(result)
         
+        # Totals below are maintained incrementally from cached per-message counts,
+        # anchored on the exact count above, instead of re-tokenizing the whole thread
+        await token_count_cache.prefetch(result, llm_model)
+        tally = TokenTally(llm_model, result, uncompressed_total_token_count)
+        
         # PRIMARY STRATEGY: Remove old tool outputs if over threshold
         if uncompressed_total_token_count > max_tokens:
             logger.info(f"Context over limit ({uncompressed_total_token_count} > {max_tokens}), starting tiered compression...")
@@ -1128,8 +1163,7 @@ class ContextManager:
             # Tier 1: Compress old tool outputs in-memory
             result = self.remove_old_tool_outputs(result, keep_last_n=self.keep_recent_tool_outputs)
             
-            # Recalculate WITH caching
-            current_token_count = await self.count_tokens(llm_model, result, system_prompt, apply_caching=True)
+            current_token_count = tally.total(result)
             
             logger.info(f"After tool compression: {uncompressed_total_token_count} -> {current_token_count} tokens")
             
@@ -1140,8 +1174,7 @@ class ContextManager:
                 # Compress in-memory for this request
                 result = self.compress_user_messages_in_memory(result, keep_last_n=self.keep_recent_user_messages)
                 
-                # Recalculate with in-memory compressed messages WITH caching
-                current_token_count = await self.count_tokens(llm_model, result, system_prompt, apply_caching=True)
+                current_token_count = tally.total(result)
                 logger.info(f"After user compression: {current_token_count} tokens")
             
             # Tier 3: Compress assistant messages if still above target
@@ -1151,8 +1184,7 @@ class ContextManager:
                 # Compress in-memory for this request
                 result = self.compress_assistant_messages_in_memory(result, keep_last_n=self.keep_recent_assistant_messages)
                 
-                # Recalculate with in-memory compressed messages WITH caching
-                current_token_count = await self.count_tokens(llm_model, result, system_prompt, apply_caching=True)
+                current_token_count = tally.total(result)
                 logger.info(f"After assistant compression: {current_token_count} tokens")
             
             logger.info(f"Tiered compression complete: {uncompressed_total_token_count} -> {current_token_count} tokens (target: {target_tokens})")
@@ -1173,8 +1205,7 @@ class ContextManager:
             result = await self.compress_user_messages(result, llm_model, max_tokens, token_threshold, uncompressed_total_token_count)
             result = await self.compress_assistant_messages(result, llm_model, max_tokens, token_threshold, uncompressed_total_token_count)
 
-        # Recalculate WITH caching (to match API reality)
-        compressed_total = await self.count_tokens(llm_model, result, system_prompt, apply_caching=True)
+        compressed_total = tally.total(result)
         
         if compressed_total != uncompressed_total_token_count:
             logger.info(f"Context compression: {uncompressed_total_token_count} -> {compressed_total} tokens (saved {uncompressed_total_token_count - compressed_total})")
@@ -1184,11 +1215,12 @@ class ContextManager:
         # Recurse if still too large
         if max_iterations <= 0:
             logger.warning(f"Max iterations reached, omitting messages")
-            result = await self.compress_messages_by_omitting_messages(result, llm_model, max_tokens, system_prompt=system_prompt)
-            compressed_total = await self.count_tokens(llm_model, result, system_prompt, apply_caching=True)
+            result = await self.compress_messages_by_omitting_messages(result, llm_model, max_tokens, system_prompt=system_prompt, actual_total_tokens=compressed_total)
+            compressed_total = tally.total(result)
             # Fall through to last_usage update
         elif compressed_total > max_tokens:
             logger.warning(f"Further compression needed: {compressed_total} > {max_tokens}")
+            await token_count_cache.persist()
             # Recursive call - will handle its own last_usage update
             return await self.compress_messages(
                 result, llm_model, max_tokens, 
@@ -1198,11 +1230,12 @@ class ContextManager:
         elif compressed_total > target_tokens:
             # Still over target but under max_tokens - use omit_messages to reach target
             logger.info(f"Secondary compression didn't reach target ({compressed_total} > {target_tokens}). Using message omission to reach target.")
-            result = await self.compress_messages_by_omitting_messages(result, llm_model, target_tokens, system_prompt=system_prompt)
-            compressed_total = await self.count_tokens(llm_model, result, system_prompt, apply_caching=True)
+            result = await self.compress_messages_by_omitting_messages(result, llm_model, target_tokens, system_prompt=system_prompt, actual_total_tokens=compressed_total)
+            compressed_total = tally.total(result)
             logger.info(f"After message omission to target: {compressed_total} tokens")
 
         logger.info(f"✨ Final compression complete: {compressed_total} tokens (target: {target_tokens}, max: {max_tokens})")
+        await token_count_cache.persist()
         
         # Identify messages that were compressed and save to database
         compressed_to_save: List[Dict[str, Any]] = []
@@ -1238,7 +1271,8 @@ class ContextManager:
             max_tokens: Optional[int] = 41000,
             removal_batch_size: int = 3,  # Now operates on groups, not individual messages
             min_groups_to_keep: int = 5,  # Minimum number of groups to preserve
-            system_prompt: Optional[Dict[str, Any]] = None
+            system_prompt: Optional[Dict[str, Any]] = None,
+            actual_total_tokens: Optional[int] = None
         ) -> List[Dict[str, Any]]:
         """Compress the messages by omitting message GROUPS from the middle.
         
@@ -1252,6 +1286,7 @@ class ContextManager:
             removal_batch_size: Number of groups to remove per iteration
             min_groups_to_keep: Minimum number of groups to preserve
             system_prompt: Optional system prompt for token counting
+            actual_total_tokens: Known total for `messages`; skips the initial exact count
         """
         if not messages:
             return messages
@@ -1260,18 +1295,23 @@ class ContextManager:
         result = self.remove_meta_messages(result)
 
         # Early exit if no compression needed - WITH caching
-        initial_token_count = await self.count_tokens(llm_model, result, system_prompt, apply_caching=True)
+        if actual_total_tokens is not None:
+            initial_token_count = actual_total_tokens
+        else:
+            initial_token_count = await self.count_tokens(llm_model, result, system_prompt, apply_caching=True)
         
         max_allowed_tokens = max_tokens or (100 * 1000)
         
         if initial_token_count <= max_allowed_tokens:
             return result
 
+        await token_count_cache.prefetch(result, llm_model)
+        tally = TokenTally(llm_model, result, initial_token_count)
+        
         # Group messages into atomic units (assistant+tool_calls grouped with their tool results)
         message_groups = self.group_messages_by_tool_calls(result)
         logger.info(f"📦 Grouped {len(result)} messages into {len(message_groups)} atomic groups for compression")
         
-        system_message = system_prompt
         safety_limit = 500
         current_token_count = initial_token_count
         
@@ -1321,8 +1361,7 @@ class ContextManager:
             # Flatten groups back to messages for token counting
             conversation_messages = self.flatten_message_groups(message_groups)
             
-            # Recalculate token count WITH caching
-            current_token_count = await self.count_tokens(llm_model, conversation_messages, system_message, apply_caching=True)
+            current_token_count = tally.total(conversation_messages)
 
         # Save omitted messages with placeholder content so they're read as compressed next time
         if all_omitted_messages:
@@ -1363,8 +1402,8 @@ class ContextManager:
             logger.warning(f"⚠️ Post-compression validation found pairing issues (orphaned: {len(orphaned_ids)}, unanswered: {len(unanswered_ids)}) - repairing")
             final_messages = self.repair_tool_call_pairing(final_messages)
         
-        # Log with system prompt included for accurate token reporting WITH caching
-        final_token_count = await self.count_tokens(llm_model, final_messages, system_message, apply_caching=True)
+        final_token_count = tally.total(final_messages)
+        await token_count_cache.persist()
         
         logger.info(f"Context compression (omit): {initial_token_count} -> {final_token_count} tokens ({len(messages)} -> {len(final_messages)} messages, {len(message_groups)} groups)")
             
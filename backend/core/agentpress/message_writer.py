@@ -0,0 +1,136 @@
+"""Write-behind persistence for a run's status/telemetry messages.
+
+ThreadManager.add_message used to insert every row with its own PostgREST
+round-trip, awaited inline, including the status rows the streaming path
+emits around every tool call (tool_started / tool_completed / tool_failed /
+tool_error), llm_response_start and thread_run_start/end markers.
+
+MessageWriter buffers those non-LLM rows and writes them with one bulk insert
+every MESSAGE_FLUSH_INTERVAL_MS, when MESSAGE_FLUSH_MAX_ROWS are pending, at
+turn boundaries and when the run ends. Buffered rows get their message_id and
+created_at on the client when they are added, so callers still receive the
+full row (with its final ID) immediately. Rows the LLM reads or that have
+side effects (assistant, tool, user, llm_response_end for billing) are still
+inserted immediately and keep the database's now() as created_at, like rows
+written by the API.
+
+Buffered rows are never stamped earlier than the last created_at the
+database returned for an immediate insert (`observe_created_at()`), so they
+always sort after the rows added before them. Against immediate rows added
+after them, order holds as long as the worker's clock is not ahead of the
+database's by more than the time between the two adds (milliseconds with
+NTP-synced hosts).
+
+It is owned by a ThreadManager (one per run).
+"""
+
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from core.utils.logger import logger
+
+MESSAGE_WRITE_BEHIND_ENABLED = os.getenv("MESSAGE_WRITE_BEHIND_ENABLED", "true").lower() == "true"
+MESSAGE_FLUSH_INTERVAL_MS = int(os.getenv("MESSAGE_FLUSH_INTERVAL_MS", "250"))
+MESSAGE_FLUSH_MAX_ROWS = int(os.getenv("MESSAGE_FLUSH_MAX_ROWS", "50"))
+
+# Non-LLM message types nothing needs to read back during the run
+DEFERRED_MESSAGE_TYPES = frozenset({"status", "llm_response_start", "assistant_response_end"})
+
+_RETRY_DELAY_SECONDS = 0.5
+
+
+class MessageWriter:
+    def __init__(self, db):
+        self.db = db
+        self._pending: List[Dict[str, Any]] = []
+        self._flush_lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self._background: set = set()
+        self._last_created_at: Optional[datetime] = None
+
+    @staticmethod
+    def should_defer(type: str, is_llm_message: bool) -> bool:
+        return MESSAGE_WRITE_BEHIND_ENABLED and not is_llm_message and type in DEFERRED_MESSAGE_TYPES
+
+    def _next_created_at(self) -> datetime:
+        # Strictly increasing, so rows added in the same microsecond keep their order
+        now = datetime.now(timezone.utc)
+        if self._last_created_at is not None and now <= self._last_created_at:
+            now = self._last_created_at + timedelta(microseconds=1)
+        self._last_created_at = now
+        return now
+
+    def observe_created_at(self, created_at: Any) -> None:
+        """Record the created_at the database assigned to an immediately inserted row."""
+        if not isinstance(created_at, str):
+            return
+        try:
+            server_time = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+        except ValueError:
+            return
+        if server_time.tzinfo is None:
+            server_time = server_time.replace(tzinfo=timezone.utc)
+        if self._last_created_at is None or server_time > self._last_created_at:
+            self._last_created_at = server_time
+
+    def add(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Buffer a messages row; returns it as it will be stored."""
+        created_at = self._next_created_at().isoformat()
+        row = {
+            'message_id': str(uuid.uuid4()),
+            'agent_id': None,
+            'agent_version_id': None,
+            **data,
+            'created_at': created_at,
+            'updated_at': created_at,
+        }
+        self._pending.append(row)
+
+        if len(self._pending) >= MESSAGE_FLUSH_MAX_ROWS:
+            self.flush_in_background()
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_after_interval())
+        return dict(row)
+
+    async def _flush_after_interval(self) -> None:
+        await asyncio.sleep(MESSAGE_FLUSH_INTERVAL_MS / 1000)
+        # Shielded: close() cancelling the timer must not abort an insert in progress
+        await asyncio.shield(self.flush())
+
+    def flush_in_background(self) -> None:
+        """Start a flush without waiting for it (turn boundaries, size threshold)."""
+        if not self._pending:
+            return
+        task = asyncio.create_task(self.flush())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def flush(self) -> int:
+        """Insert all pending rows; returns the number written."""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            rows, self._pending = self._pending, []
+            client = await self.db.client
+            for attempt in range(2):
+                try:
+                    await client.table('messages').insert(rows).execute()
+                    return len(rows)
+                except Exception as e:
+                    if attempt == 0:
+                        logger.warning(f"Bulk insert of {len(rows)} messages failed, retrying: {e}")
+                        await asyncio.sleep(_RETRY_DELAY_SECONDS)
+                    else:
+                        logger.error(f"Dropped {len(rows)} status messages after failed bulk insert: {e}")
+            return 0
+
+    async def close(self) -> None:
+        """Flush everything still pending (run end)."""
+        if self._timer is not None and not self._timer.done():
+            self._timer.cancel()
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        await self.flush()
@@ -34,9 +34,11 @@ from 200k to 1M+ token context windows.
 Based on Anthropic documentation and mathematical optimization (Sept 2025).
 """
 
+from collections import OrderedDict
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timezone
 from core.utils.logger import logger
+from core.agentpress.token_accounting import content_digest, estimate_image_tokens
 
 
 async def get_stored_threshold(thread_id: str, model: str) -> Optional[Dict[str, Any]]:
@@ -123,26 +125,42 @@ def supports_prompt_caching(model_name: str) -> bool:
         logger.debug(f"Could not check prompt caching capability for '{model_name}': {e}")
         return False
 
+_text_token_cache: "OrderedDict[str, int]" = OrderedDict()
+_TEXT_TOKEN_CACHE_SIZE = 20000
+
 def estimate_token_count(text: str, model: str = "claude-3-5-sonnet-20240620") -> int:
     """
     Accurate token counting using LiteLLM's token_counter.
     Uses model-specific tokenizers when available, falls back to tiktoken.
+    Memoized by content hash, since the same blocks are recounted every turn.
     """
     if not text:
         return 0
     
+    text = str(text)
+    key = f"{model}:{content_digest(text)}"
+    cached = _text_token_cache.get(key)
+    if cached is not None:
+        _text_token_cache.move_to_end(key)
+        return cached
+    
     try:
         from litellm import token_counter
         # Use LiteLLM's token counter with the specific model
-        return token_counter(model=model, text=str(text))
+        count = token_counter(model=model, text=text)
     except Exception as e:
         logger.warning(f"LiteLLM token counting failed: {e}, using fallback estimation")
         # Fallback to word-based estimation
-        word_count = len(str(text).split())
-        return int(word_count * 1.3)
+        word_count = len(text.split())
+        count = int(word_count * 1.3)
+    
+    _text_token_cache[key] = count
+    while len(_text_token_cache) > _TEXT_TOKEN_CACHE_SIZE:
+        _text_token_cache.popitem(last=False)
+    return count
 
 def get_message_token_count(message: Dict[str, Any], model: str = "claude-3-5-sonnet-20240620") -> int:
-    """Get estimated token count for a message, including base64 image data."""
+    """Get estimated token count for a message; images are estimated from their dimensions."""
     content = message.get('content', '')
     if isinstance(content, list):
         total_tokens = 0
@@ -151,9 +169,10 @@ def get_message_token_count(message: Dict[str, Any], model: str = "claude-3-5-so
                 if item.get('type') == 'text':
                     total_tokens += estimate_token_count(item.get('text', ''), model)
                 elif item.get('type') == 'image_url':
-                    # Count image_url tokens - base64 data is very token-heavy
-                    image_url = item.get('image_url', {}).get('url', '')
-                    total_tokens += estimate_token_count(image_url, model)
+                    # Tokenizing base64 payloads is slow and wildly overcounts
+                    image_url = item.get('image_url', {})
+                    url = image_url.get('url', '') if isinstance(image_url, dict) else str(image_url)
+                    total_tokens += estimate_image_tokens(url)
         return total_tokens
     return estimate_token_count(str(content), model)
 
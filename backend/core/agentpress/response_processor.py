@@ -11,6 +11,7 @@ This module handles the processing of LLM responses, including:
 import json
 import uuid
 import asyncio
+import time
 from pathlib import Path
 from datetime import datetime, timezone
 from typing import List, Dict, Any, Optional, AsyncGenerator, Tuple, Union, Callable, Literal, TYPE_CHECKING
@@ -19,12 +20,17 @@ if TYPE_CHECKING:
     from core.jit.config import JITConfig
 from dataclasses import dataclass
 from core.utils.logger import logger
+from core.utils import timing
 from core.utils.config import config as global_config
 from core.agentpress.tool import ToolResult
 from core.agentpress.tool_registry import ToolRegistry
+from core.agentpress.tool_scheduler import ToolScheduler
+from core.agentpress.tool_result_blobs import offload_tool_result
 from core.agentpress.xml_tool_parser import (
     extract_xml_chunks,
-    parse_xml_tool_calls_with_ids
+    parse_xml_tool_calls_with_ids,
+    xml_tool_calls_to_dicts,
+    StreamingXMLToolCallParser
 )
 from core.tool_output_streaming_context import set_current_tool_call_id
 from core.agentpress.native_tool_parser import (
@@ -141,6 +147,9 @@ class ResponseProcessor:
         self._thread_locks: Dict[str, asyncio.Lock] = {}
         self._locks_lock = asyncio.Lock()  # Lock for managing the thread_locks dict itself
 
+        # Concurrency classes, deadlines and path ordering for tool calls
+        self._tool_scheduler = ToolScheduler(tool_registry)
+
     async def _get_thread_lock(self, thread_id: str) -> asyncio.Lock:
         """Get or create a lock for the specified thread.
         
@@ -522,8 +531,8 @@ class ResponseProcessor:
         # Each assistant message should be separate
         accumulated_content = ""
         tool_calls_buffer = {}
-        current_xml_content = ""
-        xml_chunks_buffer = []
+        xml_stream_parser = StreamingXMLToolCallParser()  # Incremental: O(delta) per chunk
+        xml_streamed_tool_calls = []  # Tool call dicts emitted by the parser during streaming
         pending_tool_executions = []
         yielded_tool_indices = set() # Stores indices of tools whose *status* has been yielded
         executed_native_tool_indices = set() # Track which native tool call indices have been executed
@@ -805,7 +814,6 @@ class ResponseProcessor:
                         if isinstance(chunk_content, list):
                             chunk_content = ''.join(str(item) for item in chunk_content)
                         accumulated_content += chunk_content
-                        current_xml_content += chunk_content
 
                         # Yield content chunk IMMEDIATELY - no datetime call, use pre-built metadata
                         # This is the hot path - every microsecond counts!
@@ -824,19 +832,18 @@ class ResponseProcessor:
 
                         # --- Process XML Tool Calls (if enabled) ---
                         if config.xml_tool_calling:
-                            xml_chunks = extract_xml_chunks(current_xml_content)
-                            for xml_chunk in xml_chunks:
-                                current_xml_content = current_xml_content.replace(xml_chunk, "", 1)
-                                xml_chunks_buffer.append(xml_chunk)
-                                # Parse ALL tool calls from this chunk (can be multiple <invoke> tags)
+                            # Each completed </invoke> is emitted as soon as it arrives
+                            completed_xml_calls = xml_stream_parser.feed(chunk_content)
+                            if completed_xml_calls:
                                 current_assistant_id = last_assistant_message_object['message_id'] if last_assistant_message_object else None
-                                parsed_tool_calls = parse_xml_tool_calls_with_ids(xml_chunk, current_assistant_id, xml_tool_call_count)
+                                parsed_tool_calls = xml_tool_calls_to_dicts(completed_xml_calls, current_assistant_id, xml_tool_call_count)
+                                xml_streamed_tool_calls.extend(parsed_tool_calls)
                                 
                                 # Convert parsed XML tool calls to unified format
                                 for tool_call in parsed_tool_calls:
                                     xml_tool_call_count += 1
                                     # Track XML tool call with its ID for metadata storage
-                                    # parse_xml_tool_calls_with_ids already generates IDs, so use that
+                                    # xml_tool_calls_to_dicts already generates IDs, so use that
                                     xml_tool_call_data = {
                                         "tool_call_id": tool_call.get("id"),
                                         "function_name": tool_call.get("function_name"),
@@ -887,7 +894,7 @@ class ResponseProcessor:
                                             yield formatted
                                         yielded_tool_indices.add(tool_index) # Mark status as yielded
 
-                                        execution_task = asyncio.create_task(self._execute_tool(tool_call))
+                                        execution_task = self._tool_scheduler.submit(tool_call, self._execute_tool)
                                         pending_tool_executions.append({
                                             "task": execution_task, "tool_call": tool_call,
                                             "tool_index": tool_index, "context": context
@@ -974,7 +981,7 @@ class ResponseProcessor:
                                     yield formatted
                                 yielded_tool_indices.add(tool_index) # Mark status as yielded
 
-                                execution_task = asyncio.create_task(self._execute_tool(tool_call_data))
+                                execution_task = self._tool_scheduler.submit(tool_call_data, self._execute_tool)
                                 pending_tool_executions.append({
                                     "task": execution_task, "tool_call": tool_call_data,
                                     "tool_index": tool_index, "context": context
@@ -1458,27 +1465,12 @@ class ResponseProcessor:
                  # Gather XML tool calls from buffer
                 parsed_xml_data = []
                 if config.xml_tool_calling:
-                    # Reparse remaining content just in case (should be empty if processed correctly)
-                    xml_chunks = extract_xml_chunks(current_xml_content)
-                    xml_chunks_buffer.extend(xml_chunks)
-
-                    for chunk in xml_chunks_buffer:
-                         # Parse ALL tool calls from this chunk (can be multiple <invoke> tags)
-                         current_assistant_id_for_parsing = last_assistant_message_object['message_id'] if last_assistant_message_object else None
-                         parsed_tool_calls = parse_xml_tool_calls_with_ids(chunk, current_assistant_id_for_parsing, xml_tool_call_count)
-                         for tool_call in parsed_tool_calls:
-                             # Track XML tool call with its ID for metadata storage (if not already tracked)
-                             tool_call_id = tool_call.get("id")
-                             if tool_call_id and not any(tc.get("tool_call_id") == tool_call_id for tc in xml_tool_calls_with_ids):
-                                 xml_tool_calls_with_ids.append({
-                                     "tool_call_id": tool_call_id,
-                                     "function_name": tool_call.get("function_name"),
-                                     "arguments": tool_call.get("arguments")
-                                 })
-                             # Avoid adding if already processed during streaming
-                             if not any(exec['tool_call'] == tool_call for exec in pending_tool_executions):
-                                 final_tool_calls_to_process.append(tool_call)
-                                 parsed_xml_data.append({'tool_call': tool_call})
+                    # Tool calls were already parsed incrementally during streaming
+                    for tool_call in xml_streamed_tool_calls:
+                         # Avoid adding if already processed during streaming
+                         if not any(exec['tool_call'] == tool_call for exec in pending_tool_executions):
+                             final_tool_calls_to_process.append(tool_call)
+                             parsed_xml_data.append({'tool_call': tool_call})
 
 
                 all_tool_data_map = {} # tool_index -> {'tool_call': ...}
@@ -2323,6 +2315,9 @@ class ResponseProcessor:
         """Execute a single tool call and return the result."""
         span = self.trace.span(name=f"execute_tool.{tool_call['function_name']}", input=tool_call["arguments"])
         function_name = "unknown"
+        # Histogram label: registered tool name, or "mcp"/"unknown" to bound cardinality
+        metric_label = "unknown"
+        tool_start = time.perf_counter()
         try:
             # Set the tool_call_id for streaming context (used by shell tool for real-time output)
             tool_call_id = tool_call.get("tool_call_id", tool_call.get("id", ""))
@@ -2342,7 +2337,9 @@ class ResponseProcessor:
             available_functions = self.tool_registry.get_available_functions()
 
             tool_fn = available_functions.get(function_name)
-            if not tool_fn:
+            if tool_fn:
+                metric_label = function_name
+            else:
                 is_mcp_tool = False
                 
                 if self.thread_manager and hasattr(self.thread_manager, 'mcp_loader'):
@@ -2367,6 +2364,7 @@ class ResponseProcessor:
                         is_mcp_tool = True
 
                 if is_mcp_tool:
+                    metric_label = "mcp"
                     logger.info(f"🔀 [AUTO REDIRECT] Redirecting MCP tool '{function_name}' through execute_mcp_tool wrapper")
                     execute_mcp_tool_fn = available_functions.get('execute_mcp_tool')
                     if execute_mcp_tool_fn:
@@ -2409,6 +2407,7 @@ class ResponseProcessor:
                     tool_fn = available_functions.get(function_name)
                     
                     if tool_fn:
+                        metric_label = function_name
                         logger.info(f"✅ [JIT AUTO] Tool '{function_name}' auto-activated successfully")
                         logger.debug(f"📊 [JIT AUTO] Function cache now has {len(available_functions)} functions")
                     else:
@@ -2498,6 +2497,8 @@ class ResponseProcessor:
             logger.error(f"❌ Full traceback:", exc_info=True)
             span.end(status_message="critical_error", output=str(e), level="ERROR")
             return ToolResult(success=False, output=f"Critical error executing tool: {str(e)}")
+        finally:
+            timing.observe_tool(metric_label, time.perf_counter() - tool_start)
     
     async def _spark_auto_activate(self, function_name: str) -> bool:
         from core.jit import JITLoader
@@ -2712,8 +2713,8 @@ class ResponseProcessor:
     async def _execute_tools_in_parallel(self, tool_calls: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], ToolResult]]:
         """Execute tool calls in parallel and return results.
 
-        This method executes all tool calls simultaneously using asyncio.gather, which
-        can significantly improve performance when executing multiple independent tools.
+        Calls run concurrently through the tool scheduler (per-class limits,
+        deadlines, ordering of conflicting sandbox paths); results keep call order.
 
         Args:
             tool_calls: List of tool calls to execute
@@ -2736,7 +2737,7 @@ class ResponseProcessor:
             tasks = []
             for i, tool_call in enumerate(tool_calls):
                 logger.debug(f"📋 Creating task {i+1} for tool: {tool_call.get('function_name', 'unknown')}")
-                task = self._execute_tool(tool_call)
+                task = self._tool_scheduler.submit(tool_call, self._execute_tool)
                 tasks.append(task)
 
             logger.debug(f"✅ Created {len(tasks)} tasks for parallel execution")
@@ -3104,15 +3105,19 @@ class ResponseProcessor:
                 # This makes the result visible to the LLM in the next turn (but can be hidden from UI)
                 # Note: is_llm_message may be False during streaming to prevent partial results from being visible
                 # Acquire thread lock to prevent race conditions when multiple tools complete simultaneously
+                stored_message, stored_metadata = await offload_tool_result(tool_message, metadata)
                 thread_lock = await self._get_thread_lock(thread_id)
                 async with thread_lock:
                     message_obj = await self.add_message(
                         thread_id=thread_id,
                         type="tool",  # Special type for tool responses
-                        content=tool_message,  # Entire tool_message dict goes in content
+                        content=stored_message,  # Entire tool_message dict goes in content
                         is_llm_message=is_llm_message,
-                        metadata=metadata
+                        metadata=stored_metadata
                     )
+                if message_obj and stored_message is not tool_message:
+                    # Only the stored row holds a preview; stream the full output
+                    message_obj = {**message_obj, 'content': tool_message, 'metadata': metadata}
                 
                 # Log DB write for tool result (outside lock to avoid blocking)
                 if hasattr(self, '_log_db_write') and message_obj:
@@ -3164,15 +3169,19 @@ class ResponseProcessor:
             # XML tool calls use role="user" with only content field
             # Note: is_llm_message may be False during streaming to prevent partial results from being visible
             # Acquire thread lock to prevent race conditions when multiple tools complete simultaneously
+            stored_message, stored_metadata = await offload_tool_result(tool_message, metadata)
             thread_lock = await self._get_thread_lock(thread_id)
             async with thread_lock:
                 message_obj = await self.add_message(
                     thread_id=thread_id,
                     type="tool",  # Special type for tool responses
-                    content=tool_message,  # role="user" with only content
+                    content=stored_message,  # role="user" with only content
                     is_llm_message=is_llm_message,
-                    metadata=metadata
+                    metadata=stored_metadata
                 )
+            if message_obj and stored_message is not tool_message:
+                # Only the stored row holds a preview; stream the full output
+                message_obj = {**message_obj, 'content': tool_message, 'metadata': metadata}
             
             # Log DB write for tool result (outside lock to avoid blocking)
             if hasattr(self, '_log_db_write') and message_obj:
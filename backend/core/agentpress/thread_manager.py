@@ -11,12 +11,16 @@ if TYPE_CHECKING:
 from core.services.llm import make_llm_api_call, LLMError
 from core.agentpress.prompt_caching import apply_anthropic_caching_strategy, validate_cache_blocks
 from core.agentpress.tool import Tool
-from core.agentpress.tool_registry import ToolRegistry
+from core.agentpress.tool_registry import ToolRegistry, created_instance
 from core.agentpress.context_manager import ContextManager
+from core.agentpress.thread_message_cache import ThreadMessageCache
+from core.agentpress.message_writer import MessageWriter
+from core.agentpress.token_accounting import token_estimator
 from core.agentpress.response_processor import ResponseProcessor, ProcessorConfig
 from core.agentpress.error_processor import ErrorProcessor
 from core.services.supabase import DBConnection
 from core.utils.logger import logger
+from core.utils import timing
 from langfuse.client import StatefulGenerationClient, StatefulTraceClient
 from core.services.langfuse import langfuse
 from datetime import datetime, timezone
@@ -56,6 +60,10 @@ class ThreadManager:
         )
         
         self._memory_context: Optional[Dict[str, Any]] = None
+        self._thread_account_ids: Dict[str, str] = {}
+        self._message_cache = ThreadMessageCache()
+        self._message_writer = MessageWriter(self.db)
+        self._calibration_sample: Optional[tuple] = None
 
     def set_memory_context(self, memory_context: Optional[Dict[str, Any]]):
         self._memory_context = memory_context
@@ -100,8 +108,6 @@ class ThreadManager:
         agent_id: Optional[str] = None,
         agent_version_id: Optional[str] = None
     ):
-        client = await self.db.client
-
         data_to_insert = {
             'thread_id': thread_id,
             'type': type,
@@ -115,13 +121,22 @@ class ThreadManager:
         if agent_version_id:
             data_to_insert['agent_version_id'] = agent_version_id
 
+        # Status/telemetry rows are written behind in bulk; the row (with its ID) is returned now
+        if MessageWriter.should_defer(type, is_llm_message):
+            return self._message_writer.add(data_to_insert)
+
+        client = await self.db.client
         try:
             result = await client.table('messages').insert(data_to_insert).execute()
 
             if result.data and len(result.data) > 0 and 'message_id' in result.data[0]:
                 saved_message = result.data[0]
+                # Rows written behind from now on are stamped after this one
+                self._message_writer.observe_created_at(saved_message.get('created_at'))
                 
                 if type == "llm_response_end" and isinstance(content, dict):
+                    self._message_cache.record_llm_response_end(thread_id, content)
+                    await self._observe_token_usage(content)
                     await self._handle_billing(thread_id, content, saved_message)
                 
                 return saved_message
@@ -132,6 +147,30 @@ class ThreadManager:
             logger.error(f"Failed to add message to thread {thread_id}: {str(e)}", exc_info=True)
             raise
 
+    async def _observe_token_usage(self, content: dict):
+        sample, self._calibration_sample = self._calibration_sample, None
+        usage = content.get("usage") or {}
+        if not sample or usage.get("estimated") or usage.get("fallback"):
+            return
+        model, raw_estimate, tools_tokens = sample
+        prompt_tokens = int(usage.get("prompt_tokens", 0) or 0)
+        token_estimator.observe(model, raw_estimate, prompt_tokens - tools_tokens)
+        await token_estimator.persist_calibration()
+
+    async def _get_thread_account_id(self, thread_id: str) -> Optional[str]:
+        # A thread's account never changes, so look it up at most once per thread
+        if thread_id == self.thread_id and self.account_id:
+            return self.account_id
+        if thread_id in self._thread_account_ids:
+            return self._thread_account_ids[thread_id]
+        
+        client = await self.db.client
+        thread_row = await client.table('threads').select('account_id').eq('thread_id', thread_id).limit(1).execute()
+        account_id = thread_row.data[0]['account_id'] if thread_row.data and len(thread_row.data) > 0 else None
+        if account_id:
+            self._thread_account_ids[thread_id] = account_id
+        return account_id
+
     async def _handle_billing(self, thread_id: str, content: dict, saved_message: dict):
         try:
             llm_response_id = content.get("llm_response_id", "unknown")
@@ -163,9 +202,7 @@ class ThreadManager:
             usage_type = "FALLBACK ESTIMATE" if is_fallback else ("ESTIMATED" if is_estimated else "EXACT")
             logger.debug(f"💰 Usage type: {usage_type} - prompt={prompt_tokens}, completion={completion_tokens}, cache_read={cache_read_tokens}, cache_creation={cache_creation_tokens}")
             
-            client = await self.db.client
-            thread_row = await client.table('threads').select('account_id').eq('thread_id', thread_id).limit(1).execute()
-            user_id = thread_row.data[0]['account_id'] if thread_row.data and len(thread_row.data) > 0 else None
+            user_id = await self._get_thread_account_id(thread_id)
             
             if user_id and (prompt_tokens > 0 or completion_tokens > 0):
 
@@ -177,7 +214,8 @@ class ThreadManager:
                 else:
                     logger.debug(f"❌ NO CACHE: All {prompt_tokens} tokens processed fresh")
 
-                deduct_result = await billing_integration.deduct_usage(
+                # Queued to the usage ledger; committed in batches off the streaming path
+                deduct_result = await billing_integration.record_usage(
                     account_id=user_id,
                     prompt_tokens=prompt_tokens,
                     completion_tokens=completion_tokens,
@@ -189,7 +227,7 @@ class ThreadManager:
                 )
                 
                 if deduct_result.get('success'):
-                    logger.debug(f"Successfully deducted ${deduct_result.get('cost', 0):.6f}")
+                    logger.debug(f"Successfully billed ${deduct_result.get('cost', 0):.6f} (queued={deduct_result.get('queued', False)})")
                 else:
                     logger.error(f"Failed to deduct credits: {deduct_result}")
         except Exception as e:
@@ -232,10 +270,70 @@ class ThreadManager:
         
         return message
 
+    def _parse_llm_message_row(self, item: Dict[str, Any], lightweight: bool = False) -> Optional[Dict[str, Any]]:
+        """Turn a messages row into an LLM message (applying compression overrides); None if skipped."""
+        content = item['content']
+        metadata = item.get('metadata', {})
+        is_compressed = False
+        
+        if not lightweight and isinstance(metadata, dict) and metadata.get('compressed'):
+            compressed_content = metadata.get('compressed_content')
+            if compressed_content:
+                content = compressed_content
+                is_compressed = True
+        
+        # Parse content and add message_id
+        if isinstance(content, str):
+            try:
+                parsed_item = json.loads(content)
+                parsed_item['message_id'] = item['message_id']
+                
+                # Skip empty user messages (defensive filter for legacy data)
+                if parsed_item.get('role') == 'user':
+                    msg_content = parsed_item.get('content', '')
+                    if isinstance(msg_content, str) and not msg_content.strip():
+                        logger.warning(f"Skipping empty user message {item['message_id']} from LLM context")
+                        return None
+                
+                return parsed_item
+            except json.JSONDecodeError:
+                # If compressed, content is a plain string (not JSON) - this is expected
+                if is_compressed:
+                    return {
+                        'role': 'user',
+                        'content': content,
+                        'message_id': item['message_id']
+                    }
+                logger.error(f"Failed to parse message: {content[:100]}")
+                return None
+        elif isinstance(content, dict):
+            content['message_id'] = item['message_id']
+            
+            if content.get('role') == 'user':
+                msg_content = content.get('content', '')
+                if isinstance(msg_content, str) and not msg_content.strip():
+                    logger.warning(f"Skipping empty user message {item['message_id']} from LLM context")
+                    return None
+            
+            if content.get('role') == 'assistant' and content.get('tool_calls'):
+                content = self._validate_tool_calls_in_message(content)
+            
+            return content
+        else:
+            logger.warning(f"Unexpected content type: {type(content)}, attempting to use as-is")
+            return {
+                'role': 'user',
+                'content': str(content),
+                'message_id': item['message_id']
+            }
+
     async def get_llm_messages(self, thread_id: str, lightweight: bool = False) -> List[Dict[str, Any]]:
         """
         Get messages for a thread.
         
+        Full reads go through the per-run message cache: the first call loads the
+        thread, later calls (auto-continue iterations) only fetch new rows.
+        
         Args:
             thread_id: Thread ID to get messages for
             lightweight: If True, fetch only recent messages with minimal payload (for bootstrap)
@@ -244,89 +342,15 @@ class ThreadManager:
         client = await self.db.client
 
         try:
-            all_messages = []
-            
             if lightweight:
                 result = await client.table('messages').select('message_id, type, content').eq('thread_id', thread_id).eq('is_llm_message', True).order('created_at').limit(100).execute()
-                
-                if result.data:
-                    all_messages = result.data
+                rows = result.data or []
+                parsed = (self._parse_llm_message_row(item, lightweight=True) for item in rows)
             else:
-                batch_size = 1000
-                offset = 0
-                
-                while True:
-                    result = await client.table('messages').select('message_id, type, content, metadata').eq('thread_id', thread_id).eq('is_llm_message', True).order('created_at').range(offset, offset + batch_size - 1).execute()
-                    
-                    if not result.data:
-                        break
-                        
-                    all_messages.extend(result.data)
-                    if len(result.data) < batch_size:
-                        break
-                    offset += batch_size
-
-            if not all_messages:
-                return []
-
-            messages = []
-            for item in all_messages:
-                content = item['content']
-                metadata = item.get('metadata', {})
-                is_compressed = False
-                
-                if not lightweight and isinstance(metadata, dict) and metadata.get('compressed'):
-                    compressed_content = metadata.get('compressed_content')
-                    if compressed_content:
-                        content = compressed_content
-                        is_compressed = True
-                
-                # Parse content and add message_id
-                if isinstance(content, str):
-                    try:
-                        parsed_item = json.loads(content)
-                        parsed_item['message_id'] = item['message_id']
-                        
-                        # Skip empty user messages (defensive filter for legacy data)
-                        if parsed_item.get('role') == 'user':
-                            msg_content = parsed_item.get('content', '')
-                            if isinstance(msg_content, str) and not msg_content.strip():
-                                logger.warning(f"Skipping empty user message {item['message_id']} from LLM context")
-                                continue
-                        
-                        messages.append(parsed_item)
-                    except json.JSONDecodeError:
-                        # If compressed, content is a plain string (not JSON) - this is expected
-                        if is_compressed:
-                            messages.append({
-                                'role': 'user',
-                                'content': content,
-                                'message_id': item['message_id']
-                            })
-                        else:
-                            logger.error(f"Failed to parse message: {content[:100]}")
-                elif isinstance(content, dict):
-                    content['message_id'] = item['message_id']
-                    
-                    if content.get('role') == 'user':
-                        msg_content = content.get('content', '')
-                        if isinstance(msg_content, str) and not msg_content.strip():
-                            logger.warning(f"Skipping empty user message {item['message_id']} from LLM context")
-                            continue
-                    
-                    if content.get('role') == 'assistant' and content.get('tool_calls'):
-                        content = self._validate_tool_calls_in_message(content)
-                    
-                    messages.append(content)
-                else:
-                    logger.warning(f"Unexpected content type: {type(content)}, attempting to use as-is")
-                    messages.append({
-                        'role': 'user',
-                        'content': str(content),
-                        'message_id': item['message_id']
-                    })
+                rows = await self._message_cache.get_rows(client, thread_id)
+                parsed = (self._message_cache.parse_row(thread_id, item, self._parse_llm_message_row) for item in rows)
 
-            return messages
+            return [message for message in parsed if message is not None]
 
         except Exception as e:
             logger.error(f"Failed to get messages for thread {thread_id}: {str(e)}", exc_info=True)
@@ -401,6 +425,9 @@ class ThreadManager:
         run_number = auto_continue_state['count'] + 1
         
         logger.debug(f"🔥 LLM API call iteration #{run_number} of run")
+
+        # Turn boundary: persist the previous turn's status rows without waiting
+        self._message_writer.flush_in_background()
         
         # CRITICAL: Ensure config is always a ProcessorConfig object
         if not isinstance(config, ProcessorConfig):
@@ -427,21 +454,10 @@ class ThreadManager:
                     from litellm.utils import token_counter
                     client = await self.db.client
                     
-                    # Query last llm_response_end message from messages table (already stored there!)
-                    last_usage_result = await client.table('messages')\
-                        .select('content')\
-                        .eq('thread_id', thread_id)\
-                        .eq('type', 'llm_response_end')\
-                        .order('created_at', desc=True)\
-                        .limit(1)\
-                        .maybe_single()\
-                        .execute()
+                    # Last llm_response_end content: queried once per run, then kept in memory
+                    llm_end_content = await self._message_cache.get_last_usage(client, thread_id)
                     
-                    if last_usage_result and last_usage_result.data:
-                        llm_end_content = last_usage_result.data.get('content', {})
-                        if isinstance(llm_end_content, str):
-                            llm_end_content = json.loads(llm_end_content)
-                        
+                    if llm_end_content:
                         usage = llm_end_content.get('usage', {})
                         stored_model = llm_end_content.get('model', '')
                         
@@ -540,9 +556,9 @@ class ThreadManager:
             # Always fetch messages (needed for LLM call)
             # Fast path just skips compression, not fetching!
             import time
-            fetch_start = time.time()
-            messages = await self.get_llm_messages(thread_id)
-            logger.debug(f"⏱️ [TIMING] get_llm_messages(): {(time.time() - fetch_start) * 1000:.1f}ms ({len(messages)} messages)")
+            with timing.span("message_fetch") as fetch_span:
+                messages = await self.get_llm_messages(thread_id)
+            logger.debug(f"⏱️ [TIMING] get_llm_messages(): {fetch_span.elapsed_ms:.1f}ms ({len(messages)} messages)")
             
             # Note: We no longer need to manually append partial assistant messages
             # because we now save complete assistant messages with tool calls before auto-continuing
@@ -559,26 +575,28 @@ class ThreadManager:
                     # We know we're over threshold, compress now
                     compress_start = time.time()
                     logger.debug(f"Applying context compression on {len(messages)} messages")
-                    context_manager = ContextManager()
+                    context_manager = ContextManager(on_compressed=self._message_cache.apply_compression)
                     compressed_messages = await context_manager.compress_messages(
                         messages, llm_model, max_tokens=llm_max_tokens, 
                         actual_total_tokens=estimated_total_tokens,  # Use estimated from fast check!
                         system_prompt=system_prompt,
                         thread_id=thread_id
                     )
+                    timing.observe("compression", time.time() - compress_start)
                     logger.debug(f"⏱️ [TIMING] Context compression: {(time.time() - compress_start) * 1000:.1f}ms ({len(messages)} -> {len(compressed_messages)} messages)")
                     messages = compressed_messages
                 else:
                     # First turn or no fast path data: Run compression check
                     compress_start = time.time()
                     logger.debug(f"Running compression check on {len(messages)} messages")
-                    context_manager = ContextManager()
+                    context_manager = ContextManager(on_compressed=self._message_cache.apply_compression)
                     compressed_messages = await context_manager.compress_messages(
                         messages, llm_model, max_tokens=llm_max_tokens, 
                         actual_total_tokens=None,
                         system_prompt=system_prompt,
                         thread_id=thread_id
                     )
+                    timing.observe("compression", time.time() - compress_start)
                     logger.debug(f"⏱️ [TIMING] Compression check: {(time.time() - compress_start) * 1000:.1f}ms")
                     messages = compressed_messages
 
@@ -587,15 +605,9 @@ class ThreadManager:
             if ENABLE_PROMPT_CACHING:
                 try:
                     client = await self.db.client
-                    result = await client.table('threads').select('metadata').eq('thread_id', thread_id).single().execute()
-                    if result and result.data:
-                        metadata = result.data.get('metadata', {})
-                        if metadata.get('cache_needs_rebuild'):
-                            force_rebuild = True
-                            logger.info("🔄 Rebuilding cache due to compression/model change")
-                            # Clear the flag
-                            metadata['cache_needs_rebuild'] = False
-                            await client.table('threads').update({'metadata': metadata}).eq('thread_id', thread_id).execute()
+                    if await self._message_cache.consume_rebuild_flag(client, thread_id):
+                        force_rebuild = True
+                        logger.info("🔄 Rebuilding cache due to compression/model change")
                 except Exception as e:
                     logger.debug(f"Failed to check cache_needs_rebuild flag: {e}")
 
@@ -614,6 +626,7 @@ class ThreadManager:
                     force_recalc=force_rebuild
                 )
                 prepared_messages = validate_cache_blocks(prepared_messages, llm_model)
+                timing.observe("prompt_caching", time.time() - cache_start)
                 logger.debug(f"⏱️ [TIMING] Prompt caching: {(time.time() - cache_start) * 1000:.1f}ms")
             else:
                 if ENABLE_PROMPT_CACHING and len(messages_with_context) <= 2:
@@ -622,14 +635,27 @@ class ThreadManager:
 
             # Get tool schemas for LLM API call (after compression)
             schema_start = time.time()
-            openapi_tool_schemas = self.tool_registry.get_openapi_schemas() if config.native_tool_calling else None
+            schema_snapshot = self.tool_registry.get_schema_snapshot() if config.native_tool_calling else None
+            openapi_tool_schemas = self.tool_registry.get_openapi_schemas() if schema_snapshot else None
             logger.debug(f"⏱️ [TIMING] Get tool schemas: {(time.time() - schema_start) * 1000:.1f}ms")
 
+            # Remember the local estimate for this prompt; the provider's usage in
+            # llm_response_end calibrates the estimator against it
+            try:
+                tools_tokens = token_estimator.tools_estimate(
+                    llm_model, openapi_tool_schemas, serialized=schema_snapshot.json if schema_snapshot else None
+                )
+                raw_estimate = token_estimator.raw_estimate(llm_model, messages_with_context, system_prompt)
+                self._calibration_sample = (llm_model, raw_estimate, tools_tokens)
+            except Exception as e:
+                self._calibration_sample = None
+                logger.debug(f"Token calibration sample failed: {e}")
+
             # Update generation tracking
             if generation:
                 try:
                     # Convert tools to JSON string for Langfuse compatibility
-                    tools_param = json.dumps(openapi_tool_schemas) if openapi_tool_schemas else None
+                    tools_param = schema_snapshot.json if openapi_tool_schemas else None
                     generation.update(
                         input=prepared_messages,
                         start_time=datetime.now(timezone.utc),
@@ -655,7 +681,7 @@ class ThreadManager:
             
             # Ensure we have a ContextManager instance for validation (may not exist if compression was skipped)
             if 'context_manager' not in locals():
-                context_manager = ContextManager()
+                context_manager = ContextManager(on_compressed=self._message_cache.apply_compression)
             
             is_valid, orphaned_ids, unanswered_ids = context_manager.validate_tool_call_pairing(prepared_messages)
             if not is_valid:
@@ -674,6 +700,7 @@ class ThreadManager:
                     logger.debug(f"✅ Message structure repaired successfully")
             else:
                 logger.debug(f"✅ Pre-send validation passed: all tool calls properly paired")
+            timing.observe("pre_send_validation", time.time() - validation_start)
             logger.debug(f"⏱️ [TIMING] Pre-send validation: {(time.time() - validation_start) * 1000:.1f}ms")
             
             llm_call_start = time.time()
@@ -698,6 +725,7 @@ class ThreadManager:
                 
                 # For streaming, the call returns immediately with a generator
                 # For non-streaming, this is the full response time
+                timing.observe("llm_call" if not stream else "llm_call_initiate", time.time() - llm_call_start)
                 if not stream:
                     logger.debug(f"⏱️ [TIMING] LLM API call (non-streaming): {(time.time() - llm_call_start) * 1000:.1f}ms")
                 else:
@@ -930,11 +958,17 @@ class ThreadManager:
     
     async def cleanup(self):
         """Explicitly release tool references for garbage collection."""
+        try:
+            await self._message_writer.close()
+        except Exception as e:
+            logger.warning(f"Failed to flush buffered messages: {e}")
+
         if hasattr(self, 'tool_registry') and self.tool_registry:
             # First, call cleanup on any tool instances that support it (e.g., MCPToolWrapper)
             seen_instances = set()
             for tool_info in self.tool_registry.tools.values():
-                tool_instance = tool_info.get('instance')
+                # Lazily registered tools that were never called have nothing to clean up
+                tool_instance = created_instance(tool_info)
                 if tool_instance and id(tool_instance) not in seen_instances:
                     seen_instances.add(id(tool_instance))
                     if hasattr(tool_instance, 'cleanup'):
@@ -0,0 +1,182 @@
+"""
+Per-run cache of a thread's LLM messages.
+
+Within one agent run the message history only grows, yet every auto-continue
+iteration used to page the whole thread from the DB, re-parse every row's
+JSON, re-query the last `llm_response_end` row and read/write
+`threads.metadata` for the cache rebuild flag. ThreadMessageCache keeps:
+
+- the raw rows (and their parsed form) loaded on the first iteration, then
+  fetches only rows created at or after the last seen `created_at`
+  (deduplicated by message_id);
+- compression overrides applied in place when ContextManager saves them, so
+  cached rows match what a fresh read would return;
+- the latest `llm_response_end` content (usage snapshot) in memory, updated
+  as ThreadManager writes new ones;
+- whether the thread's `cache_needs_rebuild` flag has already been consumed.
+
+It is owned by a ThreadManager (one per run), so changes made to the thread
+outside the run (edits, deletes) are picked up by the next run.
+"""
+
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+from core.agentpress.tool_result_blobs import hydrate_rows
+from core.utils.logger import logger
+
+MESSAGE_PAGE_SIZE = 1000
+_ROW_COLUMNS = 'message_id, type, content, metadata, created_at'
+
+
+class _ThreadEntry:
+    __slots__ = ('rows', 'index', 'parsed', 'last_created_at', 'last_usage', 'usage_loaded', 'rebuild_checked')
+
+    def __init__(self):
+        self.rows: List[Dict[str, Any]] = []
+        self.index: Dict[str, int] = {}
+        # message_id -> parsed message (or None when the row is skipped)
+        self.parsed: Dict[str, Optional[Dict[str, Any]]] = {}
+        self.last_created_at: Optional[str] = None
+        self.last_usage: Optional[Dict[str, Any]] = None
+        self.usage_loaded = False
+        self.rebuild_checked = False
+
+
+class ThreadMessageCache:
+    def __init__(self):
+        self._threads: Dict[str, _ThreadEntry] = {}
+        self.full_loads = 0
+        self.delta_fetches = 0
+        self.rows_fetched = 0
+
+    def _entry(self, thread_id: str) -> _ThreadEntry:
+        entry = self._threads.get(thread_id)
+        if entry is None:
+            entry = self._threads[thread_id] = _ThreadEntry()
+        return entry
+
+    async def _fetch_pages(self, client, thread_id: str, since: Optional[str]) -> List[Dict[str, Any]]:
+        rows: List[Dict[str, Any]] = []
+        offset = 0
+        while True:
+            query = client.table('messages').select(_ROW_COLUMNS).eq('thread_id', thread_id).eq('is_llm_message', True)
+            if since:
+                # gte (not gt) so rows sharing the boundary timestamp aren't missed; deduped by message_id
+                query = query.gte('created_at', since)
+            result = await query.order('created_at').range(offset, offset + MESSAGE_PAGE_SIZE - 1).execute()
+            if not result.data:
+                break
+            rows.extend(result.data)
+            if len(result.data) < MESSAGE_PAGE_SIZE:
+                break
+            offset += MESSAGE_PAGE_SIZE
+        return rows
+
+    async def get_rows(self, client, thread_id: str) -> List[Dict[str, Any]]:
+        """All LLM message rows for the thread, fetching only new rows after the first call."""
+        entry = self._entry(thread_id)
+        is_delta = entry.last_created_at is not None
+        new_rows = await self._fetch_pages(client, thread_id, entry.last_created_at)
+        # Large tool outputs stored out of line; fetched once per run as rows arrive
+        await hydrate_rows([row for row in new_rows if row.get('message_id') not in entry.index])
+
+        appended = 0
+        for row in new_rows:
+            message_id = row.get('message_id')
+            if message_id in entry.index:
+                continue
+            entry.index[message_id] = len(entry.rows)
+            entry.rows.append(row)
+            appended += 1
+            created_at = row.get('created_at')
+            if created_at and (entry.last_created_at is None or created_at > entry.last_created_at):
+                entry.last_created_at = created_at
+
+        self.rows_fetched += len(new_rows)
+        if is_delta:
+            self.delta_fetches += 1
+            logger.debug(f"Thread message cache delta for {thread_id}: +{appended} rows ({len(entry.rows)} total)")
+        else:
+            self.full_loads += 1
+        return entry.rows
+
+    def parse_row(self, thread_id: str, row: Dict[str, Any], parse: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """Parse a cached row once per run; returns a shallow copy callers may modify."""
+        entry = self._threads.get(thread_id)
+        message_id = row.get('message_id')
+        if entry is None or message_id not in entry.index:
+            return parse(row)
+        if message_id not in entry.parsed:
+            entry.parsed[message_id] = parse(row)
+        message = entry.parsed[message_id]
+        return dict(message) if message is not None else None
+
+    def apply_compression(self, compressed_messages: List[Dict[str, Any]]) -> None:
+        """Mirror ContextManager.save_compressed_messages onto cached rows."""
+        for update in compressed_messages:
+            message_id = update.get('message_id')
+            compressed_content = update.get('compressed_content')
+            if not message_id or not compressed_content:
+                continue
+            for entry in self._threads.values():
+                pos = entry.index.get(message_id)
+                if pos is None:
+                    continue
+                row = entry.rows[pos]
+                metadata = dict(row.get('metadata') or {})
+                metadata['compressed'] = True
+                metadata['compressed_content'] = compressed_content
+                if update.get('is_omission'):
+                    metadata['omitted'] = True
+                row['metadata'] = metadata
+                entry.parsed.pop(message_id, None)
+
+    async def get_last_usage(self, client, thread_id: str) -> Optional[Dict[str, Any]]:
+        """Content of the latest llm_response_end message (queried once per run)."""
+        entry = self._entry(thread_id)
+        if not entry.usage_loaded:
+            result = await client.table('messages')\
+                .select('content')\
+                .eq('thread_id', thread_id)\
+                .eq('type', 'llm_response_end')\
+                .order('created_at', desc=True)\
+                .limit(1)\
+                .maybe_single()\
+                .execute()
+            content = result.data.get('content') if result and result.data else None
+            if isinstance(content, str):
+                content = json.loads(content)
+            entry.last_usage = content or None
+            entry.usage_loaded = True
+        return entry.last_usage
+
+    def record_llm_response_end(self, thread_id: str, content: Dict[str, Any]) -> None:
+        entry = self._entry(thread_id)
+        entry.last_usage = content
+        entry.usage_loaded = True
+
+    async def consume_rebuild_flag(self, client, thread_id: str) -> bool:
+        """Read and clear threads.metadata.cache_needs_rebuild once per run."""
+        entry = self._entry(thread_id)
+        if entry.rebuild_checked:
+            return False
+        entry.rebuild_checked = True
+
+        result = await client.table('threads').select('metadata').eq('thread_id', thread_id).single().execute()
+        if not result or not result.data:
+            return False
+        metadata = result.data.get('metadata', {}) or {}
+        if not metadata.get('cache_needs_rebuild'):
+            return False
+        metadata['cache_needs_rebuild'] = False
+        await client.table('threads').update({'metadata': metadata}).eq('thread_id', thread_id).execute()
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "threads": len(self._threads),
+            "full_loads": self.full_loads,
+            "delta_fetches": self.delta_fetches,
+            "rows_fetched": self.rows_fetched,
+        }
@@ -0,0 +1,337 @@
+"""
+Memoized token accounting for context management.
+
+Compression used to re-tokenize the whole conversation after every tier and
+on every omission iteration, and prompt caching tokenized each text block
+(including base64 image data URLs) with no memoization. This module keeps:
+
+- A per-message token count cache keyed by model + message_id + content
+  hash, in a process-local LRU backed by Redis (so counts survive across
+  turns and workers). A compressed or truncated message gets a new content
+  hash, so stale counts are never reused.
+- A cheap image token estimator that reads dimensions from the image header
+  instead of tokenizing base64 payloads.
+- TokenTally, which anchors a single exact count (provider tokenizer, with
+  caching overhead) and tracks totals incrementally from cached per-message
+  counts as messages are compressed or dropped.
+- TokenEstimator, the in-process replacement for remote count-tokens calls:
+  per-model local tokenizers (via LiteLLM) scaled by a per-model correction
+  factor learned from the real `usage` the providers report.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import struct
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from litellm.utils import token_counter
+from core.utils.logger import logger
+
+TOKEN_COUNT_CACHE_TTL = 7 * 24 * 3600
+TOKEN_COUNT_LOCAL_CACHE_SIZE = 20000
+
+# Anthropic bills images at ~(width * height) / 750 tokens and downscales
+# anything whose long edge exceeds 1568px, which caps an image at ~1600 tokens.
+IMAGE_TOKENS_PER_PIXEL = 1 / 750
+IMAGE_MAX_EDGE = 1568
+IMAGE_DEFAULT_TOKENS = 1600
+IMAGE_MIN_TOKENS = 85
+
+# "local" (default): estimate in-process; "remote": verify with provider count-tokens APIs
+TOKEN_COUNT_MODE = os.getenv("TOKEN_COUNT_MODE", "local").lower()
+CALIBRATION_ALPHA = 0.2             # EMA weight of each new usage observation
+CALIBRATION_BOUNDS = (0.5, 2.0)     # Ratios outside this are treated as outliers
+CALIBRATION_PERSIST_INTERVAL = 60   # Seconds between writes of learned factors to Redis
+
+
+def _read_image_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """Return (width, height) from a PNG/GIF/JPEG/WebP header, if recognisable."""
+    if data.startswith(b'\x89PNG\r\n\x1a\n') and len(data) >= 24:
+        return struct.unpack('>II', data[16:24])
+    if data[:6] in (b'GIF87a', b'GIF89a') and len(data) >= 10:
+        return struct.unpack('<HH', data[6:10])
+    if data.startswith(b'RIFF') and data[8:12] == b'WEBP' and len(data) >= 30:
+        chunk = data[12:16]
+        if chunk == b'VP8X':
+            width = int.from_bytes(data[24:27], 'little') + 1
+            height = int.from_bytes(data[27:30], 'little') + 1
+            return width, height
+        if chunk == b'VP8 ' and len(data) >= 30:
+            width, height = struct.unpack('<HH', data[26:30])
+            return width & 0x3FFF, height & 0x3FFF
+        return None
+    if data.startswith(b'\xff\xd8'):
+        i = 2
+        while i + 9 < len(data):
+            if data[i] != 0xFF:
+                i += 1
+                continue
+            marker = data[i + 1]
+            if marker in (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF):
+                height, width = struct.unpack('>HH', data[i + 5:i + 9])
+                return width, height
+            segment_length = struct.unpack('>H', data[i + 2:i + 4])[0]
+            i += 2 + segment_length
+    return None
+
+
+def estimate_image_tokens(image_url: str) -> int:
+    """Estimate the tokens an image costs without tokenizing its payload.
+
+    For base64 data URLs only the header is decoded to get dimensions; remote
+    URLs (and unrecognised formats) are charged the per-image maximum.
+    """
+    if not image_url or not image_url.startswith('data:'):
+        return IMAGE_DEFAULT_TOKENS
+
+    _, _, payload = image_url.partition(',')
+    try:
+        # JPEG SOF markers can sit after EXIF data; 64KB of base64 covers typical headers
+        head = payload[:65536]
+        head = head[:len(head) - len(head) % 4]
+        size = _read_image_size(base64.b64decode(head))
+    except Exception:
+        size = None
+
+    if not size or not size[0] or not size[1]:
+        return IMAGE_DEFAULT_TOKENS
+
+    width, height = size
+    scale = min(1.0, IMAGE_MAX_EDGE / max(width, height))
+    tokens = int(width * scale * height * scale * IMAGE_TOKENS_PER_PIXEL)
+    return max(IMAGE_MIN_TOKENS, min(tokens, IMAGE_DEFAULT_TOKENS))
+
+
+def _model_family(model: str) -> str:
+    return (model or 'default').split('/')[-1]
+
+
+def content_digest(value: Any) -> str:
+    """Stable digest of a message or text block (cross-process, unlike hash())."""
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.blake2b(value.encode('utf-8', 'replace'), digest_size=16).hexdigest()
+
+
+def _split_images(message: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """Return the message with image blocks removed, plus their estimated tokens."""
+    content = message.get('content')
+    if not isinstance(content, list):
+        return message, 0
+
+    image_tokens = 0
+    kept = []
+    for block in content:
+        if isinstance(block, dict) and block.get('type') == 'image_url':
+            image_url = block.get('image_url')
+            url = image_url.get('url', '') if isinstance(image_url, dict) else str(image_url or '')
+            image_tokens += estimate_image_tokens(url)
+        else:
+            kept.append(block)
+
+    if not image_tokens:
+        return message, 0
+    stripped = dict(message)
+    stripped['content'] = kept
+    return stripped, image_tokens
+
+
+class TokenCountCache:
+    """Per-message token counts: in-process LRU in front of Redis."""
+
+    def __init__(self, max_local_entries: int = TOKEN_COUNT_LOCAL_CACHE_SIZE, ttl: int = TOKEN_COUNT_CACHE_TTL):
+        self._local: OrderedDict[str, int] = OrderedDict()
+        self._max_local_entries = max_local_entries
+        self._ttl = ttl
+        # Keys counted locally that haven't been written to Redis yet
+        self._unpersisted: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model: str, message: Dict[str, Any]) -> str:
+        message_id = message.get('message_id') or ''
+        return f"{_model_family(model)}:{message_id}:{content_digest(message)}"
+
+    def _remember(self, key: str, count: int) -> None:
+        self._local[key] = count
+        self._local.move_to_end(key)
+        while len(self._local) > self._max_local_entries:
+            self._local.popitem(last=False)
+
+    def count_message(self, message: Dict[str, Any], model: str) -> int:
+        """Token count for one message (role overhead, text, tool calls, images)."""
+        key = self.make_key(model, message)
+        cached = self._local.get(key)
+        if cached is not None:
+            self._local.move_to_end(key)
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        stripped, image_tokens = _split_images(message)
+        try:
+            count = token_counter(model=model, messages=[stripped]) + image_tokens
+        except Exception as e:
+            logger.debug(f"token_counter failed for message, using estimate: {e}")
+            count = len(json.dumps(stripped, default=str)) // 4 + image_tokens
+
+        self._remember(key, count)
+        if message.get('message_id'):
+            self._unpersisted[key] = count
+        return count
+
+    def count_messages(self, messages: List[Dict[str, Any]], model: str) -> int:
+        return sum(self.count_message(msg, model) for msg in messages if isinstance(msg, dict))
+
+    async def prefetch(self, messages: List[Dict[str, Any]], model: str) -> None:
+        """Load persisted counts for messages not already in the local cache."""
+        keys = []
+        for msg in messages:
+            if isinstance(msg, dict) and msg.get('message_id'):
+                key = self.make_key(model, msg)
+                if key not in self._local:
+                    keys.append(key)
+        if not keys:
+            return
+        try:
+            from core.services import redis
+            values = await redis.mget([f"token_count:{k}" for k in keys])
+        except Exception as e:
+            logger.debug(f"Token count prefetch failed: {e}")
+            return
+        for key, value in zip(keys, values):
+            if value is not None:
+                try:
+                    self._remember(key, int(value))
+                except ValueError:
+                    pass
+
+    async def persist(self) -> None:
+        """Write counts computed since the last persist to Redis."""
+        if not self._unpersisted:
+            return
+        pending, self._unpersisted = self._unpersisted, {}
+        try:
+            from core.services import redis
+            await redis.mset({f"token_count:{key}": count for key, count in pending.items()}, ex=self._ttl)
+        except Exception as e:
+            logger.debug(f"Token count persist failed: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._local)}
+
+
+class TokenTally:
+    """Incremental conversation total anchored on one exact count.
+
+    The offset between the exact count (system prompt, cache_control
+    overhead, provider tokenizer) and the sum of cached per-message counts is
+    taken once; later totals only need cache lookups for unchanged messages
+    and tokenization for messages whose content actually changed.
+
+    The offset is kept in raw tokenizer units and the model's calibration
+    factor is applied to the whole sum, so removing a message also removes
+    its share of the calibration.
+    """
+
+    def __init__(self, model: str, messages: List[Dict[str, Any]], exact_total: int, cache: Optional[TokenCountCache] = None):
+        self.model = model
+        self.cache = cache or token_count_cache
+        self.factor = token_estimator.factor(model)
+        self.offset = exact_total / self.factor - self.cache.count_messages(messages, model)
+
+    def total(self, messages: List[Dict[str, Any]]) -> int:
+        return max(0, int((self.offset + self.cache.count_messages(messages, self.model)) * self.factor))
+
+
+class TokenEstimator:
+    """Local token estimation calibrated against provider-reported usage.
+
+    estimate() sums memoized per-message counts from the model's local
+    tokenizer and multiplies by a per-model correction factor. observe()
+    feeds back the provider's actual prompt token count for a prompt whose
+    raw estimate is known, nudging the factor with an EMA. Factors are shared
+    between workers through the `token_calibration` Redis hash.
+    """
+
+    def __init__(self, cache: Optional[TokenCountCache] = None):
+        self.cache = cache or token_count_cache
+        self._factors: Dict[str, float] = {}
+        self._loaded: set = set()
+        self._last_persist = 0.0
+        self.observations = 0
+
+    def raw_estimate(self, model: str, messages: List[Dict[str, Any]], system_prompt: Optional[Dict[str, Any]] = None) -> int:
+        total = self.cache.count_messages(messages, model)
+        if system_prompt:
+            total += self.cache.count_message(system_prompt, model)
+        return total
+
+    def tools_estimate(self, model: str, tool_schemas: Optional[List[Dict[str, Any]]], serialized: Optional[str] = None) -> int:
+        """Tokens taken by tool schemas (sent with the prompt but not part of `messages`).
+        
+        `serialized` is the schemas' JSON when the caller already has it.
+        """
+        if not tool_schemas:
+            return 0
+        return self.cache.count_message({'role': 'system', 'content': serialized or json.dumps(tool_schemas)}, model)
+
+    def factor(self, model: str) -> float:
+        return self._factors.get(_model_family(model), 1.0)
+
+    def estimate(self, model: str, messages: List[Dict[str, Any]], system_prompt: Optional[Dict[str, Any]] = None) -> int:
+        return int(self.raw_estimate(model, messages, system_prompt) * self.factor(model))
+
+    def observe(self, model: str, raw_estimate: int, actual_tokens: int) -> None:
+        """Learn from an (estimate, provider usage) pair for the same prompt."""
+        if raw_estimate <= 0 or actual_tokens <= 0:
+            return
+        ratio = actual_tokens / raw_estimate
+        if not CALIBRATION_BOUNDS[0] <= ratio <= CALIBRATION_BOUNDS[1]:
+            logger.debug(f"Ignoring token calibration outlier for {model}: {actual_tokens}/{raw_estimate}")
+            return
+        family = _model_family(model)
+        current = self._factors.get(family)
+        self._factors[family] = ratio if current is None else current + CALIBRATION_ALPHA * (ratio - current)
+        self.observations += 1
+
+    async def load_calibration(self, model: str) -> None:
+        """Pull the shared factor for a model once per process."""
+        family = _model_family(model)
+        if family in self._loaded:
+            return
+        self._loaded.add(family)
+        try:
+            from core.services import redis
+            async with redis.batch() as batch:
+                batch.hget("token_calibration", family)
+            value = batch.results[0]
+            if value is not None and family not in self._factors:
+                self._factors[family] = float(value)
+        except Exception as e:
+            logger.debug(f"Could not load token calibration for {family}: {e}")
+
+    async def persist_calibration(self) -> None:
+        now = time.monotonic()
+        if not self._factors or now - self._last_persist < CALIBRATION_PERSIST_INTERVAL:
+            return
+        self._last_persist = now
+        try:
+            from core.services import redis
+            async with redis.batch() as batch:
+                batch.hset("token_calibration", mapping={k: f"{v:.4f}" for k, v in self._factors.items()})
+        except Exception as e:
+            logger.debug(f"Could not persist token calibration: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"observations": self.observations, "factors": dict(self._factors)}
+
+
+# Global singleton instances
+token_count_cache = TokenCountCache()
+token_estimator = TokenEstimator(token_count_cache)
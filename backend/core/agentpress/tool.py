@@ -8,7 +8,7 @@ This module defines the base classes and decorators for creating tools:
 - Result containers for standardized tool outputs
 """
 
-from typing import Dict, Any, Union, Optional, List
+from typing import Dict, Any, Union, Optional, List, Tuple
 from dataclasses import dataclass, field
 from abc import ABC
 import json
@@ -97,7 +97,21 @@ class Tool(ABC):
         get_method_metadata: Get metadata for all methods
         success_response: Create a successful result
         fail_response: Create a failed result
+
+    Scheduling hints (see core.agentpress.tool_scheduler):
+        concurrency_class: "sandbox", "external" or "local"
+        upstream: Shared third-party service whose calls are capped process-wide
+        function_upstreams: Per-function override of `upstream`
+        path_access: function name -> (access, argument names) for calls that
+            read or write sandbox paths; access is "read" or "write"
+        timeout_seconds: Overrides the class deadline
     """
+
+    concurrency_class: str = "local"
+    upstream: Optional[str] = None
+    function_upstreams: Dict[str, str] = {}
+    path_access: Dict[str, Tuple[str, Tuple[str, ...]]] = {}
+    timeout_seconds: Optional[float] = None
     
     def __init__(self):
         """Initialize tool with empty schema registry."""
@@ -1,73 +1,191 @@
-from typing import Dict, Type, Any, List, Optional, Callable
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Dict, Type, Any, List, Optional, Callable, Tuple
 from core.agentpress.tool import Tool, SchemaType
 from core.utils.logger import logger
+from core.utils import timing
 import json
 
+import orjson
+
+# Process-wide schema snapshots, keyed by the exposed (function name, tool class) list
+_SHARED_SNAPSHOTS: "OrderedDict[Tuple, ToolSchemaSnapshot]" = OrderedDict()
+_SHARED_SNAPSHOTS_MAX = 128
+
+
+class _LazyToolInstance:
+    """One tool instance shared by all functions of a register_tool call, created on first use."""
+    __slots__ = ("tool_class", "kwargs", "instance")
+
+    def __init__(self, tool_class: Type[Tool], kwargs: Dict[str, Any], instance: Optional[Tool] = None):
+        self.tool_class = tool_class
+        self.kwargs = kwargs
+        self.instance = instance
+
+    def get(self) -> Tool:
+        if self.instance is None:
+            self.instance = self.tool_class(**self.kwargs)
+            logger.debug(f"⚡ [LAZY] Instantiated {self.tool_class.__name__} on first use")
+        return self.instance
+
+
+class ToolEntry(dict):
+    """Registry entry ({'instance', 'schema', 'tool_class'}) whose instance is created on first access."""
+
+    def __init__(self, holder: _LazyToolInstance, schema):
+        super().__init__(schema=schema, tool_class=holder.tool_class)
+        self._holder = holder
+
+    def __getitem__(self, key):
+        if key == 'instance':
+            return self._holder.get()
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        if key == 'instance':
+            return self._holder.get()
+        return super().get(key, default)
+
+    def __contains__(self, key) -> bool:
+        return key == 'instance' or super().__contains__(key)
+
+    @property
+    def created_instance(self) -> Optional[Tool]:
+        """The instance if it has been created, without creating it."""
+        return self._holder.instance
+
+
+def created_instance(tool_info: Dict[str, Any]) -> Optional[Any]:
+    """Instance of a registry entry if it exists, without instantiating lazy entries."""
+    if isinstance(tool_info, ToolEntry):
+        return tool_info.created_instance
+    return tool_info.get('instance')
+
+
+def entry_tool_class(tool_info: Dict[str, Any]) -> Optional[type]:
+    """Tool class of a registry entry, without instantiating lazy entries."""
+    if isinstance(tool_info, ToolEntry):
+        return tool_info['tool_class']
+    instance = tool_info.get('instance')
+    return instance.__class__ if instance is not None else None
+
+
+def entry_class_name(tool_info: Dict[str, Any]) -> str:
+    """Class name of a registry entry's tool, without instantiating lazy entries."""
+    if isinstance(tool_info, ToolEntry):
+        return tool_info['tool_class'].__name__
+    instance = tool_info.get('instance')
+    return instance.__class__.__name__ if instance is not None else ''
+
+
+class ToolSchemaSnapshot:
+    """Immutable list of OpenAPI tool schemas with its serialized forms.
+
+    Snapshots for registries built only from tool classes are shared by every
+    run in the process that exposes the same functions.
+    """
+    __slots__ = ("schemas", "_json", "_json_pretty")
+
+    def __init__(self, schemas: Tuple[Dict[str, Any], ...]):
+        self.schemas = schemas
+        self._json: Optional[str] = None
+        self._json_pretty: Optional[str] = None
+
+    def as_list(self) -> List[Dict[str, Any]]:
+        return list(self.schemas)
+
+    @property
+    def json(self) -> str:
+        """Compact JSON, computed once."""
+        if self._json is None:
+            self._json = orjson.dumps(list(self.schemas)).decode()
+        return self._json
+
+    @property
+    def json_pretty(self) -> str:
+        """Indented JSON (as embedded in XML tool calling prompts), computed once."""
+        if self._json_pretty is None:
+            self._json_pretty = json.dumps(list(self.schemas), indent=2)
+        return self._json_pretty
+
+
+class _LazyFunctionMap(Mapping):
+    """Function name -> bound method, resolved (and the tool instantiated) on lookup."""
+
+    def __init__(self, tools: Dict[str, Dict[str, Any]]):
+        self._tools = tools
+        self._resolved: Dict[str, Callable] = {}
+
+    def __getitem__(self, function_name: str) -> Callable:
+        function = self._resolved.get(function_name)
+        if function is None:
+            tool_info = self._tools[function_name]
+            function = getattr(tool_info['instance'], function_name)
+            self._resolved[function_name] = function
+        return function
+
+    def __iter__(self):
+        return iter(self._tools)
+
+    def __len__(self) -> int:
+        return len(self._tools)
+
 
 class ToolRegistry:
     def __init__(self):
         self.tools = {}
         self._cached_openapi_schemas = None  # ⚡ Cache schemas for repeated calls
+        self._schema_snapshot: Optional[ToolSchemaSnapshot] = None
         logger.debug("Initialized new ToolRegistry instance")
-    
+
     def register_tool(self, tool_class: Type[Tool], function_names: Optional[List[str]] = None, **kwargs):
         import time
         start = time.time()
-        
-        from core.utils.tool_discovery import get_cached_schemas, get_cached_tool_instance
-        
+
+        from core.utils.tool_discovery import get_openapi_functions, get_cached_tool_instance
+
         tool_instance = None
         used_cache = False
         if not kwargs:
             tool_instance = get_cached_tool_instance(tool_class)
             if tool_instance:
                 used_cache = True
-        
-        if tool_instance is None:
-            tool_instance = tool_class(**kwargs)
-        
-        schemas = get_cached_schemas(tool_class)
-        schema_cached = schemas is not None
-        
-        if schemas is None:
-            schemas = tool_instance.get_schemas()
-        
-        registered_openapi = 0
-        
-        self._cached_openapi_schemas = None
-        if hasattr(self, '_cached_functions'):
-            self._cached_functions = None
-        
-        for func_name, schema_list in schemas.items():
-            if function_names is None or func_name in function_names:
-                for schema in schema_list:
-                    if schema.schema_type == SchemaType.OPENAPI:
-                        self.tools[func_name] = {
-                            "instance": tool_instance,
-                            "schema": schema
-                        }
-                        registered_openapi += 1
-        
+
+        self.invalidate_schema_cache()
+        self.invalidate_function_cache()
+
+        if tool_class.get_schemas is not Tool.get_schemas:
+            # Schemas decided at runtime by the instance: register eagerly
+            if tool_instance is None:
+                tool_instance = tool_class(**kwargs)
+            functions = [
+                (func_name, schema)
+                for func_name, schema_list in tool_instance.get_schemas().items()
+                if function_names is None or func_name in function_names
+                for schema in schema_list
+                if schema.schema_type == SchemaType.OPENAPI
+            ]
+        else:
+            functions = get_openapi_functions(tool_class, function_names)
+
+        # The instance is created on first call of one of its functions
+        holder = _LazyToolInstance(tool_class, kwargs, tool_instance)
+        for func_name, schema in functions:
+            self.tools[func_name] = ToolEntry(holder, schema)
+
         elapsed = (time.time() - start) * 1000
+        timing.observe("tool_registration", elapsed / 1000)
         if elapsed > 10:
-            cache_info = f"(instance={'cached' if used_cache else 'new'}, schema={'cached' if schema_cached else 'computed'})"
+            cache_info = f"(instance={'cached' if used_cache else 'lazy'}, functions={len(functions)})"
             logger.debug(f"⏱️ [TIMING] register_tool({tool_class.__name__}): {elapsed:.1f}ms {cache_info}")
 
-    def get_available_functions(self) -> Dict[str, Callable]:
+    def get_available_functions(self) -> Mapping:
         if hasattr(self, '_cached_functions') and self._cached_functions is not None:
             return self._cached_functions
-        
-        available_functions = {}
-        for tool_name, tool_info in self.tools.items():
-            tool_instance = tool_info['instance']
-            function_name = tool_name
-            function = getattr(tool_instance, function_name)
-            available_functions[function_name] = function
-        
-        self._cached_functions = available_functions
-        logger.debug(f"⚡ [CACHE] Cached {len(available_functions)} available functions for reuse")
-        return available_functions
-    
+
+        self._cached_functions = _LazyFunctionMap(self.tools)
+        return self._cached_functions
+
     def invalidate_function_cache(self):
         if hasattr(self, '_cached_functions'):
             self._cached_functions = None
@@ -78,46 +196,63 @@ class ToolRegistry:
             logger.warning(f"Tool not found: {tool_name}")
         return tool
 
+    def get_schema_snapshot(self) -> ToolSchemaSnapshot:
+        if self._schema_snapshot is not None:
+            return self._schema_snapshot
+
+        from core.agentpress.mcp_registry import get_mcp_registry
+        mcp_registry = get_mcp_registry()
+
+        exposed = []
+        shareable = True
+        mcp_hidden = 0
+
+        for tool_name, tool_info in self.tools.items():
+            if tool_info['schema'].schema_type != SchemaType.OPENAPI:
+                continue
+            class_name = entry_class_name(tool_info)
+            is_mcp_by_instance = 'MCPToolWrapper' in class_name or 'MCP' in class_name
+            is_mcp_tool = is_mcp_by_instance or mcp_registry.is_tool_available(tool_name)
+
+            if is_mcp_tool:
+                mcp_hidden += 1
+                logger.debug(f"🔒 [HIDE] {tool_name} (MCP)")
+                continue
+            exposed.append((tool_name, tool_info))
+            # Entries added as plain dicts carry per-run schemas; only class-derived ones are shareable
+            shareable = shareable and isinstance(tool_info, ToolEntry)
+
+        if shareable:
+            key = tuple((tool_name, tool_info['tool_class']) for tool_name, tool_info in exposed)
+            snapshot = _SHARED_SNAPSHOTS.get(key)
+            if snapshot is None:
+                snapshot = ToolSchemaSnapshot(tuple(tool_info['schema'].schema for _, tool_info in exposed))
+                _SHARED_SNAPSHOTS[key] = snapshot
+                if len(_SHARED_SNAPSHOTS) > _SHARED_SNAPSHOTS_MAX:
+                    _SHARED_SNAPSHOTS.popitem(last=False)
+            else:
+                _SHARED_SNAPSHOTS.move_to_end(key)
+        else:
+            snapshot = ToolSchemaSnapshot(tuple(tool_info['schema'].schema for _, tool_info in exposed))
+
+        self._schema_snapshot = snapshot
+        logger.info(f"🎯 [HYBRID CACHE] Exposing {len(exposed)} native tools, hiding {mcp_hidden} MCP tools (smart separation, shared={shareable})")
+        return snapshot
+
     def get_openapi_schemas(self) -> List[Dict[str, Any]]:
         if self._cached_openapi_schemas is not None:
             return self._cached_openapi_schemas
 
-        schemas = []
-        native_exposed = 0
-        mcp_hidden = 0
-        
-        for tool_name, tool_info in self.tools.items():
-            if tool_info['schema'].schema_type == SchemaType.OPENAPI:
-
-                tool_instance = tool_info.get('instance')
-                is_mcp_by_instance = (tool_instance and 
-                                    hasattr(tool_instance, '__class__') and 
-                                    ('MCPToolWrapper' in str(tool_instance.__class__.__name__) or
-                                     'MCP' in str(tool_instance.__class__.__name__)))
-                
-                from core.agentpress.mcp_registry import get_mcp_registry
-                mcp_registry = get_mcp_registry()
-                is_mcp_by_registry = mcp_registry.is_tool_available(tool_name)
-                
-                is_mcp_tool = is_mcp_by_instance or is_mcp_by_registry
-                
-                if not is_mcp_tool:
-                    schemas.append(tool_info['schema'].schema)
-                    native_exposed += 1
-                else:
-                    mcp_hidden += 1
-                    logger.debug(f"🔒 [HIDE] {tool_name} (MCP)")
-        
-        self._cached_openapi_schemas = schemas
-        logger.info(f"🎯 [HYBRID CACHE] Exposing {native_exposed} native tools, hiding {mcp_hidden} MCP tools (smart separation)")
-        return schemas
-    
+        self._cached_openapi_schemas = self.get_schema_snapshot().as_list()
+        return self._cached_openapi_schemas
+
     def get_all_schemas(self) -> List[Dict[str, Any]]:
         return [
-            tool_info['schema'].schema 
+            tool_info['schema'].schema
             for tool_info in self.tools.values()
             if tool_info['schema'].schema_type == SchemaType.OPENAPI
         ]
-    
+
     def invalidate_schema_cache(self):
         self._cached_openapi_schemas = None
+        self._schema_snapshot = None
@@ -0,0 +1,98 @@
+"""Out-of-line storage for large tool results.
+
+A tool result row used to carry the full output twice, in `content.content`
+for the LLM and in `metadata.result.output` for the frontend. Both were
+re-read and re-parsed on every fetch, even after compression had replaced
+the body in the LLM context.
+
+Outputs longer than TOOL_RESULT_OFFLOAD_CHARS are written to the blob store
+once, keyed by content hash. The row keeps a preview in `content.content`
+and a reference in `metadata.blob_ref`:
+
+    {"sha256": "<hash>", "chars": <full length>}
+
+`metadata.result` is left intact, since the frontend tool views parse
+`result.output` as returned by get_thread_messages.
+
+The LLM copy is fetched back only where it is needed:
+- rows entering the LLM context (ThreadMessageCache), unless compressed
+- expand_message
+
+If a blob can't be read, the preview (with a note on the truncation) stays.
+"""
+
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.services.blob_store import blob_store
+from core.utils.json_helpers import safe_json_parse
+from core.utils.logger import logger
+
+TOOL_RESULT_OFFLOAD_ENABLED = os.getenv("TOOL_RESULT_OFFLOAD_ENABLED", "true").lower() == "true"
+TOOL_RESULT_OFFLOAD_CHARS = int(os.getenv("TOOL_RESULT_OFFLOAD_CHARS", "16000"))
+TOOL_RESULT_PREVIEW_CHARS = int(os.getenv("TOOL_RESULT_PREVIEW_CHARS", "2000"))
+
+
+def _preview(body: str) -> str:
+    omitted = len(body) - TOOL_RESULT_PREVIEW_CHARS
+    return (
+        f"{body[:TOOL_RESULT_PREVIEW_CHARS]}\n\n"
+        f"[... {omitted} more characters stored out of line; use expand_message to view the full output]"
+    )
+
+
+async def offload_tool_result(
+    content: Dict[str, Any], metadata: Dict[str, Any]
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Row content/metadata to store for a tool result; unchanged if the output is small."""
+    body = content.get("content")
+    if not TOOL_RESULT_OFFLOAD_ENABLED or not isinstance(body, str) or len(body) <= TOOL_RESULT_OFFLOAD_CHARS:
+        return content, metadata
+    try:
+        digest = await blob_store.put(body.encode("utf-8"))
+    except Exception as e:
+        logger.warning(f"Failed to offload tool result ({len(body)} chars), storing inline: {e}")
+        return content, metadata
+
+    stored_metadata = {**metadata, "blob_ref": {"sha256": digest, "chars": len(body)}}
+    return {**content, "content": _preview(body)}, stored_metadata
+
+
+def _row_dict(row: Dict[str, Any], field: str) -> Optional[Dict[str, Any]]:
+    value = row.get(field)
+    if isinstance(value, str):
+        value = safe_json_parse(value)
+        if isinstance(value, dict):
+            row[field] = value
+    return value if isinstance(value, dict) else None
+
+
+async def hydrate_rows(rows: List[Dict[str, Any]]) -> int:
+    """Replace the `content.content` preview in messages rows with the body, in place.
+
+    Rows whose content was replaced by compression are skipped. Returns the
+    rows hydrated.
+    """
+    pending = []
+    for row in rows:
+        metadata = _row_dict(row, "metadata")
+        if not metadata or not isinstance(metadata.get("blob_ref"), dict):
+            continue
+        if metadata.get("compressed"):
+            continue
+        pending.append((row, metadata))
+    if not pending:
+        return 0
+
+    bodies = await blob_store.get_many(metadata["blob_ref"]["sha256"] for _, metadata in pending)
+    hydrated = 0
+    for row, metadata in pending:
+        data = bodies.get(metadata["blob_ref"]["sha256"])
+        if data is None:
+            continue
+        row_content = _row_dict(row, "content")
+        if row_content is None:
+            continue
+        row_content["content"] = data.decode("utf-8")
+        hydrated += 1
+    return hydrated
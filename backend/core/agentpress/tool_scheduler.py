@@ -0,0 +1,209 @@
+"""Scheduling for concurrent tool execution.
+
+Tool calls used to be started all at once (asyncio.gather / one task per call
+on the stream) with no cap and no deadline, so one slow upstream or a burst
+of sandbox commands stalled the whole batch, and two writes to the same file
+raced each other.
+
+Every tool declares a concurrency class (see `Tool.concurrency_class`):
+
+- "sandbox": runs commands or file operations in the project sandbox
+- "external": calls a third-party API (optionally naming its `upstream`)
+- "local": in-process work (messages, task lists, agent config, ...)
+
+A ToolScheduler (one per ResponseProcessor, i.e. per run) then
+
+- caps concurrent calls per class (TOOL_<CLASS>_CONCURRENCY)
+- caps concurrent calls per upstream across the process
+  (TOOL_UPSTREAM_CONCURRENCY), so parallel runs don't trip a provider's
+  rate limit together
+- bounds each call with a per-class deadline (TOOL_<CLASS>_TIMEOUT, or the
+  tool's `timeout_seconds`), returning a failed ToolResult on expiry
+- orders calls that touch the same sandbox paths: a call waits for earlier
+  calls it conflicts with (a write and any other access to the same path or
+  a parent directory). Paths come from `Tool.path_access`; a function
+  declared with no argument names accesses the whole workspace (shell
+  commands and git commits read it, so they wait for earlier writes).
+  Functions without a declaration don't conflict with anything. Terminating
+  tools wait for everything submitted before them.
+
+Calls are ordered by submission, so `submit()` must be called in the order the
+model emitted them.
+"""
+
+import asyncio
+import json
+import os
+import posixpath
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from core.agentpress.tool import ToolResult
+from core.agentpress.tool_registry import ToolRegistry, entry_tool_class
+from core.utils.logger import logger
+
+SANDBOX, EXTERNAL, LOCAL = "sandbox", "external", "local"
+
+CLASS_CONCURRENCY = {
+    SANDBOX: int(os.getenv("TOOL_SANDBOX_CONCURRENCY", "4")),
+    EXTERNAL: int(os.getenv("TOOL_EXTERNAL_CONCURRENCY", "8")),
+    LOCAL: int(os.getenv("TOOL_LOCAL_CONCURRENCY", "8")),
+}
+CLASS_TIMEOUT_SECONDS = {
+    SANDBOX: float(os.getenv("TOOL_SANDBOX_TIMEOUT", "900")),
+    EXTERNAL: float(os.getenv("TOOL_EXTERNAL_TIMEOUT", "300")),
+    LOCAL: float(os.getenv("TOOL_LOCAL_TIMEOUT", "300")),
+}
+TOOL_UPSTREAM_CONCURRENCY = int(os.getenv("TOOL_UPSTREAM_CONCURRENCY", "16"))
+
+# Tools that end the turn; they run after everything submitted before them
+BARRIER_TOOLS = {'ask', 'complete'}
+
+# Functions missing from the registry are dynamically loaded MCP tools
+_UNREGISTERED_CLASS, _UNREGISTERED_UPSTREAM = EXTERNAL, "mcp"
+
+# Process-wide, shared by all runs in the worker
+_upstream_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+_WORKSPACE_ROOT = ""
+
+
+def _upstream_semaphore(upstream: str) -> asyncio.Semaphore:
+    semaphore = _upstream_semaphores.get(upstream)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(TOOL_UPSTREAM_CONCURRENCY)
+        _upstream_semaphores[upstream] = semaphore
+    return semaphore
+
+
+def _normalize_path(path: str) -> str:
+    path = path.strip()
+    if path.startswith("/workspace"):
+        path = path[len("/workspace"):]
+    path = posixpath.normpath("/" + path).lstrip("/")
+    return _WORKSPACE_ROOT if path == "." else path
+
+
+def _paths_overlap(a: str, b: str) -> bool:
+    if a == _WORKSPACE_ROOT or b == _WORKSPACE_ROOT or a == b:
+        return True
+    return a.startswith(b + "/") or b.startswith(a + "/")
+
+
+@dataclass
+class ToolOp:
+    """A submitted tool call and what it touches."""
+    function_name: str
+    concurrency_class: str
+    upstream: Optional[str] = None
+    timeout: Optional[float] = None
+    # (access, normalized path) pairs in the sandbox; access is "read" or "write"
+    sandbox_access: List[Tuple[str, str]] = field(default_factory=list)
+    barrier: bool = False
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def conflicts_with(self, earlier: "ToolOp") -> bool:
+        if self.barrier or earlier.barrier:
+            return True
+        for access, path in self.sandbox_access:
+            for earlier_access, earlier_path in earlier.sandbox_access:
+                if "write" in (access, earlier_access) and _paths_overlap(path, earlier_path):
+                    return True
+        return False
+
+
+def _parse_arguments(arguments: Any) -> Dict[str, Any]:
+    if isinstance(arguments, dict):
+        return arguments
+    if isinstance(arguments, str):
+        try:
+            parsed = json.loads(arguments)
+        except (json.JSONDecodeError, ValueError):
+            return {}
+        return parsed if isinstance(parsed, dict) else {}
+    return {}
+
+
+class ToolScheduler:
+    """Runs a run's tool calls under class/upstream limits, deadlines and path ordering."""
+
+    def __init__(self, tool_registry: ToolRegistry):
+        self.tool_registry = tool_registry
+        self._class_semaphores = {
+            name: asyncio.Semaphore(limit) for name, limit in CLASS_CONCURRENCY.items()
+        }
+        self._in_flight: List[ToolOp] = []
+
+    def classify(self, tool_call: Dict[str, Any]) -> ToolOp:
+        function_name = tool_call.get("function_name", "unknown")
+        tool_info = self.tool_registry.tools.get(function_name)
+        if tool_info is None:
+            return ToolOp(function_name, _UNREGISTERED_CLASS, upstream=_UNREGISTERED_UPSTREAM)
+
+        tool_class = entry_tool_class(tool_info)
+        concurrency_class = getattr(tool_class, "concurrency_class", LOCAL)
+        if concurrency_class not in CLASS_CONCURRENCY:
+            concurrency_class = LOCAL
+        upstream = getattr(tool_class, "function_upstreams", {}).get(function_name) or getattr(tool_class, "upstream", None)
+        op = ToolOp(
+            function_name,
+            concurrency_class,
+            upstream=upstream,
+            timeout=getattr(tool_class, "timeout_seconds", None),
+            barrier=function_name in BARRIER_TOOLS,
+        )
+
+        declared = getattr(tool_class, "path_access", {}).get(function_name)
+        if declared is not None:
+            access, arg_names = declared
+            arguments = _parse_arguments(tool_call.get("arguments"))
+            for arg_name in arg_names:
+                value = arguments.get(arg_name)
+                values = value if isinstance(value, list) else [value]
+                op.sandbox_access.extend((access, _normalize_path(v)) for v in values if isinstance(v, str) and v.strip())
+            if not op.sandbox_access:
+                op.sandbox_access.append((access, _WORKSPACE_ROOT))
+        return op
+
+    def submit(
+        self,
+        tool_call: Dict[str, Any],
+        execute: Callable[[Dict[str, Any]], Awaitable[ToolResult]],
+    ) -> "asyncio.Task[ToolResult]":
+        """Schedule `execute(tool_call)`; the task resolves to its ToolResult."""
+        op = self.classify(tool_call)
+        waits_for = [earlier.done for earlier in self._in_flight if op.conflicts_with(earlier)]
+        self._in_flight.append(op)
+        return asyncio.create_task(self._run(op, waits_for, tool_call, execute))
+
+    async def _run(
+        self,
+        op: ToolOp,
+        waits_for: List[asyncio.Event],
+        tool_call: Dict[str, Any],
+        execute: Callable[[Dict[str, Any]], Awaitable[ToolResult]],
+    ) -> ToolResult:
+        try:
+            for event in waits_for:
+                await event.wait()
+            async with self._class_semaphores[op.concurrency_class]:
+                if op.upstream:
+                    async with _upstream_semaphore(op.upstream):
+                        return await self._run_with_deadline(op, tool_call, execute)
+                return await self._run_with_deadline(op, tool_call, execute)
+        finally:
+            op.done.set()
+            self._in_flight.remove(op)
+
+    async def _run_with_deadline(
+        self,
+        op: ToolOp,
+        tool_call: Dict[str, Any],
+        execute: Callable[[Dict[str, Any]], Awaitable[ToolResult]],
+    ) -> ToolResult:
+        timeout = op.timeout or CLASS_TIMEOUT_SECONDS[op.concurrency_class]
+        try:
+            return await asyncio.wait_for(execute(tool_call), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Tool {op.function_name} ({op.concurrency_class}) timed out after {timeout:.0f}s")
+            return ToolResult(success=False, output=f"Tool '{op.function_name}' timed out after {timeout:.0f} seconds")
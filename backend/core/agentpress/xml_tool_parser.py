@@ -188,6 +188,134 @@ def extract_xml_chunks(content: str) -> List[str]:
     return chunks
 
 
+class StreamingXMLToolCallParser:
+    """
+    Resumable parser for XML tool calls arriving as streaming deltas.
+    
+    Instead of rescanning the whole accumulated response on every delta, the
+    parser keeps only the unconsumed tail of the text plus its scan position
+    and whether a <function_calls> block is currently open. Each complete
+    <invoke>...</invoke> is emitted as soon as its closing tag arrives, so
+    tools can start before </function_calls> is seen.
+    
+    Per-delta cost is proportional to the delta (plus a tag-sized overlap),
+    not to the length of the response.
+    """
+    
+    _BLOCK_START = '<function_calls>'
+    _BLOCK_END = '</function_calls>'
+    _INVOKE_START = '<invoke'
+    _INVOKE_END = '</invoke>'
+    
+    def __init__(self):
+        self._buffer = ""
+        self._scan_pos = 0
+        self._in_block = False
+    
+    @property
+    def in_block(self) -> bool:
+        """Whether a <function_calls> block is currently open."""
+        return self._in_block
+    
+    def feed(self, delta: str) -> List[XMLToolCall]:
+        """Consume a content delta and return any tool calls completed by it."""
+        if not delta:
+            return []
+        self._buffer += delta
+        completed: List[XMLToolCall] = []
+        
+        while True:
+            if not self._in_block:
+                start = self._buffer.find(self._BLOCK_START, self._scan_pos)
+                if start == -1:
+                    # Keep just enough tail to match a tag split across deltas
+                    keep = len(self._BLOCK_START) - 1
+                    if len(self._buffer) > keep:
+                        self._buffer = self._buffer[-keep:]
+                    self._scan_pos = 0
+                    return completed
+                self._buffer = self._buffer[start + len(self._BLOCK_START):]
+                self._scan_pos = 0
+                self._in_block = True
+                continue
+            
+            invoke_end = self._buffer.find(self._INVOKE_END, self._scan_pos)
+            block_end = self._buffer.find(self._BLOCK_END, self._scan_pos)
+            
+            if block_end != -1 and (invoke_end == -1 or block_end < invoke_end):
+                self._buffer = self._buffer[block_end + len(self._BLOCK_END):]
+                self._scan_pos = 0
+                self._in_block = False
+                continue
+            
+            if invoke_end == -1:
+                # Resume next time just before where a closing tag could begin
+                overlap = max(len(self._INVOKE_END), len(self._BLOCK_END)) - 1
+                self._scan_pos = max(0, len(self._buffer) - overlap)
+                return completed
+            
+            end = invoke_end + len(self._INVOKE_END)
+            tool_call = self._parse_invoke(self._buffer[:end])
+            if tool_call:
+                completed.append(tool_call)
+            self._buffer = self._buffer[end:]
+            self._scan_pos = 0
+    
+    def _parse_invoke(self, segment: str) -> Optional[XMLToolCall]:
+        start = segment.find(self._INVOKE_START)
+        if start == -1:
+            return None
+        invoke_xml = segment[start:]
+        match = _INVOKE_PATTERN.match(invoke_xml)
+        if not match:
+            logger.error(f"Malformed invoke block in stream: {invoke_xml[:200]}...")
+            return None
+        function_name, invoke_content = match.group(1), match.group(2)
+        try:
+            return _parse_invoke_block(function_name, invoke_content, invoke_xml)
+        except Exception as e:
+            logger.error(f"Error parsing invoke block for {function_name}: {e}")
+            return None
+
+
+def xml_tool_calls_to_dicts(
+    xml_tool_calls: List[XMLToolCall],
+    assistant_message_id: Optional[str] = None,
+    start_index: int = 0
+) -> List[Dict[str, Any]]:
+    """
+    Convert XMLToolCall objects into tool call dicts with generated IDs.
+    
+    Args:
+        xml_tool_calls: Parsed XMLToolCall objects
+        assistant_message_id: ID of the assistant message (for tool_call_id generation)
+        start_index: Starting index for XML tool calls (for tool_call_id generation)
+        
+    Returns:
+        List of tool_call dictionaries, each with 'function_name', 'arguments', 'id', 'source'
+    """
+    results = []
+    for idx, xml_tool_call in enumerate(xml_tool_calls):
+        # Generate tool_call_id in format: xml_tool_index{id}_AssistantMessageId
+        tool_index = start_index + idx
+        if assistant_message_id:
+            tool_call_id = f"xml_tool_index{tool_index}_{assistant_message_id}"
+        else:
+            # Fallback if no assistant_message_id yet
+            tool_call_id = f"xml_tool_index{tool_index}_{str(uuid.uuid4())}"
+        
+        tool_call = {
+            "function_name": xml_tool_call.function_name,
+            "id": tool_call_id,
+            "arguments": xml_tool_call.parameters,
+            "source": "xml"  # Mark as XML tool call for detection
+        }
+        
+        logger.debug(f"Parsed tool call from chunk: {tool_call['function_name']} (id: {tool_call_id})")
+        results.append(tool_call)
+    return results
+
+
 def parse_xml_tool_calls_with_ids(
     xml_chunk: str, 
     assistant_message_id: Optional[str] = None, 
@@ -216,24 +344,7 @@ def parse_xml_tool_calls_with_ids(
                 return results
             
             # Process ALL tool calls found in the chunk
-            for idx, xml_tool_call in enumerate(parsed_calls):
-                # Generate tool_call_id in format: xml_tool_index{id}_AssistantMessageId
-                tool_index = start_index + idx
-                if assistant_message_id:
-                    tool_call_id = f"xml_tool_index{tool_index}_{assistant_message_id}"
-                else:
-                    # Fallback if no assistant_message_id yet
-                    tool_call_id = f"xml_tool_index{tool_index}_{str(uuid.uuid4())}"
-                
-                tool_call = {
-                    "function_name": xml_tool_call.function_name,
-                    "id": tool_call_id,
-                    "arguments": xml_tool_call.parameters,
-                    "source": "xml"  # Mark as XML tool call for detection
-                }
-                
-                logger.debug(f"Parsed tool call from chunk: {tool_call['function_name']} (id: {tool_call_id})")
-                results.append(tool_call)
+            results = xml_tool_calls_to_dicts(parsed_calls, assistant_message_id, start_index)
             
             logger.debug(f"Parsed {len(results)} tool call(s) from XML chunk")
             return results
@@ -3,6 +3,7 @@ from typing import Optional, Dict, Tuple, List
 from datetime import datetime, timezone
 from core.billing.credits.calculator import calculate_token_cost, calculate_cached_token_cost, calculate_cache_write_cost
 from core.billing.credits.manager import credit_manager
+from core.billing.credits.usage_ledger import usage_ledger
 from core.utils.config import config, EnvMode
 from core.utils.logger import logger
 from core.services.supabase import DBConnection
@@ -53,6 +54,9 @@ class BillingIntegration:
         else:
             balance = Decimal(str(balance_info or 0))
         
+        # Usage queued by any process but not yet committed to the DB balance
+        balance -= await usage_ledger.pending_amount(account_id)
+        
         if balance < 0:
             return False, f"Insufficient credits. Your balance is {int(balance * 100)} credits. Please add credits to continue.", None
         
@@ -105,19 +109,13 @@ class BillingIntegration:
             return False, f"Error checking access: {str(e)}", {"error_type": "system_error"}
     
     @staticmethod
-    async def deduct_usage(
-        account_id: str,
+    def calculate_usage_cost(
         prompt_tokens: int,
         completion_tokens: int,
         model: str,
-        message_id: Optional[str] = None,
-        thread_id: Optional[str] = None,
         cache_read_tokens: int = 0,
         cache_creation_tokens: int = 0
-    ) -> Dict:
-        if config.ENV_MODE == EnvMode.LOCAL:
-            return {'success': True, 'cost': 0, 'new_balance': 999999}
-
+    ) -> Decimal:
         # Handle cache reads and writes separately with actual pricing
         if cache_read_tokens > 0 or cache_creation_tokens > 0:
             non_cached_prompt_tokens = prompt_tokens - cache_read_tokens - cache_creation_tokens
@@ -141,8 +139,65 @@ class BillingIntegration:
             cost = cached_read_cost + cache_write_cost + non_cached_cost
             
             logger.debug(f"[BILLING] Cost breakdown: cached_read=${cached_read_cost:.6f} + cache_write=${cache_write_cost:.6f} + regular=${non_cached_cost:.6f} = total=${cost:.6f}")
-        else:
-            cost = calculate_token_cost(prompt_tokens, completion_tokens, model)
+            return cost
+        return calculate_token_cost(prompt_tokens, completion_tokens, model)
+    
+    @staticmethod
+    async def record_usage(
+        account_id: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        model: str,
+        message_id: str,
+        thread_id: Optional[str] = None,
+        cache_read_tokens: int = 0,
+        cache_creation_tokens: int = 0
+    ) -> Dict:
+        """Queue usage for batched deduction (see usage_ledger); falls back to deduct_usage if Redis is down."""
+        if config.ENV_MODE == EnvMode.LOCAL:
+            return {'success': True, 'cost': 0, 'queued': False}
+
+        cost = BillingIntegration.calculate_usage_cost(
+            prompt_tokens, completion_tokens, model, cache_read_tokens, cache_creation_tokens
+        )
+        if cost <= 0:
+            logger.warning(f"Zero cost calculated for {model} with {prompt_tokens}+{completion_tokens} tokens")
+            return {'success': True, 'cost': 0, 'queued': False}
+
+        try:
+            await usage_ledger.record(account_id, cost, message_id, thread_id=thread_id, model=model)
+            logger.debug(f"[BILLING] Queued ${cost:.6f} usage for {account_id}")
+            return {'success': True, 'cost': float(cost), 'queued': True}
+        except Exception as e:
+            logger.warning(f"[BILLING] Usage ledger unavailable, deducting directly: {e}")
+            return await BillingIntegration.deduct_usage(
+                account_id=account_id,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                model=model,
+                message_id=message_id,
+                thread_id=thread_id,
+                cache_read_tokens=cache_read_tokens,
+                cache_creation_tokens=cache_creation_tokens
+            )
+    
+    @staticmethod
+    async def deduct_usage(
+        account_id: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        model: str,
+        message_id: Optional[str] = None,
+        thread_id: Optional[str] = None,
+        cache_read_tokens: int = 0,
+        cache_creation_tokens: int = 0
+    ) -> Dict:
+        if config.ENV_MODE == EnvMode.LOCAL:
+            return {'success': True, 'cost': 0, 'new_balance': 999999}
+
+        cost = BillingIntegration.calculate_usage_cost(
+            prompt_tokens, completion_tokens, model, cache_read_tokens, cache_creation_tokens
+        )
         
         if cost <= 0:
             logger.warning(f"Zero cost calculated for {model} with {prompt_tokens}+{completion_tokens} tokens")
@@ -0,0 +1,308 @@
+"""
+Batched, asynchronous usage billing.
+
+Charging every LLM response with its own atomic_use_credits RPC (plus cache
+invalidations) put a Postgres round-trip on the agent's streaming path. The
+usage ledger instead:
+
+1. Appends each usage event to the `billing:usage_events` Redis stream and
+   adds its cost to the account's pending total in `billing:usage_pending`
+   (one MULTI), so balance checks in any process (API or worker) see the
+   charge immediately.
+2. Runs a background consumer (Redis consumer group, one per process) that
+   aggregates events and commits them with a single
+   `atomic_use_credits_batch` RPC, which is idempotent on message_id and
+   issues one atomic_use_credits per (account, thread, model) in the batch,
+   keeping thread and model attribution in credit_ledger.
+3. Leaves events whose deduction failed un-acked, so they are retried via
+   XAUTOCLAIM (which also reclaims events from crashed consumers). After
+   USAGE_LEDGER_MAX_ATTEMPTS they are moved to `billing:usage_events:dead`
+   and reported to Sentry.
+
+Redis is the only source of truth for what is still uncommitted: any
+consumer may commit any process's events, so no per-process bookkeeping is
+kept. If Redis is unavailable the caller falls back to a direct deduction.
+Call close() on shutdown so a batch that is mid-commit is finished first.
+"""
+
+import asyncio
+import os
+import socket
+import uuid
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+import sentry
+from core.services import redis
+from core.services.supabase import DBConnection
+from core.utils.cache import Cache
+from core.utils.logger import logger
+from ..shared.cache_utils import invalidate_account_state_cache
+
+USAGE_STREAM_KEY = "billing:usage_events"
+USAGE_CONSUMER_GROUP = "usage_ledger"
+USAGE_STREAM_MAXLEN = 100_000
+USAGE_DEAD_STREAM_KEY = "billing:usage_events:dead"
+# account_id -> cost recorded (by any process) but not yet committed
+USAGE_PENDING_KEY = "billing:usage_pending"
+# stream entry id -> failed commit attempts
+USAGE_ATTEMPTS_KEY = "billing:usage_attempts"
+
+USAGE_LEDGER_BATCH_SIZE = int(os.getenv("USAGE_LEDGER_BATCH_SIZE", "200"))
+USAGE_LEDGER_FLUSH_INTERVAL_MS = int(os.getenv("USAGE_LEDGER_FLUSH_INTERVAL_MS", "2000"))
+# Entries pending longer than this on another consumer are assumed orphaned
+USAGE_LEDGER_CLAIM_IDLE_MS = 60_000
+USAGE_LEDGER_ERROR_BACKOFF = 2.0
+USAGE_LEDGER_MAX_ATTEMPTS = int(os.getenv("USAGE_LEDGER_MAX_ATTEMPTS", "5"))
+USAGE_LEDGER_DRAIN_TIMEOUT = float(os.getenv("USAGE_LEDGER_DRAIN_TIMEOUT", "10"))
+
+
+class UsageLedger:
+    def __init__(self):
+        self.db = DBConnection()
+        self.consumer_name = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._consumer_task: Optional[asyncio.Task] = None
+        self._committing = False
+        self._group_ready = False
+        self.events_recorded = 0
+        self.events_committed = 0
+        self.batches_committed = 0
+        self.events_failed = 0
+        self.events_dead_lettered = 0
+
+    async def pending_amount(self, account_id: str) -> Decimal:
+        """Cost recorded by any process that is not yet reflected in the DB balance."""
+        try:
+            async with redis.batch() as batch:
+                batch.hget(USAGE_PENDING_KEY, account_id)
+            value = batch.results[0]
+        except Exception as e:
+            # record() fails the same way, so nothing is being queued while Redis is down
+            logger.debug(f"[USAGE_LEDGER] Could not read pending usage for {account_id}: {e}")
+            return Decimal('0')
+        if value is None:
+            return Decimal('0')
+        # HINCRBYFLOAT can leave float residue around zero once everything is committed
+        return max(Decimal(str(value)), Decimal('0'))
+
+    async def record(
+        self,
+        account_id: str,
+        amount: Decimal,
+        message_id: str,
+        thread_id: Optional[str] = None,
+        model: Optional[str] = None
+    ) -> str:
+        """Queue a usage charge. Raises if the event could not be written to Redis."""
+        amount = Decimal(str(amount))
+        async with redis.batch(transaction=True) as batch:
+            batch.xadd(USAGE_STREAM_KEY, {
+                'account_id': account_id,
+                'amount': str(amount),
+                'message_id': message_id,
+                'thread_id': thread_id or '',
+                'model': model or '',
+            }, maxlen=USAGE_STREAM_MAXLEN, approximate=True)
+            batch.hincrbyfloat(USAGE_PENDING_KEY, account_id, str(amount))
+        entry_id = batch.results[0]
+
+        self.events_recorded += 1
+        self._ensure_consumer()
+        return entry_id
+
+    def _ensure_consumer(self) -> None:
+        if self._consumer_task is None or self._consumer_task.done():
+            self._consumer_task = asyncio.create_task(self._run_consumer())
+
+    async def _ensure_group(self) -> None:
+        if self._group_ready:
+            return
+        try:
+            async with redis.batch() as batch:
+                batch.xgroup_create(USAGE_STREAM_KEY, USAGE_CONSUMER_GROUP, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    async def _read_batch(self) -> List[Tuple[str, Dict[str, str]]]:
+        entries: List[Tuple[str, Dict[str, str]]] = []
+
+        # Orphaned entries from consumers that died before acking
+        try:
+            async with redis.batch() as batch:
+                batch.xautoclaim(
+                    USAGE_STREAM_KEY, USAGE_CONSUMER_GROUP, self.consumer_name,
+                    min_idle_time=USAGE_LEDGER_CLAIM_IDLE_MS, start_id="0-0", count=USAGE_LEDGER_BATCH_SIZE
+                )
+            entries.extend(e for e in batch.results[0][1] if e[1])
+        except Exception as e:
+            logger.debug(f"[USAGE_LEDGER] xautoclaim failed: {e}")
+
+        if len(entries) < USAGE_LEDGER_BATCH_SIZE:
+            async with redis.batch() as batch:
+                batch.xreadgroup(
+                    USAGE_CONSUMER_GROUP, self.consumer_name, {USAGE_STREAM_KEY: ">"},
+                    count=USAGE_LEDGER_BATCH_SIZE - len(entries), block=USAGE_LEDGER_FLUSH_INTERVAL_MS
+                )
+            for _, stream_entries in batch.results[0] or []:
+                entries.extend(stream_entries)
+        return entries
+
+    async def _run_consumer(self) -> None:
+        while True:
+            try:
+                await self._ensure_group()
+                entries = await self._read_batch()
+                if not entries:
+                    async with redis.batch() as batch:
+                        batch.xpending(USAGE_STREAM_KEY, USAGE_CONSUMER_GROUP)
+                    pending = batch.results[0]
+                    if not pending or not pending.get('pending'):
+                        # Stream drained and nothing awaiting a retry; the next record() restarts us
+                        return
+                    continue
+                self._committing = True
+                try:
+                    await self._commit(entries)
+                finally:
+                    self._committing = False
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[USAGE_LEDGER] Consumer error: {e}")
+                self._group_ready = False
+                await asyncio.sleep(USAGE_LEDGER_ERROR_BACKOFF)
+
+    async def _commit(self, entries: List[Tuple[str, Dict[str, str]]]) -> None:
+        events: List[Dict[str, Any]] = []
+        for _, fields in entries:
+            events.append({
+                'message_id': fields.get('message_id'),
+                'account_id': fields.get('account_id'),
+                'amount': fields.get('amount', '0'),
+                'thread_id': fields.get('thread_id') or None,
+                'model': fields.get('model') or None,
+            })
+
+        db_client = await self.db.client
+        result = await db_client.rpc('atomic_use_credits_batch', {'p_events': events}).execute()
+
+        account_ids = set()
+        failed_errors: Dict[str, str] = {}
+        for group_result in result.data or []:
+            account_ids.add(group_result.get('account_id'))
+            if not group_result.get('success', False):
+                error = group_result.get('error') or 'unknown error'
+                logger.warning(
+                    f"[USAGE_LEDGER] Batched deduction failed for {group_result.get('account_id')} "
+                    f"(thread {group_result.get('thread_id')}, {group_result.get('event_count')} events): {error}"
+                )
+                for message_id in group_result.get('message_ids') or []:
+                    failed_errors[message_id] = error
+
+        # Committed (or duplicate) events are acked. Failed ones stay pending in
+        # the group and are retried through XAUTOCLAIM until they dead-letter.
+        done = [(entry_id, fields) for entry_id, fields in entries if fields.get('message_id') not in failed_errors]
+        failed = [(entry_id, fields) for entry_id, fields in entries if fields.get('message_id') in failed_errors]
+        if failed:
+            self.events_failed += len(failed)
+            done.extend(await self._handle_failures(failed, failed_errors))
+        if done:
+            await self._ack(done)
+
+        for account_id in account_ids:
+            await Cache.invalidate(f"credit_balance:{account_id}")
+            await Cache.invalidate(f"credit_summary:{account_id}")
+            await invalidate_account_state_cache(account_id)
+
+        self.events_committed += len(entries) - len(failed)
+        self.batches_committed += 1
+        logger.debug(f"[USAGE_LEDGER] Committed {len(entries) - len(failed)} usage events for {len(account_ids)} accounts")
+
+    async def _handle_failures(
+        self,
+        failed: List[Tuple[str, Dict[str, str]]],
+        errors: Dict[str, str]
+    ) -> List[Tuple[str, Dict[str, str]]]:
+        """Count a failed attempt per entry; returns the entries moved to the dead-letter stream."""
+        async with redis.batch() as batch:
+            for entry_id, _ in failed:
+                batch.hincrby(USAGE_ATTEMPTS_KEY, entry_id, 1)
+        attempts = batch.results
+
+        dead = [
+            (entry_id, fields)
+            for (entry_id, fields), count in zip(failed, attempts)
+            if count >= USAGE_LEDGER_MAX_ATTEMPTS
+        ]
+        if not dead:
+            return []
+
+        async with redis.batch(transaction=True) as batch:
+            for entry_id, fields in dead:
+                batch.xadd(USAGE_DEAD_STREAM_KEY, {
+                    **fields,
+                    'entry_id': entry_id,
+                    'error': errors.get(fields.get('message_id'), ''),
+                })
+            batch.hdel(USAGE_ATTEMPTS_KEY, *(entry_id for entry_id, _ in dead))
+
+        total = sum(Decimal(fields.get('amount', '0')) for _, fields in dead)
+        accounts = sorted({fields.get('account_id') for _, fields in dead})
+        message = (
+            f"[USAGE_LEDGER] {len(dead)} usage events (${total}) for accounts {', '.join(accounts)} "
+            f"failed {USAGE_LEDGER_MAX_ATTEMPTS} deduction attempts; moved to {USAGE_DEAD_STREAM_KEY}"
+        )
+        logger.error(message)
+        sentry.sentry.capture_message(message, level="error")
+        self.events_dead_lettered += len(dead)
+        return dead
+
+    async def _ack(self, entries: List[Tuple[str, Dict[str, str]]]) -> None:
+        entry_ids = [entry_id for entry_id, _ in entries]
+        async with redis.batch(transaction=True) as batch:
+            batch.xack(USAGE_STREAM_KEY, USAGE_CONSUMER_GROUP, *entry_ids)
+            batch.xdel(USAGE_STREAM_KEY, *entry_ids)
+            batch.hdel(USAGE_ATTEMPTS_KEY, *entry_ids)
+            for _, fields in entries:
+                if fields.get('account_id'):
+                    batch.hincrbyfloat(USAGE_PENDING_KEY, fields['account_id'], f"-{fields.get('amount', '0')}")
+
+    async def close(self) -> None:
+        """Let a batch that is mid-commit finish (up to USAGE_LEDGER_DRAIN_TIMEOUT), then stop the consumer.
+
+        Everything else is already durable in the stream: unread events are
+        read by any other consumer, and events this consumer read but did not
+        ack are reclaimed through XAUTOCLAIM.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + USAGE_LEDGER_DRAIN_TIMEOUT
+        while self._committing and loop.time() < deadline:
+            await asyncio.sleep(0.1)
+        if self._committing:
+            logger.warning(
+                f"[USAGE_LEDGER] Usage batch still committing after {USAGE_LEDGER_DRAIN_TIMEOUT}s; "
+                "it will be reclaimed by another consumer"
+            )
+
+        if self._consumer_task and not self._consumer_task.done():
+            self._consumer_task.cancel()
+            try:
+                await self._consumer_task
+            except asyncio.CancelledError:
+                pass
+        self._consumer_task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "events_recorded": self.events_recorded,
+            "events_committed": self.events_committed,
+            "batches_committed": self.batches_committed,
+            "events_failed": self.events_failed,
+            "events_dead_lettered": self.events_dead_lettered,
+            "consumer_running": self._consumer_task is not None and not self._consumer_task.done(),
+        }
+
+
+usage_ledger = UsageLedger()
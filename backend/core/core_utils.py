@@ -8,6 +8,7 @@ from .utils.logger import logger
 from .utils.icon_generator import RELEVANT_ICONS, generate_icon_and_colors as generate_agent_icon_and_colors
 from .utils.limits_checker import (
     check_agent_run_limit,
+    reserve_agent_run_slot,
     check_agent_count_limit, 
     check_project_count_limit
 )
@@ -31,6 +32,13 @@ async def cleanup():
     """Clean up resources on shutdown."""
     logger.debug("Starting cleanup of agent API resources")
 
+    # Stop shared stream readers before the connection pool goes away
+    from core.services.stream_hub import stream_hub
+    await stream_hub.close()
+
+    from core.services.http_client import http_clients
+    await http_clients.close()
+
     # Close Redis connection
     await redis.close()
     logger.debug("Completed cleanup of agent API resources")
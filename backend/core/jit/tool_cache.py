@@ -1,6 +1,7 @@
 import json
 from typing import Optional, Dict, List
 from datetime import timedelta
+from core.services import redis as redis_service
 from core.utils.logger import logger
 
 
@@ -16,7 +17,6 @@ class ToolGuideCache:
         logger.info(f"⚡ [TOOL CACHE] Initialized with TTL={self.ttl}, using shared async Redis pool")
     
     async def _get_redis(self):
-        from core.services import redis as redis_service
         try:
             return await redis_service.get_client()
         except Exception as e:
@@ -27,6 +27,11 @@ class ToolGuideCache:
     def _make_cache_key(self, tool_name: str) -> str:
         return f"{self.CACHE_KEY_PREFIX}{self.CACHE_VERSION}:{tool_name}"
     
+    @property
+    def _registry_owner(self) -> str:
+        # Cached keys are registered so stats and invalidate_all don't SCAN the keyspace
+        return f"{self.CACHE_KEY_PREFIX}{self.CACHE_VERSION}"
+    
     async def get_tool_guide(self, tool_name: str) -> Optional[str]:
         if not self.enabled:
             return None
@@ -72,6 +77,7 @@ class ToolGuideCache:
                 int(self.ttl.total_seconds()),
                 json.dumps(data)
             )
+            await redis_service.register_keys(self._registry_owner, [cache_key], ttl=int(self.ttl.total_seconds()))
             
             logger.debug(f"💾 [TOOL CACHE] Stored: {tool_name} (TTL={self.ttl})")
             return True
@@ -90,13 +96,8 @@ class ToolGuideCache:
             if not redis_client:
                 return {name: None for name in tool_names}
             
-            pipe = redis_client.pipeline()
             cache_keys = [self._make_cache_key(name) for name in tool_names]
-            
-            for key in cache_keys:
-                pipe.get(key)
-            
-            results = await pipe.execute()
+            results = await redis_service.mget(cache_keys)
             
             guides = {}
             hits = 0
@@ -124,19 +125,18 @@ class ToolGuideCache:
             if not redis_client:
                 return 0
             
-            pipe = redis_client.pipeline()
-            
+            entries = {}
             for tool_name, guide in guides.items():
                 if guide:
-                    cache_key = self._make_cache_key(tool_name)
-                    data = {
+                    entries[self._make_cache_key(tool_name)] = json.dumps({
                         'tool_name': tool_name,
                         'guide': guide,
                         'version': self.CACHE_VERSION
-                    }
-                    pipe.setex(cache_key, int(self.ttl.total_seconds()), json.dumps(data))
+                    })
             
-            await pipe.execute()
+            ttl_seconds = int(self.ttl.total_seconds())
+            await redis_service.mset(entries, ex=ttl_seconds)
+            await redis_service.register_keys(self._registry_owner, list(entries), ttl=ttl_seconds)
             
             logger.info(f"💾 [TOOL CACHE] Batch stored: {len(guides)} guides")
             return len(guides)
@@ -156,6 +156,7 @@ class ToolGuideCache:
             
             cache_key = self._make_cache_key(tool_name)
             await redis_client.delete(cache_key)
+            await redis_service.unregister_keys(self._registry_owner, [cache_key])
             logger.info(f"🗑️  [TOOL CACHE] Invalidated: {tool_name}")
             return True
             
@@ -172,17 +173,10 @@ class ToolGuideCache:
             if not redis_client:
                 return 0
             
-            pattern = f"{self.CACHE_KEY_PREFIX}{self.CACHE_VERSION}:*"
-            keys = []
-            async for key in redis_client.scan_iter(match=pattern):
-                keys.append(key)
-            
-            if keys:
-                count = await redis_client.delete(*keys)
+            count = await redis_service.unlink_registered_keys(self._registry_owner)
+            if count:
                 logger.info(f"🗑️  [TOOL CACHE] Invalidated all: {count} guides")
-                return count
-            
-            return 0
+            return count
             
         except Exception as e:
             logger.error(f"❌ [TOOL CACHE] Error invalidating all: {e}")
@@ -218,14 +212,11 @@ class ToolGuideCache:
             if not redis_client:
                 return {'enabled': False, 'error': 'Redis unavailable'}
             
-            pattern = f"{self.CACHE_KEY_PREFIX}{self.CACHE_VERSION}:*"
-            keys = []
-            async for key in redis_client.scan_iter(match=pattern):
-                keys.append(key)
+            cached_tools = await redis_service.count_registered_keys(self._registry_owner)
             
             return {
                 'enabled': True,
-                'cached_tools': len(keys),
+                'cached_tools': cached_tools,
                 'ttl': str(self.ttl),
                 'version': self.CACHE_VERSION
             }
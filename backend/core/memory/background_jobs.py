@@ -1,7 +1,9 @@
 import dramatiq
 import asyncio
+import json
 import os
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Optional
 from datetime import datetime, timezone, timedelta
 from core.utils.logger import logger, structlog
 from core.services.supabase import DBConnection
@@ -192,6 +194,88 @@ async def embed_and_store_memories(
     except Exception as e:
         logger.error(f"Memory embedding and storage failed: {str(e)}")
 
+CONSOLIDATION_SIMILARITY_THRESHOLD = 0.95
+CONSOLIDATION_MAX_MEMORIES = int(os.getenv("MEMORY_CONSOLIDATION_MAX_MEMORIES", "5000"))
+CONSOLIDATION_PAGE_SIZE = 1000
+CONSOLIDATION_BLOCK_SIZE = 512
+CONSOLIDATION_DELETE_BATCH = 500
+
+
+def _parse_embedding(value: Any) -> Optional[List[float]]:
+    # pgvector columns come back from PostgREST as "[0.1,0.2,...]" strings
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            return None
+    return value if isinstance(value, list) and value else None
+
+
+def _find_duplicate_memories(memories: List[Dict[str, Any]], threshold: float) -> Dict[str, Any]:
+    """Cluster near-duplicate memories and pick one survivor per cluster.
+    
+    Embeddings are stacked into a single L2-normalized matrix and compared in
+    row blocks (bounded memory), pairs above `threshold` are merged with
+    union-find, and each cluster keeps its highest-confidence member (ties go
+    to the most recent, i.e. the lowest index since input is newest-first).
+    CPU-bound; run it off the event loop.
+    """
+    import numpy as np
+    
+    indexed = [(i, _parse_embedding(m.get('embedding'))) for i, m in enumerate(memories)]
+    indexed = [(i, e) for i, e in indexed if e is not None]
+    if len(indexed) < 2:
+        return {"losers": [], "clusters": 0, "compared": len(indexed)}
+    
+    dim = len(indexed[0][1])
+    indexed = [(i, e) for i, e in indexed if len(e) == dim]
+    positions = [i for i, _ in indexed]
+    matrix = np.asarray([e for _, e in indexed], dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    
+    n = matrix.shape[0]
+    parent = list(range(n))
+    
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+    
+    for block_start in range(0, n, CONSOLIDATION_BLOCK_SIZE):
+        block = matrix[block_start:block_start + CONSOLIDATION_BLOCK_SIZE]
+        # Only compare against later rows: the upper triangle is enough
+        sims = block @ matrix[block_start:].T
+        rows, cols = np.nonzero(sims >= threshold)
+        for r, c in zip(rows.tolist(), cols.tolist()):
+            a, b = block_start + r, block_start + c
+            if a >= b:
+                continue
+            ra, rb = find(a), find(b)
+            if ra != rb:
+                parent[rb] = ra
+    
+    clusters: Dict[int, List[int]] = {}
+    for idx in range(n):
+        clusters.setdefault(find(idx), []).append(idx)
+    
+    losers = []
+    duplicate_clusters = 0
+    for members in clusters.values():
+        if len(members) < 2:
+            continue
+        duplicate_clusters += 1
+        keep = max(
+            members,
+            key=lambda m: (memories[positions[m]].get('confidence_score') or 0, -positions[m])
+        )
+        losers.extend(memories[positions[m]]['memory_id'] for m in members if m != keep)
+    
+    return {"losers": losers, "clusters": duplicate_clusters, "compared": n}
+
+
 @dramatiq.actor(queue_name=get_queue_name("default"))
 async def consolidate_memories(account_id: str):
     structlog.contextvars.clear_contextvars()
@@ -206,41 +290,46 @@ async def consolidate_memories(account_id: str):
     client = await db.client
     
     try:
-        memories_result = await client.table('user_memories').select('*').eq('account_id', account_id).order('created_at', desc=True).limit(500).execute()
-        
-        memories = memories_result.data or []
+        started = time.monotonic()
+        memories: List[Dict[str, Any]] = []
+        while len(memories) < CONSOLIDATION_MAX_MEMORIES:
+            offset = len(memories)
+            page_size = min(CONSOLIDATION_PAGE_SIZE, CONSOLIDATION_MAX_MEMORIES - offset)
+            page = await client.table('user_memories').select(
+                'memory_id, confidence_score, embedding'
+            ).eq('account_id', account_id).order('created_at', desc=True).range(offset, offset + page_size - 1).execute()
+            rows = page.data or []
+            memories.extend(rows)
+            if len(rows) < page_size:
+                break
+        fetched = time.monotonic()
         
         if len(memories) < 10:
             logger.debug(f"Not enough memories to consolidate for {account_id}")
             return
         
-        similarity_threshold = 0.95
-        consolidated_count = 0
+        result = await asyncio.to_thread(
+            _find_duplicate_memories, memories, CONSOLIDATION_SIMILARITY_THRESHOLD
+        )
+        computed = time.monotonic()
         
-        for i, mem1 in enumerate(memories):
-            if not mem1.get('embedding'):
-                continue
-            
-            for mem2 in memories[i+1:]:
-                if not mem2.get('embedding'):
-                    continue
-                
-                import numpy as np
-                embedding1 = np.array(mem1['embedding'])
-                embedding2 = np.array(mem2['embedding'])
-                
-                similarity = np.dot(embedding1, embedding2) / (np.linalg.norm(embedding1) * np.linalg.norm(embedding2))
-                
-                if similarity >= similarity_threshold:
-                    if mem1.get('confidence_score', 0) >= mem2.get('confidence_score', 0):
-                        await client.table('user_memories').delete().eq('memory_id', mem2['memory_id']).execute()
-                    else:
-                        await client.table('user_memories').delete().eq('memory_id', mem1['memory_id']).execute()
-                        break
-                    
-                    consolidated_count += 1
-        
-        logger.info(f"Consolidated {consolidated_count} duplicate memories for account {account_id}")
+        losers = result["losers"]
+        for i in range(0, len(losers), CONSOLIDATION_DELETE_BATCH):
+            await client.table('user_memories').delete().eq('account_id', account_id).in_(
+                'memory_id', losers[i:i + CONSOLIDATION_DELETE_BATCH]
+            ).execute()
+        
+        if losers:
+            from core.utils.cache import Cache
+            await Cache.invalidate_owner(f"memories:{account_id}")
+        
+        finished = time.monotonic()
+        logger.info(
+            f"Consolidated {len(losers)} duplicate memories in {result['clusters']} clusters for account {account_id} "
+            f"(scanned={len(memories)}, compared={result['compared']}, "
+            f"fetch={fetched - started:.3f}s, similarity={computed - fetched:.3f}s, "
+            f"delete={finished - computed:.3f}s)"
+        )
     
     except Exception as e:
         logger.error(f"Memory consolidation failed for {account_id}: {str(e)}")
@@ -1,9 +1,113 @@
 import asyncio
-from typing import List, Optional, Dict, Any
+import base64
+import hashlib
+from array import array
+from collections import OrderedDict
+from typing import List, Optional, Dict, Any, Tuple
 from abc import ABC, abstractmethod
 from core.utils.logger import logger
 from core.utils.config import config
 
+EMBEDDING_CACHE_TTL = 7 * 24 * 3600  # Embeddings are deterministic per model; TTL only bounds Redis memory
+EMBEDDING_LOCAL_CACHE_SIZE = 1000
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different inputs share a cache entry."""
+    return " ".join(text.split())
+
+
+def content_hash(text: str, model: str) -> str:
+    """Stable (cross-process) key for a piece of text under a given embedding model.
+
+    Python's built-in hash() is salted per process, so it cannot be used for
+    keys shared between workers or across restarts.
+    """
+    payload = f"{model}\0{normalize_text(text)}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+def _encode_embedding(embedding: List[float]) -> str:
+    # float32 + base64 is ~4x smaller than a JSON list of floats
+    return base64.b64encode(array("f", embedding).tobytes()).decode("ascii")
+
+
+def _decode_embedding(data: str) -> List[float]:
+    values = array("f")
+    values.frombytes(base64.b64decode(data))
+    return values.tolist()
+
+
+class EmbeddingCache:
+    """Two-level embedding cache: in-process LRU in front of Redis.
+
+    Keys are content-addressed (SHA-256 of model + normalized text), so
+    entries are shared across Dramatiq workers, API workers and restarts.
+    """
+
+    def __init__(self, max_local_entries: int = EMBEDDING_LOCAL_CACHE_SIZE, ttl: int = EMBEDDING_CACHE_TTL):
+        self._local: OrderedDict[str, List[float]] = OrderedDict()
+        self._max_local_entries = max_local_entries
+        self._ttl = ttl
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _redis_key(digest: str) -> str:
+        return f"embedding:{digest}"
+
+    def _remember(self, digest: str, embedding: List[float]) -> None:
+        self._local[digest] = embedding
+        self._local.move_to_end(digest)
+        while len(self._local) > self._max_local_entries:
+            self._local.popitem(last=False)
+
+    async def get(self, digest: str) -> Optional[List[float]]:
+        embedding = self._local.get(digest)
+        if embedding is not None:
+            self._local.move_to_end(digest)
+            self.local_hits += 1
+            return embedding
+
+        try:
+            from core.services import redis
+            cached = await redis.get(self._redis_key(digest))
+        except Exception as e:
+            logger.warning(f"Embedding cache read failed: {e}")
+            cached = None
+
+        if cached:
+            embedding = _decode_embedding(cached)
+            self._remember(digest, embedding)
+            self.redis_hits += 1
+            return embedding
+
+        self.misses += 1
+        return None
+
+    async def set(self, digest: str, embedding: List[float]) -> None:
+        self._remember(digest, embedding)
+        try:
+            from core.services import redis
+            await redis.set(self._redis_key(digest), _encode_embedding(embedding), ex=self._ttl)
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.local_hits + self.redis_hits + self.misses
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": (self.local_hits + self.redis_hits) / total if total else 0.0,
+            "local_entries": len(self._local),
+        }
+
+
+# Shared by every EmbeddingService instance in the process
+embedding_cache = EmbeddingCache()
+
 class EmbeddingProvider(ABC):
     @abstractmethod
     async def embed(self, texts: List[str]) -> List[List[float]]:
@@ -144,11 +248,26 @@ class EmbeddingService:
             logger.warning(f"Unknown embedding provider: {provider_name}, falling back to OpenAI")
             return OpenAIEmbeddingProvider()
     
+    @property
+    def model_name(self) -> str:
+        """Fully qualified model identifier used to namespace cached embeddings."""
+        return f"{self.provider_name.lower()}:{getattr(self.provider, 'model', '')}"
+    
+    def cache_key(self, text: str) -> str:
+        return content_hash(text, self.model_name)
+    
     async def embed_text(self, text: str) -> List[float]:
         if not text or not text.strip():
             raise ValueError("Text cannot be empty")
         
-        return await self.provider.embed_single(text)
+        digest = self.cache_key(text)
+        cached = await embedding_cache.get(digest)
+        if cached is not None:
+            return cached
+        
+        embedding = await self.provider.embed_single(text)
+        await embedding_cache.set(digest, embedding)
+        return embedding
     
     async def embed_texts(self, texts: List[str]) -> List[List[float]]:
         if not texts:
@@ -158,7 +277,22 @@ class EmbeddingService:
         if not valid_texts:
             raise ValueError("All texts are empty")
         
-        return await self.provider.embed(valid_texts)
+        digests = [self.cache_key(t) for t in valid_texts]
+        results: List[Optional[List[float]]] = await asyncio.gather(
+            *(embedding_cache.get(d) for d in digests)
+        )
+        
+        missing: List[Tuple[int, str]] = [(i, t) for i, t in enumerate(valid_texts) if results[i] is None]
+        if missing:
+            embeddings = await self.provider.embed([t for _, t in missing])
+            for (i, _), embedding in zip(missing, embeddings):
+                results[i] = embedding
+            await asyncio.gather(*(embedding_cache.set(digests[i], results[i]) for i, _ in missing))
+        
+        return results
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        return embedding_cache.stats()
     
     async def embed_batch(self, texts: List[str], batch_size: int = 100) -> List[List[float]]:
         if not texts:
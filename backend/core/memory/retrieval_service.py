@@ -11,6 +11,8 @@ class MemoryRetrievalService:
         self.embedding_service = EmbeddingService()
         self.db = DBConnection()
         self.cache_ttl = 60
+        self.cache_hits = 0
+        self.cache_misses = 0
     
     async def retrieve_memories(
         self,
@@ -31,11 +33,15 @@ class MemoryRetrievalService:
                 logger.debug(f"Memory retrieval limit is 0 for tier: {tier_name}")
                 return []
             
-            cache_key = f"memories:retrieved:{account_id}:{hash(query_text)}"
+            # Content-addressed key: stable across processes, unlike built-in hash()
+            query_key = self.embedding_service.cache_key(query_text)
+            cache_key = f"memories:retrieved:{account_id}:{retrieval_limit}:{query_key}"
             cached = await Cache.get(cache_key)
             if cached:
+                self.cache_hits += 1
                 logger.debug(f"Retrieved memories from cache for {account_id}")
                 return [self._dict_to_memory_item(m) for m in cached]
+            self.cache_misses += 1
             
             await self.db.initialize()
             client = await self.db.client
@@ -74,7 +80,7 @@ class MemoryRetrievalService:
                 )
                 memories.append(memory)
             
-            await Cache.set(cache_key, [self._memory_item_to_dict(m) for m in memories], ttl=self.cache_ttl)
+            await Cache.set(cache_key, [self._memory_item_to_dict(m) for m in memories], ttl=self.cache_ttl, owner=f"memories:{account_id}")
             
             logger.info(f"Retrieved {len(memories)} memories for account {account_id}")
             return memories
@@ -85,6 +91,13 @@ class MemoryRetrievalService:
             logger.error(traceback.format_exc())
             return []
     
+    def cache_stats(self) -> Dict[str, Any]:
+        return {
+            "retrieval_hits": self.cache_hits,
+            "retrieval_misses": self.cache_misses,
+            "embeddings": self.embedding_service.cache_stats(),
+        }
+    
     async def get_all_memories(
         self,
         account_id: str,
@@ -235,8 +248,7 @@ class MemoryRetrievalService:
     
     async def _invalidate_cache(self, account_id: str):
         try:
-            pattern = f"memories:retrieved:{account_id}:*"
-            await Cache.delete_pattern(pattern)
+            await Cache.invalidate_owner(f"memories:{account_id}")
         except Exception as e:
             logger.warning(f"Failed to invalidate cache for {account_id}: {str(e)}")
     
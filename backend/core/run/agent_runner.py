@@ -7,9 +7,11 @@ from typing import Optional, Dict, List, Any, AsyncGenerator
 from dotenv import load_dotenv
 from core.utils.config import config
 from core.agentpress.thread_manager import ThreadManager
+from core.agentpress.tool_registry import entry_class_name
 from core.agentpress.response_processor import ProcessorConfig
 from core.agentpress.error_processor import ErrorProcessor
 from core.utils.logger import logger
+from core.utils import timing
 from core.billing.credits.integration import billing_integration
 from core.services.langfuse import langfuse
 from core.tools.mcp_tool_wrapper import MCPToolWrapper
@@ -456,9 +458,11 @@ class AgentRunner:
             setup_start = time.time()
             if config.ENABLE_BOOTSTRAP_MODE:
                 await self.setup_bootstrap()
+                timing.observe("runner_setup", time.time() - setup_start)
                 logger.info(f"⏱️ [TIMING] AgentRunner.setup_bootstrap() completed in {(time.time() - setup_start) * 1000:.1f}ms")
             else:
                 await self.setup()
+                timing.observe("runner_setup", time.time() - setup_start)
                 logger.info(f"⏱️ [TIMING] AgentRunner.setup() completed in {(time.time() - setup_start) * 1000:.1f}ms")
             
             parallel_start = time.time()
@@ -478,6 +482,7 @@ class AgentRunner:
                 mcp_wrapper_instance = None
             
             tools_elapsed = (time.time() - parallel_start) * 1000
+            timing.observe("tool_setup", tools_elapsed / 1000)
             logger.info(f"⏱️ [TIMING] Tool setup: {tools_elapsed:.1f}ms (MCP deferred to enrichment)")
             
             prompt_start = time.time()
@@ -511,6 +516,8 @@ class AgentRunner:
                 )
                 logger.info(f"⏱️ [TIMING] build_system_prompt() in {(time.time() - prompt_start) * 1000:.1f}ms ({len(str(system_message.get('content', '')))} chars)")
             
+            timing.observe("prompt_build", time.time() - prompt_start)
+
             if memory_context:
                 self.thread_manager.set_memory_context(memory_context)
             
@@ -763,10 +770,9 @@ class AgentRunner:
         
         for tool_name in list(self.thread_manager.tool_registry.tools.keys()):
             tool_info = self.thread_manager.tool_registry.tools[tool_name]
-            instance = tool_info.get('instance')
             
             should_remove = (
-                (hasattr(instance, '__class__') and 'MCPToolWrapper' in instance.__class__.__name__) or
+                'MCPToolWrapper' in entry_class_name(tool_info) or
                 len(tool_name) > 64
             )
             
@@ -777,6 +783,8 @@ class AgentRunner:
         removed_count = tools_before - tools_after
         
         if removed_count > 0:
+            self.thread_manager.tool_registry.invalidate_schema_cache()
+            self.thread_manager.tool_registry.invalidate_function_cache()
             logger.info(f"⚡ [MCP JIT] Registry cleaned: {tools_before} → {tools_after} tools ({removed_count} legacy tools removed)")
 
     async def _restore_dynamic_tools(self) -> None:
@@ -371,12 +371,12 @@ If relevant context seems missing, ask a clarifying question.
         if not (xml_tool_calling and tool_registry):
             return system_content
         
-        openapi_schemas = tool_registry.get_openapi_schemas()
+        schema_snapshot = tool_registry.get_schema_snapshot()
         
-        if not openapi_schemas:
+        if not schema_snapshot.schemas:
             return system_content
         
-        schemas_json = json.dumps(openapi_schemas, indent=2)
+        schemas_json = schema_snapshot.json_pretty
         
         examples_content = f"""
 
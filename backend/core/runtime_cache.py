@@ -252,68 +252,6 @@ async def invalidate_project_cache(project_id: str) -> None:
         logger.warning(f"Failed to invalidate project cache: {e}")
 
 
-# ============================================================================
-# RUNNING RUNS CACHE - Short TTL for concurrent runs limit checks
-# ============================================================================
-RUNNING_RUNS_TTL = 5  # 5 seconds - needs fresh data for limit accuracy
-
-def _get_running_runs_key(account_id: str) -> str:
-    """Generate Redis cache key for running runs count."""
-    return f"running_runs:{account_id}"
-
-
-async def get_cached_running_runs(account_id: str) -> Optional[Dict[str, Any]]:
-    """
-    Get running runs data from Redis cache.
-    Short TTL to balance freshness and latency.
-    """
-    cache_key = _get_running_runs_key(account_id)
-    
-    try:
-        from core.services import redis as redis_service
-        
-        cached = await redis_service.get(cache_key)
-        if cached:
-            data = json.loads(cached) if isinstance(cached, (str, bytes)) else cached
-            logger.debug(f"⚡ Redis cache hit for running runs: {account_id}")
-            return data
-    except Exception as e:
-        logger.warning(f"Failed to get running runs from cache: {e}")
-    
-    return None
-
-
-async def set_cached_running_runs(
-    account_id: str, 
-    running_count: int, 
-    running_thread_ids: list
-) -> None:
-    """Cache running runs data in Redis."""
-    cache_key = _get_running_runs_key(account_id)
-    data = {
-        'running_count': running_count,
-        'running_thread_ids': running_thread_ids,
-        'cached_at': time.time()
-    }
-    
-    try:
-        from core.services import redis as redis_service
-        await redis_service.set(cache_key, json.dumps(data), ex=RUNNING_RUNS_TTL)
-        logger.debug(f"✅ Cached running runs in Redis: {account_id} ({running_count} runs)")
-    except Exception as e:
-        logger.warning(f"Failed to cache running runs: {e}")
-
-
-async def invalidate_running_runs_cache(account_id: str) -> None:
-    """Invalidate cached running runs when agent starts/stops."""
-    try:
-        from core.services import redis as redis_service
-        await redis_service.delete(_get_running_runs_key(account_id))
-        logger.debug(f"🗑️ Invalidated running runs cache: {account_id}")
-    except Exception as e:
-        logger.warning(f"Failed to invalidate running runs cache: {e}")
-
-
 # ============================================================================
 # THREAD COUNT CACHE - Invalidated on thread create/delete
 # ============================================================================
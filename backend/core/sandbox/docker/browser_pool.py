@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Shared headless Chromium pool for the sandbox converters.
+
+Launching Chromium dominates export latency for small decks, so instead of
+every request doing `async_playwright()` + `chromium.launch()`, the server
+keeps one long-lived browser with a few pre-warmed contexts:
+
+- `browser_pool.context()` leases a warm BrowserContext (1920x1080 viewport);
+  its pages are closed and cookies cleared when the lease ends.
+- `browser_pool.page()` is a convenience wrapper leasing a context and
+  opening a single page in it.
+- Contexts are recycled after MAX_USES_PER_CONTEXT leases and the browser is
+  relaunched after MAX_USES_PER_BROWSER leases to bound memory growth.
+- If Chromium crashes or disconnects, the next lease launches a fresh one.
+
+Started/stopped by server.py; falls back to lazy start on first use.
+"""
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from playwright.async_api import async_playwright, Browser, BrowserContext, Page
+except ImportError:
+    raise ImportError("Playwright is not installed. Please install it with: pip install playwright")
+
+
+WARM_CONTEXTS = int(os.getenv("BROWSER_POOL_WARM_CONTEXTS", "2"))
+MAX_USES_PER_CONTEXT = int(os.getenv("BROWSER_POOL_MAX_USES_PER_CONTEXT", "50"))
+MAX_USES_PER_BROWSER = int(os.getenv("BROWSER_POOL_MAX_USES_PER_BROWSER", "500"))
+
+VIEWPORT = {"width": 1920, "height": 1080}
+
+LAUNCH_ARGS = [
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-gpu',
+    '--force-device-scale-factor=1',
+    '--disable-background-timer-throttling',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-renderer-backgrounding',
+    '--disable-features=VizDisplayCompositor,TranslateUI',
+    '--disable-extensions',
+    '--disable-plugins',
+    '--disable-web-security',
+    '--disable-ipc-flooding-protection',
+]
+
+
+class BrowserPool:
+    def __init__(self):
+        self._playwright = None
+        self._browser: Optional[Browser] = None
+        self._browser_uses = 0
+        # Idle contexts of the current browser with their use counts
+        self._idle: List[Tuple[BrowserContext, int]] = []
+        # Outstanding leases per browser, so retired browsers close once drained
+        self._leases: Dict[Browser, int] = {}
+        self._retired: List[Browser] = []
+        self._lock = asyncio.Lock()
+        self.launches = 0
+
+    async def start(self) -> None:
+        """Launch the browser and pre-warm contexts."""
+        async with self._lock:
+            await self._ensure_browser()
+            while len(self._idle) < WARM_CONTEXTS:
+                self._idle.append((await self._browser.new_context(viewport=VIEWPORT), 0))
+        print(f"🌐 Browser pool ready ({len(self._idle)} warm contexts)")
+
+    async def stop(self) -> None:
+        async with self._lock:
+            browsers = list(self._retired)
+            if self._browser:
+                browsers.append(self._browser)
+            self._browser = None
+            self._idle.clear()
+            self._retired.clear()
+            self._leases.clear()
+            for browser in browsers:
+                try:
+                    await browser.close()
+                except Exception:
+                    pass
+            if self._playwright:
+                try:
+                    await self._playwright.stop()
+                except Exception:
+                    pass
+                self._playwright = None
+
+    async def _ensure_browser(self) -> Browser:
+        """Return a live browser, relaunching after crashes or max uses. Caller holds the lock."""
+        browser = self._browser
+        if browser is not None and browser.is_connected() and self._browser_uses < MAX_USES_PER_BROWSER:
+            return browser
+
+        if browser is not None:
+            reason = "disconnected" if not browser.is_connected() else f"reached {self._browser_uses} uses"
+            print(f"♻️ Recycling browser ({reason})")
+            for context, _ in self._idle:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+            self._idle.clear()
+            await self._retire(browser)
+
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+
+        self._browser = await self._playwright.chromium.launch(headless=True, args=LAUNCH_ARGS)
+        self._browser_uses = 0
+        self._leases[self._browser] = 0
+        self.launches += 1
+        return self._browser
+
+    async def _retire(self, browser: Browser) -> None:
+        if self._leases.get(browser, 0) > 0 and browser.is_connected():
+            # Still in use; closed when its last lease is released
+            self._retired.append(browser)
+            return
+        self._leases.pop(browser, None)
+        try:
+            await browser.close()
+        except Exception:
+            pass
+
+    @asynccontextmanager
+    async def context(self):
+        """Lease a warm BrowserContext for the duration of a conversion."""
+        async with self._lock:
+            browser = await self._ensure_browser()
+            if self._idle:
+                context, uses = self._idle.pop()
+            else:
+                context, uses = await browser.new_context(viewport=VIEWPORT), 0
+            self._browser_uses += 1
+            self._leases[browser] = self._leases.get(browser, 0) + 1
+
+        try:
+            yield context
+        finally:
+            await self._release(browser, context, uses + 1)
+
+    async def _release(self, browser: Browser, context: BrowserContext, uses: int) -> None:
+        reusable = browser.is_connected()
+        if reusable:
+            try:
+                for page in list(context.pages):
+                    await page.close()
+                await context.clear_cookies()
+            except Exception:
+                reusable = False
+
+        async with self._lock:
+            if browser in self._leases:
+                self._leases[browser] -= 1
+            if (
+                reusable
+                and browser is self._browser
+                and uses < MAX_USES_PER_CONTEXT
+                and len(self._idle) < WARM_CONTEXTS
+            ):
+                self._idle.append((context, uses))
+                context = None
+
+            if browser in self._retired and self._leases.get(browser, 0) <= 0:
+                self._retired.remove(browser)
+                await self._retire(browser)
+
+        if context is not None:
+            try:
+                await context.close()
+            except Exception:
+                pass
+
+    @asynccontextmanager
+    async def page(self):
+        """Lease a context and open a single page in it."""
+        async with self.context() as context:
+            page: Page = await context.new_page()
+            try:
+                yield page
+            finally:
+                try:
+                    await page.close()
+                except Exception:
+                    pass  # Page might already be closed due to crash
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "launches": self.launches,
+            "browser_uses": self._browser_uses,
+            "idle_contexts": len(self._idle),
+            "active_leases": sum(self._leases.values()),
+            "retired_browsers": len(self._retired),
+        }
+
+
+browser_pool = BrowserPool()
@@ -16,10 +16,7 @@ from fastapi.responses import Response
 from urllib.parse import quote
 from pydantic import BaseModel, Field
 
-try:
-    from playwright.async_api import async_playwright
-except ImportError:
-    raise ImportError("Playwright is not installed. Please install it with: pip install playwright")
+from browser_pool import browser_pool
 
 try:
     from PyPDF2 import PdfWriter, PdfReader
@@ -108,7 +105,7 @@ class PresentationToPDFAPI:
         except Exception as e:
             raise ValueError(f"Error loading metadata: {e}")
     
-    async def render_slide_to_pdf(self, browser, slide_info: Dict, temp_dir: Path, max_retries: int = 3) -> Path:
+    async def render_slide_to_pdf(self, slide_info: Dict, temp_dir: Path, max_retries: int = 3) -> Path:
         """Render a single HTML slide to PDF using Playwright with retry logic."""
         html_path = slide_info['path']
         slide_num = slide_info['number']
@@ -116,7 +113,6 @@ class PresentationToPDFAPI:
         last_error = None
         
         for attempt in range(max_retries):
-            page = None
             try:
                 if attempt > 0:
                     print(f"  ⟳ Retry {attempt}/{max_retries - 1} for slide {slide_num}...")
@@ -125,65 +121,64 @@ class PresentationToPDFAPI:
                 else:
                     print(f"Rendering slide {slide_num}: {slide_info['title']}")
                 
-                # Create new page with exact presentation dimensions
-                page = await browser.new_page()
+                # Lease a page from the shared warm browser pool
+                async with browser_pool.page() as page:
+                    # Set exact viewport to 1920x1080
+                    await page.set_viewport_size({"width": 1920, "height": 1080})
+                    await page.emulate_media(media='screen')
                 
-                # Set exact viewport to 1920x1080
-                await page.set_viewport_size({"width": 1920, "height": 1080})
-                await page.emulate_media(media='screen')
-                
-                # Override device pixel ratio for exact dimensions
-                await page.evaluate("""
-                    () => {
-                        Object.defineProperty(window, 'devicePixelRatio', {
-                            get: () => 1
-                        });
-                    }
-                """)
+                    # Override device pixel ratio for exact dimensions
+                    await page.evaluate("""
+                        () => {
+                            Object.defineProperty(window, 'devicePixelRatio', {
+                                get: () => 1
+                            });
+                        }
+                    """)
                 
-                # Navigate to the HTML file
-                file_url = f"file://{html_path.absolute()}"
-                await page.goto(file_url, wait_until="networkidle", timeout=30000)
+                    # Navigate to the HTML file
+                    file_url = f"file://{html_path.absolute()}"
+                    await page.goto(file_url, wait_until="networkidle", timeout=30000)
                 
-                # Wait for fonts and dynamic content to load
-                await page.wait_for_timeout(3000)
+                    # Wait for fonts and dynamic content to load
+                    await page.wait_for_timeout(3000)
                 
-                # Ensure exact slide dimensions
-                await page.evaluate("""
-                    () => {
-                        const slideContainer = document.querySelector('.slide-container');
-                        if (slideContainer) {
-                            slideContainer.style.width = '1920px';
-                            slideContainer.style.height = '1080px';
-                            slideContainer.style.transform = 'none';
-                            slideContainer.style.maxWidth = 'none';
-                            slideContainer.style.maxHeight = 'none';
-                        }
+                    # Ensure exact slide dimensions
+                    await page.evaluate("""
+                        () => {
+                            const slideContainer = document.querySelector('.slide-container');
+                            if (slideContainer) {
+                                slideContainer.style.width = '1920px';
+                                slideContainer.style.height = '1080px';
+                                slideContainer.style.transform = 'none';
+                                slideContainer.style.maxWidth = 'none';
+                                slideContainer.style.maxHeight = 'none';
+                            }
                         
-                        document.body.style.margin = '0';
-                        document.body.style.padding = '0';
-                        document.body.style.width = '1920px';
-                        document.body.style.height = '1080px';
-                        document.body.style.overflow = 'hidden';
-                    }
-                """)
+                            document.body.style.margin = '0';
+                            document.body.style.padding = '0';
+                            document.body.style.width = '1920px';
+                            document.body.style.height = '1080px';
+                            document.body.style.overflow = 'hidden';
+                        }
+                    """)
                 
-                await page.wait_for_timeout(1000)
+                    await page.wait_for_timeout(1000)
                 
-                # Generate PDF for this slide
-                temp_pdf_path = temp_dir / f"slide_{slide_num:02d}.pdf"
+                    # Generate PDF for this slide
+                    temp_pdf_path = temp_dir / f"slide_{slide_num:02d}.pdf"
                 
-                await page.pdf(
-                    path=str(temp_pdf_path),
-                    width="1920px",
-                    height="1080px",
-                    margin={"top": "0", "right": "0", "bottom": "0", "left": "0"},
-                    print_background=True,
-                    prefer_css_page_size=False
-                )
+                    await page.pdf(
+                        path=str(temp_pdf_path),
+                        width="1920px",
+                        height="1080px",
+                        margin={"top": "0", "right": "0", "bottom": "0", "left": "0"},
+                        print_background=True,
+                        prefer_css_page_size=False
+                    )
                 
-                print(f"  ✓ Slide {slide_num} rendered")
-                return temp_pdf_path
+                    print(f"  ✓ Slide {slide_num} rendered")
+                    return temp_pdf_path
                 
             except Exception as e:
                 last_error = e
@@ -201,12 +196,6 @@ class PresentationToPDFAPI:
                 else:
                     # Non-retryable error or exhausted retries
                     break
-            finally:
-                if page:
-                    try:
-                        await page.close()
-                    except Exception:
-                        pass  # Page might already be closed due to crash
         
         raise RuntimeError(f"Error rendering slide {slide_num} after {max_retries} attempts: {last_error}")
     
@@ -244,44 +233,24 @@ class PresentationToPDFAPI:
         with tempfile.TemporaryDirectory() as temp_dir:
             temp_path = Path(temp_dir)
             
-            # Launch browser
-            async with async_playwright() as p:
-                print("🌐 Launching browser...")
-                browser = await p.chromium.launch(
-                    headless=True,
-                    args=[
-                        '--no-sandbox',
-                        '--disable-setuid-sandbox',
-                        '--disable-dev-shm-usage',
-                        '--disable-gpu',
-                        '--force-device-scale-factor=1',
-                        '--disable-background-timer-throttling',
-                        '--single-process',  # More stable for PDF generation
-                    ]
-                )
-                
-                try:
-                    # Limit concurrent renders to prevent memory pressure
-                    # 5 concurrent slides balances speed and stability
-                    max_concurrent = 5
-                    semaphore = asyncio.Semaphore(max_concurrent)
-                    
-                    async def render_with_limit(slide_info):
-                        async with semaphore:
-                            return await self.render_slide_to_pdf(browser, slide_info, temp_path)
-                    
-                    print(f"📄 Processing {len(self.slides_info)} slides (max {max_concurrent} concurrent)...")
-                    
-                    tasks = [
-                        render_with_limit(slide_info)
-                        for slide_info in self.slides_info
-                    ]
-                    
-                    # Wait for all slides to be processed
-                    pdf_paths = await asyncio.gather(*tasks)
-                    
-                finally:
-                    await browser.close()
+            # Limit concurrent renders to prevent memory pressure
+            # 5 concurrent slides balances speed and stability
+            max_concurrent = 5
+            semaphore = asyncio.Semaphore(max_concurrent)
+            
+            async def render_with_limit(slide_info):
+                async with semaphore:
+                    return await self.render_slide_to_pdf(slide_info, temp_path)
+            
+            print(f"📄 Processing {len(self.slides_info)} slides (max {max_concurrent} concurrent)...")
+            
+            tasks = [
+                render_with_limit(slide_info)
+                for slide_info in self.slides_info
+            ]
+            
+            # Wait for all slides to be processed
+            pdf_paths = await asyncio.gather(*tasks)
             
             # Create output path
             presentation_name = self.metadata.get('presentation_name', 'presentation')
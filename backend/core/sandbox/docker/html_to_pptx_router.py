@@ -20,10 +20,7 @@ from fastapi.responses import Response
 from urllib.parse import quote
 from pydantic import BaseModel, Field
 
-try:
-    from playwright.async_api import async_playwright
-except ImportError:
-    raise ImportError("Playwright is not installed. Please install it with: pip install playwright")
+from browser_pool import browser_pool
 
 try:
     from pptx import Presentation
@@ -1297,131 +1294,101 @@ class OptimizedHTMLToPPTXConverter:
         with tempfile.TemporaryDirectory() as temp_dir:
             temp_path = Path(temp_dir)
             
-            # Launch browser for processing
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(
-                    headless=True,
-                    args=[
-                        '--no-sandbox',
-                        '--disable-setuid-sandbox',
-                        '--disable-dev-shm-usage',
-                        '--disable-gpu',
-                        '--force-device-scale-factor=1',
-                        '--disable-background-timer-throttling',
-                        '--disable-backgrounding-occluded-windows',
-                        '--disable-renderer-backgrounding',
-                        '--disable-features=VizDisplayCompositor',
-                        '--disable-extensions',
-                        '--disable-plugins',
-                        '--disable-web-security',
-                        '--disable-features=TranslateUI',
-                        '--disable-ipc-flooding-protection'
-                    ]
-                )
+            # Lease a warm context from the shared browser pool
+            async with browser_pool.context() as context:
+                # Process all slides in parallel
+                # Create semaphore to limit concurrent operations
+                semaphore = asyncio.Semaphore(5)
                 
-                try:
-                    # Process all slides in parallel
-                    # Create semaphore to limit concurrent operations
-                    semaphore = asyncio.Semaphore(5)
-                    context = await browser.new_context(
-                        viewport={'width': 1920, 'height': 1080}
-                    )
-                    
-                    context = await browser.new_context(
-                        viewport={'width': 1920, 'height': 1080}
-                    )
-                    
-                    async def process_single_slide(slide_info: Dict) -> Dict:
-                        """Process a single slide with controlled concurrency."""
-                        async with semaphore:
-                            slide_num = slide_info['number']
+                async def process_single_slide(slide_info: Dict) -> Dict:
+                    """Process a single slide with controlled concurrency."""
+                    async with semaphore:
+                        slide_num = slide_info['number']
+                        
+                        try:
+                            # Create a new page for this slide
+                            page = await context.new_page()
+                            
+                            # Set exact viewport dimensions
+                            await page.set_viewport_size({"width": 1920, "height": 1080})
+                            await page.emulate_media(media='screen')
+                            
+                            # Force device pixel ratio to 1
+                            await page.evaluate(r"""
+                                () => {
+                                    Object.defineProperty(window, 'devicePixelRatio', {
+                                        get: () => 1
+                                    });
+                                }
+                            """)
                             
                             try:
-                                # Create a new page for this slide
-                                page = await context.new_page()
+                                # Extract visual elements
+                                visual_elements = await self.extract_visual_elements(page, slide_info['path'], temp_path)
                                 
-                                # Set exact viewport dimensions
-                                await page.set_viewport_size({"width": 1920, "height": 1080})
-                                await page.emulate_media(media='screen')
+                                # Capture clean background
+                                background_path = await self.capture_clean_background(page, slide_info['path'], temp_path, visual_elements)
                                 
-                                # Force device pixel ratio to 1
-                                await page.evaluate(r"""
-                                    () => {
-                                        Object.defineProperty(window, 'devicePixelRatio', {
-                                            get: () => 1
-                                        });
-                                    }
-                                """)
+                                # Extract text elements
+                                text_elements = await self.extract_text_elements(page, slide_info['path'])
+                                
+                                slide_analysis = {
+                                    'slide_info': slide_info,
+                                    'visual_elements': visual_elements,
+                                    'background_path': background_path,
+                                    'text_elements': text_elements
+                                }
+                                
+                                return slide_analysis
                                 
-                                try:
-                                    # Extract visual elements
-                                    visual_elements = await self.extract_visual_elements(page, slide_info['path'], temp_path)
-                                    
-                                    # Capture clean background
-                                    background_path = await self.capture_clean_background(page, slide_info['path'], temp_path, visual_elements)
-                                    
-                                    # Extract text elements
-                                    text_elements = await self.extract_text_elements(page, slide_info['path'])
-                                    
-                                    slide_analysis = {
-                                        'slide_info': slide_info,
-                                        'visual_elements': visual_elements,
-                                        'background_path': background_path,
-                                        'text_elements': text_elements
-                                    }
-                                    
-                                    return slide_analysis
-                                    
-                                except Exception as e:
-                                    return {
-                                        'slide_info': slide_info,
-                                        'visual_elements': [],
-                                        'background_path': None,
-                                        'text_elements': [],
-                                        'error': str(e)
-                                    }
-                                    
-                                finally:
-                                    # Always close the page to free memory
-                                    await page.close()
-                                    
                             except Exception as e:
                                 return {
                                     'slide_info': slide_info,
                                     'visual_elements': [],
                                     'background_path': None,
                                     'text_elements': [],
-                                    'error': f"Page creation failed: {str(e)}"
+                                    'error': str(e)
                                 }
-                    
-                    # Launch ALL slides in parallel
-                    parallel_tasks = [
-                        process_single_slide(slide_info) 
-                        for slide_info in self.slides_info
-                    ]
-                    
-                    # Wait for ALL slides to complete in parallel
-                    slide_analyses = await asyncio.gather(*parallel_tasks, return_exceptions=True)
-                    
-                    # Handle any top-level exceptions
-                    processed_analyses = []
-                    for i, result in enumerate(slide_analyses):
-                        if isinstance(result, Exception):
-                            error_analysis = {
-                                'slide_info': self.slides_info[i],
+                                
+                            finally:
+                                # Always close the page to free memory
+                                await page.close()
+                                
+                        except Exception as e:
+                            return {
+                                'slide_info': slide_info,
                                 'visual_elements': [],
                                 'background_path': None,
                                 'text_elements': [],
-                                'error': str(result)
+                                'error': f"Page creation failed: {str(e)}"
                             }
-                            processed_analyses.append(error_analysis)
-                        else:
-                            processed_analyses.append(result)
-                    
-                    all_slide_analyses = processed_analyses
-                    
-                finally:
-                    await browser.close()
+                
+                # Launch ALL slides in parallel
+                parallel_tasks = [
+                    process_single_slide(slide_info) 
+                    for slide_info in self.slides_info
+                ]
+                
+                # Wait for ALL slides to complete in parallel
+                slide_analyses = await asyncio.gather(*parallel_tasks, return_exceptions=True)
+                
+                # Handle any top-level exceptions
+                processed_analyses = []
+                for i, result in enumerate(slide_analyses):
+                    if isinstance(result, Exception):
+                        error_analysis = {
+                            'slide_info': self.slides_info[i],
+                            'visual_elements': [],
+                            'background_path': None,
+                            'text_elements': [],
+                            'error': str(result)
+                        }
+                        processed_analyses.append(error_analysis)
+                    else:
+                        processed_analyses.append(result)
+                
+                all_slide_analyses = processed_analyses
+        
             
             # Build PPTX presentation
             # Create new PowerPoint presentation
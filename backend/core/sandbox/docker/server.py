@@ -4,6 +4,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
 import uvicorn
 import os
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 # Import PDF router, PPTX router, DOCX router, and Visual HTML Editor router
@@ -11,6 +12,7 @@ from html_to_pdf_router import router as pdf_router
 from visual_html_editor_router import router as editor_router
 from html_to_pptx_router import router as pptx_router
 from html_to_docx_router import router as docx_router
+from browser_pool import browser_pool
 
 # Ensure we're serving from the /workspace directory
 workspace_dir = "/workspace"
@@ -23,7 +25,17 @@ class WorkspaceDirMiddleware(BaseHTTPMiddleware):
             os.makedirs(workspace_dir, exist_ok=True)
         return await call_next(request)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pre-warm the shared headless browser so the first export skips Chromium cold start
+    try:
+        await browser_pool.start()
+    except Exception as e:
+        print(f"⚠️ Browser pool warm-up failed, will start lazily: {e}")
+    yield
+    await browser_pool.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware to allow cross-origin requests
 app.add_middleware(
@@ -13,6 +13,8 @@ from core.resources import ResourceService, ResourceType, ResourceStatus
 
 class SandboxToolsBase(Tool):
     """Base class for all sandbox tools that provides project-based sandbox access."""
+
+    concurrency_class = "sandbox"
     
     # Class variable to track if sandbox URLs have been printed
     _urls_printed = False
@@ -0,0 +1,160 @@
+"""Content-addressed blob storage.
+
+Blobs are stored once under the SHA-256 of their content
+(`sha256/<2 hex>/<hash>`), zlib-compressed, so identical bodies written by
+different runs share one object and writes are idempotent.
+
+Backends (BLOB_STORE_BACKEND):
+- "supabase": the project's Supabase Storage (S3-compatible), bucket
+  BLOB_STORE_BUCKET (the default "blobs" bucket is created by a migration)
+- "local": files under BLOB_STORE_LOCAL_DIR, for development and tests
+
+Recently read blobs are kept in an in-process LRU (BLOB_CACHE_MAX_BYTES of
+decompressed content), so a body is downloaded once per worker rather than
+once per turn.
+
+Blobs are shared by content, so deleting a message, thread, project or
+account doesn't delete them. The `cleanup_unreferenced_blobs` pg_cron job
+removes Supabase blobs no message references any more (after a one-day grace
+period); the local backend is not collected.
+"""
+
+import asyncio
+import hashlib
+import os
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from core.services.supabase import DBConnection
+from core.utils.logger import logger
+
+BLOB_STORE_BACKEND = os.getenv("BLOB_STORE_BACKEND", "supabase").lower()
+BLOB_STORE_BUCKET = os.getenv("BLOB_STORE_BUCKET", "blobs")
+BLOB_STORE_LOCAL_DIR = os.getenv("BLOB_STORE_LOCAL_DIR", ".blob_store")
+BLOB_CACHE_MAX_BYTES = int(os.getenv("BLOB_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+BLOB_FETCH_CONCURRENCY = int(os.getenv("BLOB_FETCH_CONCURRENCY", "8"))
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def blob_key(digest: str) -> str:
+    return f"sha256/{digest[:2]}/{digest}"
+
+
+class LocalBlobBackend:
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def _write(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _read(self, key: str) -> bytes:
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+    async def put(self, key: str, data: bytes) -> None:
+        await asyncio.to_thread(self._write, key, data)
+
+    async def get(self, key: str) -> bytes:
+        return await asyncio.to_thread(self._read, key)
+
+
+class SupabaseBlobBackend:
+    def __init__(self, bucket: str):
+        self.bucket = bucket
+        self.db = DBConnection()
+
+    async def put(self, key: str, data: bytes) -> None:
+        client = await self.db.client
+        # Same key always means same content, so overwriting is harmless
+        await client.storage.from_(self.bucket).upload(
+            key, data, {"content-type": "application/octet-stream", "upsert": "true"}
+        )
+
+    async def get(self, key: str) -> bytes:
+        client = await self.db.client
+        return await client.storage.from_(self.bucket).download(key)
+
+
+class BlobStore:
+    def __init__(self):
+        self._backend = None
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._cache_bytes = 0
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            if BLOB_STORE_BACKEND == "local":
+                self._backend = LocalBlobBackend(BLOB_STORE_LOCAL_DIR)
+            else:
+                self._backend = SupabaseBlobBackend(BLOB_STORE_BUCKET)
+        return self._backend
+
+    def _remember(self, digest: str, data: bytes) -> None:
+        if len(data) > BLOB_CACHE_MAX_BYTES:
+            return
+        previous = self._cache.pop(digest, None)
+        if previous is not None:
+            self._cache_bytes -= len(previous)
+        self._cache[digest] = data
+        self._cache_bytes += len(data)
+        while self._cache_bytes > BLOB_CACHE_MAX_BYTES:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_bytes -= len(evicted)
+
+    async def put(self, data: bytes) -> str:
+        """Store `data`; returns its content hash.
+
+        Always uploads, even for a digest already cached: the upsert bumps the
+        object's updated_at, which cleanup_unreferenced_blobs uses as the
+        grace period for a message that is about to reference it.
+        """
+        digest = content_hash(data)
+        await self.backend.put(blob_key(digest), zlib.compress(data))
+        self._remember(digest, data)
+        return digest
+
+    async def get(self, digest: str) -> bytes:
+        data = self._cache.get(digest)
+        if data is not None:
+            self._cache.move_to_end(digest)
+            return data
+        data = zlib.decompress(await self.backend.get(blob_key(digest)))
+        if content_hash(data) != digest:
+            raise ValueError(f"Blob {digest} failed its content hash check")
+        self._remember(digest, data)
+        return data
+
+    async def get_many(self, digests: Iterable[str]) -> Dict[str, Optional[bytes]]:
+        """Fetch several blobs concurrently; a blob that can't be read maps to None."""
+        semaphore = asyncio.Semaphore(BLOB_FETCH_CONCURRENCY)
+
+        async def fetch(digest: str) -> Optional[bytes]:
+            async with semaphore:
+                try:
+                    return await self.get(digest)
+                except Exception as e:
+                    logger.warning(f"Failed to read blob {digest}: {e}")
+                    return None
+
+        unique = list(dict.fromkeys(digests))
+        results = await asyncio.gather(*(fetch(digest) for digest in unique))
+        return dict(zip(unique, results))
+
+
+# Global singleton instance
+blob_store = BlobStore()
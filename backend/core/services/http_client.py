@@ -0,0 +1,226 @@
+"""
+Shared outbound HTTP client pools for tool integrations.
+
+Tools used to open a fresh `httpx.AsyncClient()` (or `aiohttp.ClientSession()`)
+per call, paying DNS + TCP + TLS setup on every request and discarding
+keep-alive connections. This registry keeps one long-lived httpx client per
+upstream origin (scheme://host:port) per event loop, with connection limits,
+default timeouts, HTTP/2 when the `h2` package is installed, and simple
+per-origin metrics.
+
+Usage:
+    from core.services.http_client import http_clients
+
+    async with http_clients.borrow(url, timeout=120.0) as client:
+        response = await client.get(url)
+
+`borrow()` never closes the shared client; `timeout` (and `follow_redirects`)
+apply to requests made through the borrowed handle only. Pools are closed by
+`http_clients.close()` at worker shutdown.
+
+Tools also fetch arbitrary URLs (LLM-provided image URLs, replicate outputs,
+per-sandbox URLs), so the registry is bounded: at most HTTP_POOL_MAX_ORIGINS
+pools are kept, least recently used first out, and pools idle for
+HTTP_POOL_IDLE_SECONDS are closed. A pool is only closed once nothing
+borrows it.
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from core.utils.logger import logger
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+HTTP_POOL_MAX_CONNECTIONS = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "50"))
+HTTP_POOL_MAX_KEEPALIVE = int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "20"))
+HTTP_POOL_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_POOL_KEEPALIVE_EXPIRY", "30"))
+HTTP_POOL_MAX_ORIGINS = int(os.getenv("HTTP_POOL_MAX_ORIGINS", "64"))
+HTTP_POOL_IDLE_SECONDS = float(os.getenv("HTTP_POOL_IDLE_SECONDS", "300"))
+HTTP_DEFAULT_TIMEOUT = httpx.Timeout(30.0, connect=10.0)
+
+_UNSET: Any = object()
+
+
+def origin_of(url: str) -> str:
+    """scheme://host[:port] for a URL (the pooling key)."""
+    parts = urlsplit(url if "://" in url else f"https://{url}")
+    return f"{parts.scheme or 'https'}://{parts.netloc.lower()}"
+
+
+class _OriginStats:
+    __slots__ = ("requests", "errors", "total_ms")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.total_ms = 0.0
+
+
+class _Pool:
+    __slots__ = ("client", "last_used", "borrowers")
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.last_used = time.monotonic()
+        self.borrowers = 0
+
+
+class BorrowedClient:
+    """Request-only view of a shared client with per-borrow defaults."""
+
+    def __init__(self, client: httpx.AsyncClient, stats: _OriginStats, timeout: Any = _UNSET, follow_redirects: Optional[bool] = None):
+        self._client = client
+        self._stats = stats
+        self._timeout = timeout
+        self._follow_redirects = follow_redirects
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        if self._timeout is not _UNSET:
+            kwargs.setdefault("timeout", self._timeout)
+        if self._follow_redirects is not None:
+            kwargs.setdefault("follow_redirects", self._follow_redirects)
+        start = time.perf_counter()
+        self._stats.requests += 1
+        try:
+            return await self._client.request(method, url, **kwargs)
+        except Exception:
+            self._stats.errors += 1
+            raise
+        finally:
+            self._stats.total_ms += (time.perf_counter() - start) * 1000
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def put(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("PUT", url, **kwargs)
+
+    async def patch(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("PATCH", url, **kwargs)
+
+    async def delete(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("DELETE", url, **kwargs)
+
+
+class HttpClientRegistry:
+    """Per-process registry of pooled httpx clients, keyed by (event loop, origin)."""
+
+    def __init__(self):
+        # Least recently used first
+        self._pools: "OrderedDict[Tuple[int, str], _Pool]" = OrderedDict()
+        self._stats: "OrderedDict[str, _OriginStats]" = OrderedDict()
+
+    def _new_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            timeout=HTTP_DEFAULT_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=HTTP_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_POOL_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_POOL_KEEPALIVE_EXPIRY,
+            ),
+        )
+
+    def _pool(self, url: str) -> _Pool:
+        # httpx connections are bound to the loop that opened them
+        key = (id(asyncio.get_running_loop()), origin_of(url))
+        pool = self._pools.get(key)
+        if pool is None or pool.client.is_closed:
+            pool = _Pool(self._new_client())
+            self._pools[key] = pool
+            logger.debug(f"Created pooled HTTP client for {key[1]} (http2={HTTP2_AVAILABLE})")
+        self._pools.move_to_end(key)
+        pool.last_used = time.monotonic()
+        return pool
+
+    def get(self, url: str) -> httpx.AsyncClient:
+        """Shared client for the URL's origin in the current event loop.
+
+        Prefer borrow(): a client obtained here can be closed by eviction.
+        """
+        return self._pool(url).client
+
+    def _origin_stats(self, origin: str) -> _OriginStats:
+        stats = self._stats.get(origin)
+        if stats is None:
+            stats = self._stats[origin] = _OriginStats()
+        self._stats.move_to_end(origin)
+        while len(self._stats) > HTTP_POOL_MAX_ORIGINS:
+            self._stats.popitem(last=False)
+        return stats
+
+    async def _evict(self) -> None:
+        """Close pools over the cap or idle too long, skipping borrowed ones."""
+        now = time.monotonic()
+        loop_id = id(asyncio.get_running_loop())
+        excess = len(self._pools) - HTTP_POOL_MAX_ORIGINS
+        evicted = []
+        for key, pool in list(self._pools.items()):
+            if excess <= 0 and now - pool.last_used < HTTP_POOL_IDLE_SECONDS:
+                # Ordered by last use, so the rest are newer
+                break
+            # Pools of other loops are closed from their own loop
+            if pool.borrowers or key[0] != loop_id:
+                continue
+            del self._pools[key]
+            excess -= 1
+            evicted.append((key[1], pool.client))
+        for origin, client in evicted:
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.debug(f"Error closing pooled HTTP client for {origin}: {e}")
+        if evicted:
+            logger.debug(f"Evicted {len(evicted)} pooled HTTP clients ({len(self._pools)} left)")
+
+    @asynccontextmanager
+    async def borrow(self, url: str, timeout: Any = _UNSET, follow_redirects: Optional[bool] = None):
+        """Borrow the pooled client for `url`'s origin; it stays open afterwards."""
+        pool = self._pool(url)
+        stats = self._origin_stats(origin_of(url))
+        pool.borrowers += 1
+        try:
+            yield BorrowedClient(pool.client, stats, timeout=timeout, follow_redirects=follow_redirects)
+        finally:
+            pool.borrowers -= 1
+            pool.last_used = time.monotonic()
+        await self._evict()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {
+            origin: {
+                "requests": s.requests,
+                "errors": s.errors,
+                "avg_ms": round(s.total_ms / s.requests, 1) if s.requests else 0.0,
+            }
+            for origin, s in self._stats.items()
+        }
+
+    async def close(self) -> None:
+        """Close all pools (worker shutdown)."""
+        pools, self._pools = list(self._pools.values()), OrderedDict()
+        for pool in pools:
+            client = pool.client
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.debug(f"Error closing pooled HTTP client: {e}")
+
+
+# Global singleton instance
+http_clients = HttpClientRegistry()
@@ -5,6 +5,10 @@ This module provides a simplified Redis client that:
 - Eliminates Pub/Sub in favor of Redis Streams
 - Uses simple keys for control signals
 - Avoids event loop issues with proper threading.Lock usage
+- Offers pipelined batches (`batch()`, `mget`/`mset`/`unlink_many`) and a
+  coalescing writer that flushes queued writes in one round-trip
+- Records per-command counts, errors and round-trip times for every helper
+  call and batch (`command_stats()`, and the redis_* Prometheus metrics)
 """
 
 import redis.asyncio as redis_lib
@@ -12,14 +16,155 @@ from redis.asyncio import Redis, ConnectionPool
 from redis.exceptions import ConnectionError as RedisConnectionError, BusyLoadingError
 from redis.backoff import ExponentialBackoff
 from redis.retry import Retry
+import asyncio
 import os
 import threading
-from typing import Optional, Dict, List, Any
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, List, Any, Tuple
 from dotenv import load_dotenv
 from core.utils.logger import logger
+from core.utils import timing
 
 # Constants
 REDIS_KEY_TTL = 3600 * 2  # 2 hours default TTL
+RUN_CONTROL_STREAM = "agent_run:control"  # stop events, read by each worker's run control dispatcher
+RUN_CONTROL_STREAM_MAXLEN = 10000
+KEY_REGISTRY_PREFIX = "key_registry:"
+WRITER_MAX_BATCH = int(os.getenv("REDIS_WRITER_MAX_BATCH", "64"))
+WRITER_FLUSH_MS = float(os.getenv("REDIS_WRITER_FLUSH_MS", "5"))
+UNLINK_CHUNK_SIZE = 500
+
+
+class _CommandStats:
+    __slots__ = ("commands", "round_trips", "errors", "total_ms")
+
+    def __init__(self):
+        self.commands = 0
+        self.round_trips = 0
+        self.errors = 0
+        self.total_ms = 0.0
+
+
+class RedisBatch:
+    """Commands queued on a pipeline and sent in one round-trip.
+
+    Any redis-py command method can be called on the batch (`batch.xadd(...)`,
+    `batch.expire(...)`); results are available from `execute()` or
+    `batch.results` in queue order.
+    """
+
+    def __init__(self, owner: "RedisClient", pipeline):
+        self._owner = owner
+        self._pipe = pipeline
+        self._commands: List[str] = []
+        self.results: List[Any] = []
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._pipe, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        def queue(*args, **kwargs):
+            attr(*args, **kwargs)
+            self._commands.append(name)
+            return self
+        return queue
+
+    def __len__(self) -> int:
+        return len(self._commands)
+
+    async def execute(self, raise_on_error: bool = True) -> List[Any]:
+        if not self._commands:
+            return []
+        commands, self._commands = self._commands, []
+        start = time.perf_counter()
+        try:
+            self.results = await self._pipe.execute(raise_on_error=raise_on_error)
+        except Exception:
+            self._owner._record(commands, (time.perf_counter() - start) * 1000, failed=commands)
+            raise
+        failed = [name for name, result in zip(commands, self.results) if isinstance(result, Exception)]
+        self._owner._record(commands, (time.perf_counter() - start) * 1000, failed=failed)
+        return self.results
+
+
+class RedisWriteCoalescer:
+    """Buffers fire-and-forget writes and flushes them as one pipeline.
+
+    A flush happens when `max_batch` commands are queued or `flush_ms` after
+    the first queued command, whichever comes first. Commands are sent in
+    queue order and flushes never overlap, so per-key ordering is kept.
+    Failures are logged and counted; call `flush()` (or `close()`) before
+    issuing writes that must land after the buffered ones.
+    """
+
+    def __init__(self, owner: "RedisClient", max_batch: int = WRITER_MAX_BATCH, flush_ms: float = WRITER_FLUSH_MS, span_name: Optional[str] = None):
+        self._owner = owner
+        self.max_batch = max_batch
+        self.flush_ms = flush_ms
+        # Timing phase recorded for every flush round-trip (see core.utils.timing)
+        self.span_name = span_name
+        self._queue: List[Tuple[str, tuple, dict]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self.flushes = 0
+        self.failed = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def write(self, command: str, *args, **kwargs) -> None:
+        """Queue a redis-py command, e.g. `write("xadd", key, fields, maxlen=200)`."""
+        self._queue.append((command, args, kwargs))
+        if len(self._queue) >= self.max_batch:
+            self._schedule_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.flush_ms / 1000, self._schedule_flush)
+
+    def _schedule_flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self.flush())
+
+    async def flush(self) -> int:
+        """Send everything queued so far; returns the number of failed commands."""
+        async with self._flush_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            items, self._queue = self._queue, []
+            if not items:
+                return 0
+            failed = 0
+            start = time.perf_counter()
+            try:
+                async with self._owner.batch() as batch:
+                    for command, args, kwargs in items:
+                        getattr(batch, command)(*args, **kwargs)
+                    results = await batch.execute(raise_on_error=False)
+                failed = sum(1 for result in results if isinstance(result, Exception))
+                if failed:
+                    first_error = next(result for result in results if isinstance(result, Exception))
+                    logger.warning(f"Redis writer: {failed}/{len(items)} commands failed: {first_error}")
+            except Exception as e:
+                failed = len(items)
+                logger.warning(f"Redis writer flush of {len(items)} commands failed: {e}")
+            if self.span_name:
+                timing.observe(self.span_name, time.perf_counter() - start)
+            self.flushes += 1
+            self.failed += failed
+            return failed
+
+    async def close(self) -> int:
+        """Flush remaining writes (waits for an in-flight timed flush too)."""
+        if self._flush_task is not None and not self._flush_task.done():
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        return await self.flush()
 
 
 class RedisClient:
@@ -34,6 +179,7 @@ class RedisClient:
         self._client: Optional[Redis] = None
         self._init_lock = threading.Lock()
         self._initialized = False
+        self._command_stats: Dict[str, _CommandStats] = {}
     
     def _get_config(self) -> Dict[str, Any]:
         """Get Redis configuration from environment."""
@@ -165,32 +311,32 @@ class RedisClient:
     async def get(self, key: str) -> Optional[str]:
         """Get value for a key."""
         client = await self.get_client()
-        return await client.get(key)
+        return await self._timed("get", client.get(key))
     
     async def set(self, key: str, value: str, ex: int = None, nx: bool = False) -> bool:
         """Set value for a key with optional expiration and NX flag."""
         client = await self.get_client()
-        return await client.set(key, value, ex=ex, nx=nx)
+        return await self._timed("set", client.set(key, value, ex=ex, nx=nx))
     
     async def setex(self, key: str, seconds: int, value: str) -> bool:
         """Set value for a key with expiration."""
         client = await self.get_client()
-        return await client.setex(key, seconds, value)
+        return await self._timed("setex", client.setex(key, seconds, value))
     
     async def delete(self, key: str) -> int:
         """Delete a key."""
         client = await self.get_client()
-        return await client.delete(key)
+        return await self._timed("delete", client.delete(key))
     
     async def expire(self, key: str, seconds: int) -> bool:
         """Set expiration on a key."""
         client = await self.get_client()
-        return await client.expire(key, seconds)
+        return await self._timed("expire", client.expire(key, seconds))
     
     async def ttl(self, key: str) -> int:
         """Get TTL for a key."""
         client = await self.get_client()
-        return await client.ttl(key)
+        return await self._timed("ttl", client.ttl(key))
     
     async def scan_keys(self, pattern: str, count: int = 100) -> List[str]:
         """Scan for keys matching a pattern (non-blocking alternative to keys())."""
@@ -203,22 +349,27 @@ class RedisClient:
     async def scard(self, key: str) -> int:
         """Get the number of members in a set."""
         client = await self.get_client()
-        return await client.scard(key)
+        return await self._timed("scard", client.scard(key))
     
     async def zrangebyscore(self, key: str, min: str, max: str) -> List[str]:
         """Get members from a sorted set by score range."""
         client = await self.get_client()
-        return await client.zrangebyscore(key, min=min, max=max)
+        return await self._timed("zrangebyscore", client.zrangebyscore(key, min=min, max=max))
     
     async def zscore(self, key: str, member: str) -> Optional[float]:
         """Get score of a member in a sorted set."""
         client = await self.get_client()
-        return await client.zscore(key, member)
+        return await self._timed("zscore", client.zscore(key, member))
+    
+    async def zrem(self, key: str, *members: str) -> int:
+        """Remove members from a sorted set."""
+        client = await self.get_client()
+        return await self._timed("zrem", client.zrem(key, *members))
     
     async def llen(self, key: str) -> int:
         """Get the length of a list."""
         client = await self.get_client()
-        return await client.llen(key)
+        return await self._timed("llen", client.llen(key))
     
     # ========== Stream Operations ==========
     
@@ -239,7 +390,7 @@ class RedisClient:
         if maxlen is not None:
             kwargs['maxlen'] = maxlen
             kwargs['approximate'] = approximate
-        return await client.xadd(stream_key, fields, **kwargs)
+        return await self._timed("xadd", client.xadd(stream_key, fields, **kwargs))
     
     async def stream_read(self, stream_key: str, last_id: str = "0", block_ms: int = 0, count: int = None) -> List[tuple]:
         """Read entries from a Redis stream.
@@ -255,7 +406,7 @@ class RedisClient:
         """
         client = await self.get_client()
         streams = {stream_key: last_id}
-        result = await client.xread(streams, count=count, block=block_ms)
+        result = await self._timed("xread", client.xread(streams, count=count, block=block_ms))
         
         if not result:
             return []
@@ -281,13 +432,19 @@ class RedisClient:
             List of (entry_id, fields_dict) tuples
         """
         client = await self.get_client()
-        result = await client.xrange(stream_key, start, end, count=count)
+        result = await self._timed("xrange", client.xrange(stream_key, start, end, count=count))
         return [(entry_id, fields) for entry_id, fields in result]
     
+    async def stream_last_id(self, stream_key: str) -> Optional[str]:
+        """Get the ID of the newest entry in a Redis stream (None if empty)."""
+        client = await self.get_client()
+        result = await self._timed("xrevrange", client.xrevrange(stream_key, "+", "-", count=1))
+        return result[0][0] if result else None
+    
     async def stream_len(self, stream_key: str) -> int:
         """Get length of a Redis stream."""
         client = await self.get_client()
-        return await client.xlen(stream_key)
+        return await self._timed("xlen", client.xlen(stream_key))
     
     # Legacy aliases for compatibility
     async def xadd(self, stream_key: str, fields: Dict[str, str], maxlen: int = None, approximate: bool = True) -> str:
@@ -297,12 +454,12 @@ class RedisClient:
     async def xread(self, streams: Dict[str, str], count: int = None, block: int = None) -> List:
         """Legacy xread interface for compatibility."""
         client = await self.get_client()
-        return await client.xread(streams, count=count, block=block)
+        return await self._timed("xread", client.xread(streams, count=count, block=block))
     
     async def xrange(self, stream_key: str, start: str = "-", end: str = "+", count: int = None) -> List:
         """Legacy xrange interface for compatibility."""
         client = await self.get_client()
-        return await client.xrange(stream_key, start, end, count=count)
+        return await self._timed("xrange", client.xrange(stream_key, start, end, count=count))
     
     async def xlen(self, stream_key: str) -> int:
         """Legacy alias for stream_len."""
@@ -311,17 +468,166 @@ class RedisClient:
     async def xtrim_minid(self, stream_key: str, minid: str, approximate: bool = True) -> int:
         """Trim stream entries older than minid."""
         client = await self.get_client()
-        return await client.xtrim(stream_key, minid=minid, approximate=approximate)
+        return await self._timed("xtrim", client.xtrim(stream_key, minid=minid, approximate=approximate))
+    
+    # ========== Batching ==========
+    
+    def _record(self, commands: List[str], elapsed_ms: float, failed: List[str] = ()) -> None:
+        for name in commands:
+            stats = self._command_stats.get(name)
+            if stats is None:
+                stats = self._command_stats[name] = _CommandStats()
+            stats.commands += 1
+        # Round-trip time is attributed once per distinct command type in the batch
+        for name in dict.fromkeys(commands):
+            stats = self._command_stats[name]
+            stats.round_trips += 1
+            stats.total_ms += elapsed_ms
+        for name in failed:
+            self._command_stats[name].errors += 1
+        timing.observe_redis(commands, elapsed_ms / 1000, failed)
+    
+    async def _timed(self, name: str, awaitable):
+        start = time.perf_counter()
+        try:
+            result = await awaitable
+        except Exception:
+            self._record([name], (time.perf_counter() - start) * 1000, failed=[name])
+            raise
+        self._record([name], (time.perf_counter() - start) * 1000)
+        return result
+    
+    @asynccontextmanager
+    async def batch(self, transaction: bool = False):
+        """Queue commands and send them in one round-trip on exit.
+        
+        Usage:
+            async with redis.batch() as batch:
+                batch.xadd(stream_key, fields, maxlen=200)
+                batch.expire(stream_key, 600)
+            ids, _ = batch.results
+        
+        Nothing is sent if the block raises.
+        """
+        client = await self.get_client()
+        async with client.pipeline(transaction=transaction) as pipe:
+            batch = RedisBatch(self, pipe)
+            yield batch
+            await batch.execute()
+    
+    def writer(self, max_batch: int = WRITER_MAX_BATCH, flush_ms: float = WRITER_FLUSH_MS, span_name: Optional[str] = None) -> RedisWriteCoalescer:
+        """Create a coalescing writer bound to the current event loop."""
+        return RedisWriteCoalescer(self, max_batch=max_batch, flush_ms=flush_ms, span_name=span_name)
+    
+    async def mget(self, keys: List[str]) -> List[Optional[str]]:
+        """Get several keys in one command."""
+        if not keys:
+            return []
+        client = await self.get_client()
+        return await self._timed("mget", client.mget(keys))
+    
+    async def mset(self, mapping: Dict[str, str], ex: int = None) -> None:
+        """Set several keys in one round-trip (pipelined SETs when `ex` is given)."""
+        if not mapping:
+            return
+        if ex is None:
+            client = await self.get_client()
+            await self._timed("mset", client.mset(mapping))
+            return
+        async with self.batch() as batch:
+            for key, value in mapping.items():
+                batch.set(key, value, ex=ex)
+    
+    async def unlink_many(self, keys: List[str]) -> int:
+        """UNLINK keys in chunks sent as one pipeline; returns the number removed."""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return 0
+        async with self.batch() as batch:
+            for i in range(0, len(keys), UNLINK_CHUNK_SIZE):
+                batch.unlink(*keys[i:i + UNLINK_CHUNK_SIZE])
+        return sum(batch.results)
+    
+    def command_stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-command counts, errors and average round-trip time for helper calls and batches."""
+        return {
+            name: {
+                "commands": s.commands,
+                "round_trips": s.round_trips,
+                "errors": s.errors,
+                "avg_ms": round(s.total_ms / s.round_trips, 2) if s.round_trips else 0.0,
+            }
+            for name, s in self._command_stats.items()
+        }
+    
+    # ========== Key Registry ==========
+    #
+    # Owners (an agent run, a cache) record the keys they create in a sorted
+    # set scored by expiry time, so cleanup and counting never need a
+    # keyspace SCAN. Members past their expiry are ignored and pruned lazily.
+    
+    async def register_keys(self, owner: str, keys: List[str], ttl: int = REDIS_KEY_TTL) -> None:
+        """Record keys created on behalf of `owner` (expected to live `ttl` seconds)."""
+        if not keys:
+            return
+        registry_key = f"{KEY_REGISTRY_PREFIX}{owner}"
+        expires_at = time.time() + ttl
+        async with self.batch() as batch:
+            batch.zadd(registry_key, {key: expires_at for key in keys})
+            # GT: never shorten the registry's own lifetime
+            batch.expire(registry_key, ttl, gt=True)
+            batch.expire(registry_key, ttl, nx=True)
+    
+    async def unregister_keys(self, owner: str, keys: List[str]) -> None:
+        """Forget keys the owner deleted itself."""
+        if not keys:
+            return
+        client = await self.get_client()
+        await self._timed("zrem", client.zrem(f"{KEY_REGISTRY_PREFIX}{owner}", *keys))
+    
+    async def count_registered_keys(self, owner: str) -> int:
+        """Number of live keys registered by `owner`."""
+        registry_key = f"{KEY_REGISTRY_PREFIX}{owner}"
+        now = time.time()
+        async with self.batch() as batch:
+            batch.zremrangebyscore(registry_key, "-inf", now)
+            batch.zcard(registry_key)
+        _, count = batch.results
+        return count
+    
+    async def unlink_registered_keys(self, owner: str, extra_keys: Optional[List[str]] = None) -> int:
+        """UNLINK every key registered by `owner` (plus `extra_keys`) and the registry itself.
+        
+        Returns the number of keys removed, not counting the registry.
+        """
+        registry_key = f"{KEY_REGISTRY_PREFIX}{owner}"
+        client = await self.get_client()
+        registered = await self._timed("zrange", client.zrange(registry_key, 0, -1))
+        keys = list(dict.fromkeys([*(extra_keys or []), *registered]))
+        if not keys:
+            await self._timed("unlink", client.unlink(registry_key))
+            return 0
+        async with self.batch() as batch:
+            batch.unlink(*keys)
+            batch.unlink(registry_key)
+        removed, _ = batch.results
+        return removed
     
     # ========== Control Signal Helpers ==========
     
     async def set_stop_signal(self, agent_run_id: str) -> None:
         """Set stop signal for an agent run.
         
-        Uses a simple Redis key: agent_run:{agent_run_id}:stop = "1"
+        Uses a simple Redis key: agent_run:{agent_run_id}:stop = "1", and
+        announces it on RUN_CONTROL_STREAM so workers react without polling.
         """
         key = f"agent_run:{agent_run_id}:stop"
         await self.set(key, "1", ex=300)  # 5 minute TTL
+        await self.stream_add(
+            RUN_CONTROL_STREAM,
+            {"agent_run_id": agent_run_id, "action": "stop"},
+            maxlen=RUN_CONTROL_STREAM_MAXLEN,
+        )
         logger.info(f"Set stop signal for agent run {agent_run_id}")
     
     async def check_stop_signal(self, agent_run_id: str) -> bool:
@@ -413,6 +719,10 @@ async def zscore(key: str, member: str):
     """Get score of member in sorted set (compatibility function)."""
     return await redis.zscore(key, member)
 
+async def zrem(key: str, *members: str) -> int:
+    """Remove members from a sorted set (compatibility function)."""
+    return await redis.zrem(key, *members)
+
 async def llen(key: str) -> int:
     """Get length of a list (compatibility function)."""
     return await redis.llen(key)
@@ -430,6 +740,10 @@ async def stream_range(stream_key: str, start: str = "-", end: str = "+", count:
     """Get stream range (compatibility function)."""
     return await redis.stream_range(stream_key, start, end, count=count)
 
+async def stream_last_id(stream_key: str):
+    """Get newest stream entry ID (compatibility function)."""
+    return await redis.stream_last_id(stream_key)
+
 async def stream_len(stream_key: str) -> int:
     """Get stream length (compatibility function)."""
     return await redis.stream_len(stream_key)
@@ -455,6 +769,48 @@ async def xtrim_minid(stream_key: str, minid: str, approximate: bool = True) ->
     """Trim stream entries older than minid (compatibility function)."""
     return await redis.xtrim_minid(stream_key, minid, approximate=approximate)
 
+# Batching helpers
+def batch(transaction: bool = False):
+    """Pipelined batch context manager (compatibility function)."""
+    return redis.batch(transaction=transaction)
+
+def writer(max_batch: int = WRITER_MAX_BATCH, flush_ms: float = WRITER_FLUSH_MS, span_name: Optional[str] = None) -> RedisWriteCoalescer:
+    """Create a coalescing writer (compatibility function)."""
+    return redis.writer(max_batch=max_batch, flush_ms=flush_ms, span_name=span_name)
+
+async def mget(keys: List[str]) -> List[Optional[str]]:
+    """Get several keys (compatibility function)."""
+    return await redis.mget(keys)
+
+async def mset(mapping: Dict[str, str], ex: int = None):
+    """Set several keys (compatibility function)."""
+    await redis.mset(mapping, ex=ex)
+
+async def unlink_many(keys: List[str]) -> int:
+    """Unlink several keys (compatibility function)."""
+    return await redis.unlink_many(keys)
+
+def command_stats() -> Dict[str, Dict[str, float]]:
+    """Batched command metrics (compatibility function)."""
+    return redis.command_stats()
+
+# Key registry helpers
+async def register_keys(owner: str, keys: List[str], ttl: int = REDIS_KEY_TTL):
+    """Register owned keys (compatibility function)."""
+    await redis.register_keys(owner, keys, ttl=ttl)
+
+async def unregister_keys(owner: str, keys: List[str]):
+    """Unregister owned keys (compatibility function)."""
+    await redis.unregister_keys(owner, keys)
+
+async def count_registered_keys(owner: str) -> int:
+    """Count live owned keys (compatibility function)."""
+    return await redis.count_registered_keys(owner)
+
+async def unlink_registered_keys(owner: str, extra_keys: Optional[List[str]] = None) -> int:
+    """Unlink all owned keys (compatibility function)."""
+    return await redis.unlink_registered_keys(owner, extra_keys=extra_keys)
+
 # Control signal helpers
 async def set_stop_signal(agent_run_id: str):
     """Set stop signal (compatibility function)."""
@@ -473,7 +829,10 @@ async def clear_stop_signal(agent_run_id: str):
 __all__ = [
     'redis',
     'RedisClient',
+    'RedisBatch',
+    'RedisWriteCoalescer',
     'REDIS_KEY_TTL',
+    'RUN_CONTROL_STREAM',
     'get_redis_config',
     'get_client',
     'initialize_async',
@@ -489,17 +848,29 @@ __all__ = [
     'scard',
     'zrangebyscore',
     'zscore',
+    'zrem',
     'llen',
     'scan_keys',
     'stream_add',
     'stream_read',
     'stream_range',
+    'stream_last_id',
     'stream_len',
     'xadd',
     'xread',
     'xrange',
     'xlen',
     'xtrim_minid',
+    'batch',
+    'writer',
+    'mget',
+    'mset',
+    'unlink_many',
+    'command_stats',
+    'register_keys',
+    'unregister_keys',
+    'count_registered_keys',
+    'unlink_registered_keys',
     'set_stop_signal',
     'check_stop_signal',
     'clear_stop_signal',
@@ -0,0 +1,177 @@
+"""Admission control for per-account concurrent agent run limits.
+
+`/agent/start` used to count an account's running runs with a Postgres join
+(cached for 5s), which both sat on the start path and let bursts through:
+two starts within the cache window saw the same count.
+
+Each account now has a sorted set `run_slots:{account_id}` whose members are
+agent run ids and whose scores are lease expiry times (ms). A Lua script
+expires stale leases, checks the limit and adds the new run's slot in one
+step, so concurrent starts cannot overshoot. The run id is generated before
+the `agent_runs` row is inserted, so the slot never needs renaming.
+
+- The worker releases the slot when it writes the run's final status.
+- Leases are renewed by the run control keepalive while the run is alive; a
+  crashed worker's slot expires after RUN_SLOT_LEASE_SECONDS.
+- Every RUN_SLOT_RECONCILE_INTERVAL seconds per account (on the next check),
+  slots are reconciled against running rows in `agent_runs`: slots of runs
+  no longer running are dropped (unless reserved within the grace period,
+  i.e. the row may not be written yet) and running runs without a slot are
+  added.
+
+Redis errors fail open, like the database check did.
+"""
+
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.services import redis
+from core.utils.logger import logger
+
+# Renewed every RUN_CONTROL_KEEPALIVE_INTERVAL (300s) while the run is alive
+RUN_SLOT_LEASE_SECONDS = int(os.getenv("RUN_SLOT_LEASE_SECONDS", "900"))
+RUN_SLOT_GRACE_SECONDS = int(os.getenv("RUN_SLOT_GRACE_SECONDS", "120"))
+RUN_SLOT_RECONCILE_INTERVAL = int(os.getenv("RUN_SLOT_RECONCILE_INTERVAL", "300"))
+
+# KEYS[1] slot set; ARGV: now_ms, lease_ms, limit, run_id
+_RESERVE_LUA = """
+local now = tonumber(ARGV[1])
+local lease = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZSCORE', KEYS[1], ARGV[4]) then
+    redis.call('ZADD', KEYS[1], now + lease, ARGV[4])
+    redis.call('PEXPIRE', KEYS[1], lease)
+    return {1, redis.call('ZCARD', KEYS[1])}
+end
+local count = redis.call('ZCARD', KEYS[1])
+if count >= tonumber(ARGV[3]) then
+    return {0, count}
+end
+redis.call('ZADD', KEYS[1], now + lease, ARGV[4])
+redis.call('PEXPIRE', KEYS[1], lease)
+return {1, count + 1}
+"""
+
+# KEYS[1] slot set; ARGV: now_ms, lease_ms, grace_cutoff_ms, n_running, running ids...
+_RECONCILE_LUA = """
+local now = tonumber(ARGV[1])
+local lease = tonumber(ARGV[2])
+local cutoff = tonumber(ARGV[3])
+local n = tonumber(ARGV[4])
+local running = {}
+for i = 1, n do
+    running[ARGV[4 + i]] = true
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+local removed = 0
+local slots = redis.call('ZRANGE', KEYS[1], 0, -1, 'WITHSCORES')
+for i = 1, #slots, 2 do
+    if not running[slots[i]] and tonumber(slots[i + 1]) < cutoff then
+        redis.call('ZREM', KEYS[1], slots[i])
+        removed = removed + 1
+    end
+end
+local added = 0
+for i = 1, n do
+    added = added + redis.call('ZADD', KEYS[1], 'NX', now + lease, ARGV[4 + i])
+end
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('PEXPIRE', KEYS[1], lease)
+end
+return {removed, added}
+"""
+
+
+def slots_key(account_id: str) -> str:
+    return f"run_slots:{account_id}"
+
+
+def _reconciled_key(account_id: str) -> str:
+    return f"run_slots_reconciled:{account_id}"
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class RunAdmission:
+    def __init__(self):
+        self._scripts: Dict[str, Any] = {}
+        self._script_client = None
+
+    async def _script(self, name: str, source: str):
+        client = await redis.get_client()
+        if self._script_client is not client:
+            self._scripts = {}
+            self._script_client = client
+        script = self._scripts.get(name)
+        if script is None:
+            script = client.register_script(source)
+            self._scripts[name] = script
+        return script
+
+    async def reconcile(self, client, account_id: str) -> Tuple[int, int]:
+        """Align the account's slots with its running `agent_runs` rows; returns (removed, added)."""
+        since = (datetime.now(timezone.utc) - timedelta(hours=24)).isoformat()
+        result = await client.table('agent_runs').select(
+            'id, threads!inner(account_id)'
+        ).eq('threads.account_id', account_id).eq('status', 'running').gte('started_at', since).execute()
+        running_ids = [row['id'] for row in (result.data or [])]
+
+        now = _now_ms()
+        lease_ms = RUN_SLOT_LEASE_SECONDS * 1000
+        # A slot reserved (or renewed) within the grace period may not have its row yet
+        cutoff = now + lease_ms - RUN_SLOT_GRACE_SECONDS * 1000
+        script = await self._script('reconcile', _RECONCILE_LUA)
+        removed, added = await script(
+            keys=[slots_key(account_id)],
+            args=[now, lease_ms, cutoff, len(running_ids), *running_ids],
+        )
+        if removed or added:
+            logger.info(f"Reconciled run slots for {account_id}: removed {removed}, added {added}")
+        return int(removed), int(added)
+
+    async def _maybe_reconcile(self, client, account_id: str) -> None:
+        try:
+            if not await redis.set(_reconciled_key(account_id), "1", nx=True, ex=RUN_SLOT_RECONCILE_INTERVAL):
+                return
+            await self.reconcile(client, account_id)
+        except Exception as e:
+            logger.warning(f"Run slot reconciliation failed for {account_id}: {e}")
+
+    async def reserve(self, client, account_id: str, agent_run_id: str, limit: int) -> Tuple[bool, int]:
+        """Atomically take a slot for `agent_run_id`; returns (admitted, slots in use)."""
+        await self._maybe_reconcile(client, account_id)
+        try:
+            script = await self._script('reserve', _RESERVE_LUA)
+            admitted, count = await script(
+                keys=[slots_key(account_id)],
+                args=[_now_ms(), RUN_SLOT_LEASE_SECONDS * 1000, limit, agent_run_id],
+            )
+        except Exception as e:
+            logger.warning(f"Run slot reservation failed for {account_id}, admitting without a slot: {e}")
+            return True, 0
+        return bool(admitted), int(count)
+
+    async def running_run_ids(self, client, account_id: str) -> List[str]:
+        """Run ids currently holding a slot (reconciled first if due)."""
+        await self._maybe_reconcile(client, account_id)
+        return await redis.zrangebyscore(slots_key(account_id), _now_ms(), "+inf")
+
+    async def release(self, account_id: str, agent_run_id: str) -> None:
+        try:
+            await redis.zrem(slots_key(account_id), agent_run_id)
+        except Exception as e:
+            logger.warning(f"Failed to release run slot {agent_run_id} for {account_id}: {e}")
+
+    def queue_renewal(self, pipe, account_id: str, agent_run_id: str) -> None:
+        """Add lease renewal commands for a live run to a pipeline or redis.batch()."""
+        key = slots_key(account_id)
+        pipe.zadd(key, {agent_run_id: _now_ms() + RUN_SLOT_LEASE_SECONDS * 1000}, xx=True)
+        pipe.expire(key, RUN_SLOT_LEASE_SECONDS)
+
+
+# Global singleton instance
+run_admission = RunAdmission()
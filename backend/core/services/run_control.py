@@ -0,0 +1,178 @@
+"""Per-worker delivery of agent run stop signals.
+
+Each run used to poll `agent_run:{id}:stop` every 500ms and refresh its
+`active_run:*` TTL from the same loop, so Redis load grew linearly with the
+number of concurrent runs and stop latency was up to half a second.
+
+RunControlDispatcher keeps, per worker process:
+
+- one reader task doing a blocking XREAD on the `agent_run:control` stream
+  (written by `redis.set_stop_signal`), which routes stop events to the
+  registered run's callback immediately;
+- one keepalive task that refreshes the TTL of every registered run's
+  keepalive keys (and the lease of its concurrent run slot, see
+  run_admission) with a single pipelined batch.
+
+The stop key is still written (and checked once on registration, and for
+all runs after reader errors), so a stop issued before a run registered or
+while the reader was reconnecting is never lost.
+
+Usage:
+    await run_control.register(agent_run_id, on_stop, keepalive_keys=[key])
+    try:
+        ...
+    finally:
+        run_control.unregister(agent_run_id)
+"""
+
+import asyncio
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+from core.services import redis
+from core.services.run_admission import run_admission
+from core.utils.logger import logger
+
+RUN_CONTROL_BLOCK_MS = int(os.getenv("RUN_CONTROL_BLOCK_MS", "5000"))
+RUN_CONTROL_KEEPALIVE_INTERVAL = int(os.getenv("RUN_CONTROL_KEEPALIVE_INTERVAL", "300"))
+RUN_CONTROL_ERROR_BACKOFF = 1.0
+
+
+class _WatchedRun:
+    __slots__ = ("agent_run_id", "on_stop", "keepalive_keys", "account_id", "stopped")
+
+    def __init__(self, agent_run_id: str, on_stop: Callable[[str], None], keepalive_keys: List[str], account_id: Optional[str] = None):
+        self.agent_run_id = agent_run_id
+        self.on_stop = on_stop
+        self.keepalive_keys = keepalive_keys
+        self.account_id = account_id
+        self.stopped = False
+
+
+class RunControlDispatcher:
+    def __init__(self):
+        self._runs: Dict[str, _WatchedRun] = {}
+        self._reader_task: Optional[asyncio.Task] = None
+        self._keepalive_task: Optional[asyncio.Task] = None
+        self._last_id: Optional[str] = None
+        self.stops_delivered = 0
+
+    async def register(
+        self,
+        agent_run_id: str,
+        on_stop: Callable[[str], None],
+        keepalive_keys: Optional[List[str]] = None,
+        account_id: Optional[str] = None,
+    ) -> None:
+        """Route stop signals for `agent_run_id` to `on_stop(reason)` until unregistered.
+
+        With `account_id`, the run's concurrent run slot lease is renewed too.
+        """
+        self._runs[agent_run_id] = _WatchedRun(agent_run_id, on_stop, list(keepalive_keys or []), account_id)
+        self._ensure_tasks()
+        # Covers a stop issued before this run registered
+        try:
+            if await redis.check_stop_signal(agent_run_id):
+                self._deliver(agent_run_id, 'register')
+        except Exception as e:
+            logger.warning(f"Initial stop signal check failed for {agent_run_id}: {e}")
+
+    def unregister(self, agent_run_id: str) -> None:
+        self._runs.pop(agent_run_id, None)
+
+    def _ensure_tasks(self) -> None:
+        if self._reader_task is None or self._reader_task.done():
+            self._reader_task = asyncio.create_task(self._run_reader())
+        if self._keepalive_task is None or self._keepalive_task.done():
+            self._keepalive_task = asyncio.create_task(self._run_keepalive())
+
+    def _deliver(self, agent_run_id: str, source: str) -> None:
+        run = self._runs.get(agent_run_id)
+        if run is None or run.stopped:
+            return
+        run.stopped = True
+        self.stops_delivered += 1
+        logger.warning(f"🛑 Received STOP signal for agent run {agent_run_id} (via {source})")
+        try:
+            # Same reason for every delivery path; it ends up in the run's error message
+            run.on_stop('stop_signal_key')
+        except Exception as e:
+            logger.error(f"Stop callback failed for {agent_run_id}: {e}", exc_info=True)
+
+    async def _sweep_stop_keys(self) -> None:
+        """Check the stop key of every watched run in one round-trip."""
+        run_ids = list(self._runs)
+        if not run_ids:
+            return
+        values = await redis.mget([f"agent_run:{run_id}:stop" for run_id in run_ids])
+        for run_id, value in zip(run_ids, values):
+            if value == "1":
+                self._deliver(run_id, 'sweep')
+
+    async def _run_reader(self) -> None:
+        needs_sweep = False
+        try:
+            if self._last_id is None:
+                self._last_id = await redis.stream_last_id(redis.RUN_CONTROL_STREAM) or "0-0"
+            while self._runs:
+                try:
+                    if needs_sweep:
+                        await self._sweep_stop_keys()
+                        needs_sweep = False
+                    entries = await redis.stream_read(
+                        redis.RUN_CONTROL_STREAM, self._last_id, block_ms=RUN_CONTROL_BLOCK_MS, count=100
+                    )
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Run control reader error: {e}")
+                    needs_sweep = True
+                    await asyncio.sleep(RUN_CONTROL_ERROR_BACKOFF)
+                    continue
+
+                for entry_id, fields in entries:
+                    self._last_id = entry_id
+                    if fields.get('action') == 'stop':
+                        self._deliver(fields.get('agent_run_id', ''), 'control_stream')
+        except asyncio.CancelledError:
+            pass
+
+    async def _run_keepalive(self) -> None:
+        try:
+            while self._runs:
+                await asyncio.sleep(RUN_CONTROL_KEEPALIVE_INTERVAL)
+                runs = list(self._runs.values())
+                keys = [key for run in runs for key in run.keepalive_keys]
+                leases = [(run.account_id, run.agent_run_id) for run in runs if run.account_id]
+                if not keys and not leases:
+                    continue
+                try:
+                    await asyncio.wait_for(self._refresh(keys, leases), timeout=5.0)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Failed to refresh {len(keys)} active run keys: {e}")
+        except asyncio.CancelledError:
+            pass
+
+    async def _refresh(self, keys: List[str], leases: List[Tuple[str, str]]) -> None:
+        async with redis.batch() as batch:
+            for key in keys:
+                batch.expire(key, redis.REDIS_KEY_TTL)
+            for account_id, agent_run_id in leases:
+                run_admission.queue_renewal(batch, account_id, agent_run_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {"watched_runs": len(self._runs), "stops_delivered": self.stops_delivered}
+
+    async def close(self) -> None:
+        tasks = [t for t in (self._reader_task, self._keepalive_task) if t and not t.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._runs.clear()
+
+
+# Global singleton instance
+run_control = RunControlDispatcher()
@@ -0,0 +1,186 @@
+"""Snapshot compaction for agent run streams.
+
+Assistant text is streamed as one entry per token chunk, so a client joining
+a long run used to replay hundreds of tiny frames, and the fixed stream cap
+silently dropped the start of the run. The worker now feeds every response it
+streams through a StreamCompactor and, once enough has accumulated, writes a
+single `snapshot` entry holding the run so far as a compact frame list:
+
+- completed frames (status, tool results, llm_response_start/end, finished
+  assistant messages) in order;
+- text chunks of an assistant message merged into one chunk frame, dropped
+  once the finished message arrives;
+- only the latest cumulative tool_call_chunk of the open message.
+
+The snapshot records the last entry ID it covers (`covers`). Adding it trims
+the stream only up to the previous snapshot, in one atomic script, so one
+generation of entries stays readable for live readers that are between
+reads. A catch-up read starts at the latest snapshot
+(`stream_envelope.from_latest_snapshot`). Live readers skip snapshot entries
+(they have seen the frames already) unless their position is older than
+`covers`, i.e. entries they had not read were trimmed; they replay the
+snapshot instead.
+
+Tool output previews written directly by tools are not seen by the worker;
+previews older than the latest snapshot are dropped, their final results are
+kept.
+"""
+
+import os
+from typing import Any, Dict, List, Optional
+
+import orjson
+
+from core.services import redis, stream_envelope
+from core.utils.json_helpers import to_json_string_fast
+from core.utils.logger import logger
+
+STREAM_SNAPSHOT_MIN_TAIL = int(os.getenv("STREAM_SNAPSHOT_MIN_TAIL", "100"))
+STREAM_SNAPSHOT_MAX_TAIL = int(os.getenv("STREAM_SNAPSHOT_MAX_TAIL", "500"))
+
+_ADD_SNAPSHOT_LUA = """
+local last = redis.call('XREVRANGE', KEYS[1], '+', '-', 'COUNT', 1)
+local covers = '0-0'
+if #last > 0 then
+    covers = last[1][1]
+end
+local id = redis.call('XADD', KEYS[1], '*', 'type', ARGV[1], 'covers', covers, 'data', ARGV[2])
+if ARGV[3] ~= '' then
+    redis.call('XTRIM', KEYS[1], 'MINID', ARGV[3])
+end
+return id
+"""
+
+
+def _stream_status(metadata: Any) -> Optional[str]:
+    if isinstance(metadata, dict):
+        return metadata.get('stream_status')
+    if not metadata:
+        return None
+    try:
+        parsed = orjson.loads(metadata)
+    except orjson.JSONDecodeError:
+        return None
+    return parsed.get('stream_status') if isinstance(parsed, dict) else None
+
+
+class StreamCompactor:
+    def __init__(self, stream_key: str):
+        self.stream_key = stream_key
+        self._frames: List[bytes] = []
+        # Open assistant message: raw chunk contents (parsed lazily at snapshot time)
+        self._chunk_contents: List[str] = []
+        self._last_chunk: Optional[Dict[str, Any]] = None
+        self._tool_call_chunk: Optional[bytes] = None
+        # Chunk metadata is one pre-built string per LLM response; parse it once
+        self._metadata_str: Optional[str] = None
+        self._metadata_status: Optional[str] = None
+        self._tail_entries = 0
+        self._tail_bytes = 0
+        self._snapshot_bytes = 0
+        self._script = None
+        self._script_client = None
+        self._last_snapshot_id: Optional[str] = None
+        self.snapshots_written = 0
+
+    def _status_of(self, response: Dict[str, Any]) -> Optional[str]:
+        metadata = response.get('metadata')
+        if isinstance(metadata, str):
+            if metadata != self._metadata_str:
+                self._metadata_str = metadata
+                self._metadata_status = _stream_status(metadata)
+            return self._metadata_status
+        return _stream_status(metadata)
+
+    def _close_open_message(self, superseded: bool) -> None:
+        if not superseded:
+            merged = self._merged_chunk()
+            if merged is not None:
+                self._frames.append(merged)
+            if self._tool_call_chunk is not None:
+                self._frames.append(self._tool_call_chunk)
+        self._chunk_contents = []
+        self._last_chunk = None
+        self._tool_call_chunk = None
+
+    def _merged_chunk(self) -> Optional[bytes]:
+        if self._last_chunk is None:
+            return None
+        text = []
+        for content in self._chunk_contents:
+            try:
+                text.append(orjson.loads(content).get('content') or '')
+            except (orjson.JSONDecodeError, AttributeError):
+                continue
+        merged = dict(self._last_chunk)
+        merged['content'] = to_json_string_fast({"role": "assistant", "content": ''.join(text)})
+        return orjson.dumps(merged, option=orjson.OPT_NON_STR_KEYS)
+
+    def observe(self, response: Dict[str, Any], data: bytes) -> None:
+        """Account for a response just written to the stream as `data`."""
+        self._tail_entries += 1
+        self._tail_bytes += len(data)
+
+        msg_type = response.get('type')
+        if msg_type == 'assistant':
+            status = self._status_of(response)
+            if status == 'chunk':
+                self._chunk_contents.append(response.get('content') or '')
+                self._last_chunk = response
+                return
+            if status == 'tool_call_chunk':
+                self._tool_call_chunk = data
+                return
+            if status == 'complete':
+                self._close_open_message(superseded=True)
+        elif msg_type in ('llm_response_start', 'llm_response_end'):
+            # A response that ended without a finished message keeps its partial text
+            self._close_open_message(superseded=False)
+        self._frames.append(data)
+
+    def should_snapshot(self) -> bool:
+        if self._tail_entries >= STREAM_SNAPSHOT_MAX_TAIL:
+            return True
+        # Keep snapshot rewrites proportional to what they replace
+        return self._tail_entries >= STREAM_SNAPSHOT_MIN_TAIL and self._tail_bytes * 2 >= self._snapshot_bytes
+
+    def build(self) -> bytes:
+        """Newline-separated frames; JSON never contains a raw newline."""
+        frames = list(self._frames)
+        merged = self._merged_chunk()
+        if merged is not None:
+            frames.append(merged)
+        if self._tool_call_chunk is not None:
+            frames.append(self._tool_call_chunk)
+        return b"\n".join(frames)
+
+    async def _get_script(self):
+        client = await redis.get_client()
+        if self._script is None or self._script_client is not client:
+            self._script = client.register_script(_ADD_SNAPSHOT_LUA)
+            self._script_client = client
+        return self._script
+
+    async def write_snapshot(self) -> Optional[str]:
+        """Add a snapshot entry and trim everything before the previous one.
+
+        Call after all observed entries have been flushed to the stream.
+        """
+        snapshot = self.build()
+        try:
+            script = await self._get_script()
+            entry_id = await script(keys=[self.stream_key], args=[stream_envelope.SNAPSHOT_TYPE, snapshot, self._last_snapshot_id or ''])
+        except Exception as e:
+            logger.warning(f"Failed to write stream snapshot for {self.stream_key}: {e}")
+            # Retry after another full tail rather than on every entry
+            self._tail_entries = 0
+            return None
+        if isinstance(entry_id, bytes):
+            entry_id = entry_id.decode()
+        self._last_snapshot_id = entry_id
+        self._snapshot_bytes = len(snapshot)
+        self._tail_entries = 0
+        self._tail_bytes = 0
+        self.snapshots_written += 1
+        logger.debug(f"Wrote stream snapshot {entry_id} for {self.stream_key} ({len(snapshot)} bytes)")
+        return entry_id
@@ -0,0 +1,108 @@
+"""Entry format for agent run Redis streams (`agent_run:{id}:stream`).
+
+Each entry carries the response payload once-encoded with orjson in `data`,
+plus its `type` (and `status`, for status messages) as separate stream
+fields. Consumers can detect the end of a run or classify entries without
+parsing the payload, and the SSE layer forwards `data` verbatim.
+
+Entries written before this format existed have only `data`; the helpers
+below fall back to parsing it for those.
+
+`snapshot` entries (see stream_compaction) hold newline-separated frames
+that stand in for every entry up to their `covers` ID. The stream keeps one
+generation of entries before the latest snapshot, so full reads should start
+at the latest snapshot (`from_latest_snapshot`).
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+
+TERMINAL_STATUSES = ('completed', 'failed', 'stopped', 'error')
+SNAPSHOT_TYPE = 'snapshot'
+# Safety cap only; streams are normally kept short by snapshot trimming
+AGENT_RUN_STREAM_MAXLEN = 2000
+
+
+def encode(response: Dict[str, Any]) -> Dict[str, Any]:
+    """Stream fields for a response dict."""
+    fields: Dict[str, Any] = {'data': orjson.dumps(response, option=orjson.OPT_NON_STR_KEYS)}
+    msg_type = response.get('type')
+    if msg_type:
+        fields['type'] = msg_type
+        if msg_type == 'status' and response.get('status'):
+            fields['status'] = response['status']
+    return fields
+
+
+def decode(fields: Dict[str, str]) -> Dict[str, Any]:
+    """Response dict for stream fields."""
+    return orjson.loads(fields.get('data') or '{}')
+
+
+def entry_type(fields: Dict[str, str]) -> Optional[str]:
+    msg_type = fields.get('type')
+    if msg_type is not None:
+        return msg_type
+    try:
+        return decode(fields).get('type')
+    except (orjson.JSONDecodeError, AttributeError):
+        return None
+
+
+def entry_status(fields: Dict[str, str]) -> Optional[str]:
+    if 'type' in fields:
+        return fields.get('status')
+    data = fields.get('data', '')
+    # Cheap pre-check before paying for a parse on every legacy entry
+    if '"status"' not in data:
+        return None
+    try:
+        return decode(fields).get('status')
+    except (orjson.JSONDecodeError, AttributeError):
+        return None
+
+
+def is_terminal(fields: Dict[str, str]) -> bool:
+    """True for the final status entry of a run."""
+    return entry_type(fields) == 'status' and entry_status(fields) in TERMINAL_STATUSES
+
+
+def sse_frame(fields: Dict[str, str]) -> str:
+    """SSE `data:` frame for an entry, forwarding the stored payload as-is."""
+    return f"data: {fields.get('data') or '{}'}\n\n"
+
+
+def is_snapshot(fields: Dict[str, str]) -> bool:
+    return fields.get('type') == SNAPSHOT_TYPE
+
+
+def snapshot_covers(fields: Dict[str, str]) -> Optional[str]:
+    """ID of the last entry a snapshot stands in for."""
+    return fields.get('covers')
+
+
+def from_latest_snapshot(entries: List[Tuple[str, Dict[str, str]]]) -> List[Tuple[str, Dict[str, str]]]:
+    """The entries from the latest snapshot on (all of them if there is none)."""
+    for i in range(len(entries) - 1, -1, -1):
+        if is_snapshot(entries[i][1]):
+            return entries[i:]
+    return entries
+
+
+def sse_frames(fields: Dict[str, str]) -> List[str]:
+    """SSE frames for an entry, expanding snapshots without parsing them."""
+    if not is_snapshot(fields):
+        return [sse_frame(fields)]
+    return [f"data: {frame}\n\n" for frame in (fields.get('data') or '').split('\n') if frame]
+
+
+def expand(entries: List[Tuple[str, Dict[str, str]]]) -> List[Dict[str, Any]]:
+    """Response dicts for a list of stream entries, expanding snapshots."""
+    responses = []
+    for _, fields in from_latest_snapshot(entries):
+        if is_snapshot(fields):
+            responses.extend(orjson.loads(frame) for frame in (fields.get('data') or '').split('\n') if frame)
+        else:
+            responses.append(decode(fields))
+    return responses
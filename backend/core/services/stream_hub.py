@@ -0,0 +1,230 @@
+"""In-process fan-out hub for agent run Redis streams.
+
+Every SSE viewer of an agent run used to run its own blocking XREAD loop on
+`agent_run:{id}:stream`, so N open tabs meant N Redis connections polling the
+same key. The hub keeps exactly one reader task per active stream key in this
+API worker and fans entries out to all local subscribers through bounded
+asyncio queues.
+
+Usage:
+    async with stream_hub.subscribe(stream_key) as sub:
+        # catch-up via XRANGE, then
+        sub.advance(last_catchup_id)
+        while True:
+            entries = await sub.next_batch(timeout=5.0)
+
+Subscribing happens *before* the catch-up read, so nothing written between the
+catch-up XRANGE and the live feed is lost; entries already seen during
+catch-up are dropped via `advance()`.
+
+A subscriber whose queue fills up (slow consumer) is evicted from the shared
+reader and transparently falls back to its own XREAD loop from the last entry
+it received, so a slow tab never blocks the others and never loses data.
+"""
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Set, Tuple
+
+from core.services import redis, stream_envelope
+from core.utils.logger import logger
+
+# Tuning
+STREAM_HUB_QUEUE_SIZE = int(os.getenv("STREAM_HUB_QUEUE_SIZE", "2000"))
+STREAM_HUB_BLOCK_MS = int(os.getenv("STREAM_HUB_BLOCK_MS", "5000"))
+STREAM_HUB_READ_COUNT = 500
+STREAM_HUB_ERROR_BACKOFF = 1.0
+
+StreamEntry = Tuple[str, Dict[str, str]]
+
+
+def parse_stream_id(entry_id: str) -> Tuple[int, int]:
+    """Parse a Redis stream ID ("ms-seq") into a comparable tuple."""
+    ms, _, seq = entry_id.partition('-')
+    try:
+        return int(ms), int(seq or 0)
+    except ValueError:
+        return 0, 0
+
+
+class StreamSubscription:
+    """A single local consumer of a shared stream reader."""
+
+    def __init__(self, hub: "StreamHub", stream_key: str):
+        self._hub = hub
+        self.stream_key = stream_key
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_HUB_QUEUE_SIZE)
+        self.last_id: str = "0"
+        self.evicted = False
+
+    def advance(self, last_id: str) -> None:
+        """Mark everything up to and including `last_id` as already delivered."""
+        if parse_stream_id(last_id) > parse_stream_id(self.last_id):
+            self.last_id = last_id
+
+    def _filter(self, entries: List[StreamEntry]) -> List[StreamEntry]:
+        last = parse_stream_id(self.last_id)
+        fresh = []
+        for entry_id, fields in entries:
+            parsed = parse_stream_id(entry_id)
+            if parsed > last:
+                fresh.append((entry_id, fields))
+                last = parsed
+        if fresh:
+            self.last_id = fresh[-1][0]
+        return fresh
+
+    def _drain(self) -> List[StreamEntry]:
+        entries: List[StreamEntry] = []
+        while True:
+            try:
+                entries.extend(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                return entries
+
+    async def next_batch(self, timeout: float) -> List[StreamEntry]:
+        """Wait up to `timeout` seconds for new entries.
+
+        Returns an empty list on timeout so the caller can emit a keep-alive.
+        """
+        if self.evicted:
+            # Flush whatever was queued before eviction, then read directly.
+            queued = self._filter(self._drain())
+            if queued:
+                return queued
+            entries = await redis.stream_read(
+                self.stream_key, self.last_id, block_ms=int(timeout * 1000), count=STREAM_HUB_READ_COUNT
+            )
+            return self._filter(entries)
+
+        try:
+            batch = await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return []
+        batch.extend(self._drain())
+        return self._filter(batch)
+
+
+class _StreamReader:
+    """The single XREAD loop for one stream key in this process."""
+
+    def __init__(self, stream_key: str, start_id: str):
+        self.stream_key = stream_key
+        self.last_id = start_id
+        self.subscribers: Set[StreamSubscription] = set()
+        self.task: Optional[asyncio.Task] = None
+
+
+class StreamHub:
+    """Per-process registry of shared stream readers."""
+
+    def __init__(self):
+        self._readers: Dict[str, _StreamReader] = {}
+        self._lock: Optional[asyncio.Lock] = None
+        self.evictions = 0
+
+    def _get_lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    @asynccontextmanager
+    async def subscribe(self, stream_key: str):
+        sub = StreamSubscription(self, stream_key)
+        await self._attach(sub)
+        try:
+            yield sub
+        finally:
+            self._detach(sub)
+
+    async def _attach(self, sub: StreamSubscription) -> None:
+        async with self._get_lock():
+            reader = self._readers.get(sub.stream_key)
+            if reader is None or reader.task is None or reader.task.done():
+                # Start from the current tail; the subscriber's own catch-up
+                # XRANGE (issued after this) covers everything before it.
+                start_id = await redis.stream_last_id(sub.stream_key) or "0-0"
+                reader = _StreamReader(sub.stream_key, start_id)
+                self._readers[sub.stream_key] = reader
+                reader.subscribers.add(sub)
+                reader.task = asyncio.create_task(self._run_reader(reader))
+                logger.debug(f"Started shared stream reader for {sub.stream_key}")
+            else:
+                reader.subscribers.add(sub)
+
+    def _detach(self, sub: StreamSubscription) -> None:
+        reader = self._readers.get(sub.stream_key)
+        if reader is None:
+            return
+        reader.subscribers.discard(sub)
+        if not reader.subscribers and reader.task and not reader.task.done():
+            reader.task.cancel()
+
+    def _evict(self, reader: _StreamReader, sub: StreamSubscription) -> None:
+        sub.evicted = True
+        reader.subscribers.discard(sub)
+        self.evictions += 1
+        logger.warning(f"Evicted slow stream consumer on {reader.stream_key} (queue size {sub.queue.qsize()})")
+
+    def _fan_out(self, reader: _StreamReader, entries: List[StreamEntry]) -> None:
+        for sub in list(reader.subscribers):
+            try:
+                sub.queue.put_nowait(list(entries))
+            except asyncio.QueueFull:
+                self._evict(reader, sub)
+
+    async def _run_reader(self, reader: _StreamReader) -> None:
+        try:
+            while reader.subscribers:
+                try:
+                    entries = await redis.stream_read(
+                        reader.stream_key, reader.last_id,
+                        block_ms=STREAM_HUB_BLOCK_MS, count=STREAM_HUB_READ_COUNT
+                    )
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Shared stream reader error on {reader.stream_key}: {e}")
+                    await asyncio.sleep(STREAM_HUB_ERROR_BACKOFF)
+                    continue
+
+                if not entries:
+                    continue
+
+                reader.last_id = entries[-1][0]
+                self._fan_out(reader, entries)
+
+                if any(stream_envelope.is_terminal(fields) for _, fields in entries):
+                    logger.debug(f"Shared stream reader for {reader.stream_key} saw terminal status")
+                    break
+        except asyncio.CancelledError:
+            pass
+        finally:
+            if self._readers.get(reader.stream_key) is reader:
+                del self._readers[reader.stream_key]
+            # Any subscriber still attached reads directly from its last ID.
+            for sub in list(reader.subscribers):
+                sub.evicted = True
+            reader.subscribers.clear()
+            logger.debug(f"Stopped shared stream reader for {reader.stream_key}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "readers": len(self._readers),
+            "subscribers": sum(len(r.subscribers) for r in self._readers.values()),
+            "evictions": self.evictions,
+        }
+
+    async def close(self) -> None:
+        """Cancel all readers (on shutdown)."""
+        tasks = [r.task for r in self._readers.values() if r.task and not r.task.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._readers.clear()
+
+
+# Global singleton instance
+stream_hub = StreamHub()
@@ -31,6 +31,7 @@ async def initialize_thread_background(
     prompt: str,
     agent_id: Optional[str] = None,
     model_name: Optional[str] = None,
+    agent_run_id: Optional[str] = None,
 ):
     structlog.contextvars.clear_contextvars()
     structlog.contextvars.bind_contextvars(
@@ -76,8 +77,11 @@ async def initialize_thread_background(
     async def create_agent_run_record(agent_config, effective_model):
         from core.agent_runs import _create_agent_run_record
         client = await db.client
-        return await _create_agent_run_record(client, thread_id, agent_config, effective_model, account_id)
+        return await _create_agent_run_record(client, thread_id, agent_config, effective_model, account_id, agent_run_id=reserved_run_id)
     
+    # Id of the run slot reserved by /agent/start, if any
+    reserved_run_id = agent_run_id
+
     async def update_thread_ready():
         client = await db.client
         return await client.table('threads').update({
@@ -160,6 +164,10 @@ async def initialize_thread_background(
         
     except Exception as e:
         logger.error(f"Thread initialization failed for {thread_id}: {str(e)}\n{traceback.format_exc()}")
+
+        if reserved_run_id:
+            from core.services.run_admission import run_admission
+            await run_admission.release(account_id, reserved_run_id)
         
         # Try to update thread status to error with retry
         # Get fresh client inside function to avoid stale reference after connection reset
@@ -192,6 +200,7 @@ async def create_thread_optimistically(
     files: Optional[List[UploadFile]] = None,
     staged_files: Optional[List[Dict[str, Any]]] = None,
     memory_enabled: Optional[bool] = None,
+    agent_run_id: Optional[str] = None,
 ) -> Dict[str, Any]:
     if not db._client:
         await db.initialize()
@@ -361,6 +370,7 @@ async def create_thread_optimistically(
         prompt=prompt,
         agent_id=agent_id,
         model_name=model_name,
+        agent_run_id=agent_run_id,
     )
     
     logger.info(f"Dispatched background initialization for thread {thread_id}")
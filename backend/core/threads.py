@@ -5,7 +5,7 @@ import uuid
 from datetime import datetime, timezone
 from typing import Optional
 from fastapi import APIRouter, HTTPException, Depends, Form, Query, Body, Request
-from core.utils.auth_utils import verify_and_get_user_id_from_jwt, verify_and_authorize_thread_access, require_thread_access, AuthorizedThreadAccess, get_optional_user_id
+from core.utils.auth_utils import verify_and_get_user_id_from_jwt, verify_and_authorize_thread_access, require_thread_access, AuthorizedThreadAccess, get_optional_user_id, invalidate_thread_access_cache
 from core.utils.logger import logger
 from core.sandbox.sandbox import create_sandbox, delete_sandbox
 from core.utils.config import config, EnvMode
@@ -444,6 +444,8 @@ async def delete_project(
         if not project_delete_result.data:
             raise HTTPException(status_code=500, detail="Failed to delete project")
         
+        await invalidate_thread_access_cache(project_id=project_id)
+        
         # Invalidate caches
         try:
             from core.runtime_cache import invalidate_thread_count_cache, invalidate_project_cache
@@ -977,6 +979,8 @@ async def update_thread(
                 await client.table('projects').update({
                     'is_public': is_public
                 }).eq('project_id', project_id).execute()
+            
+            await invalidate_thread_access_cache(thread_id=thread_id, project_id=project_id)
         
         if thread_update_data:
             thread_update = await client.table('threads').update(thread_update_data).eq('thread_id', thread_id).execute()
@@ -1072,6 +1076,8 @@ async def delete_thread(
         if not thread_delete_result.data:
             raise HTTPException(status_code=500, detail="Failed to delete thread")
         
+        await invalidate_thread_access_cache(thread_id=thread_id)
+        
         # Invalidate thread count cache for this user
         try:
             from core.runtime_cache import invalidate_thread_count_cache
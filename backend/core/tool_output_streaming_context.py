@@ -1,11 +1,19 @@
-import json
 import asyncio
+import os
 from contextvars import ContextVar
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from dataclasses import dataclass
 
 from core.utils.logger import logger
 
+# Live tool output is batched per tool call: one stream entry per flush window
+# (or per TOOL_OUTPUT_MAX_BATCH_CHARS), at most TOOL_OUTPUT_MAX_STREAMED_CHARS
+# per call, after which only the last TOOL_OUTPUT_TAIL_CHARS are sent at the end
+TOOL_OUTPUT_FLUSH_MS = float(os.getenv("TOOL_OUTPUT_FLUSH_MS", "75"))
+TOOL_OUTPUT_MAX_BATCH_CHARS = int(os.getenv("TOOL_OUTPUT_MAX_BATCH_CHARS", "16384"))
+TOOL_OUTPUT_MAX_STREAMED_CHARS = int(os.getenv("TOOL_OUTPUT_MAX_STREAMED_CHARS", "262144"))
+TOOL_OUTPUT_TAIL_CHARS = int(os.getenv("TOOL_OUTPUT_TAIL_CHARS", "16384"))
+
 
 @dataclass
 class ToolOutputStreamingContext:
@@ -52,39 +60,98 @@ def get_current_tool_call_id() -> Optional[str]:
     return ctx.tool_call_id if ctx else None
 
 
-async def stream_tool_output(
-    tool_call_id: str,
-    output_chunk: str,
-    is_final: bool = False,
-    tool_name: str = "execute_command"
-) -> None:
-    ctx = get_tool_output_streaming_context()
-    if not ctx:
-        logger.debug(f"[STREAM] No tool output streaming context available, skipping output stream")
-        return
-    
-    try:
+class ToolOutputStream:
+    """Coalesces one tool call's output chunks into few stream entries.
+
+    `write()` only buffers; buffered text is sent every TOOL_OUTPUT_FLUSH_MS
+    (or once TOOL_OUTPUT_MAX_BATCH_CHARS are buffered) through a pipelined
+    Redis writer. Past TOOL_OUTPUT_MAX_STREAMED_CHARS nothing more is sent
+    live; `close()` sends the omitted-size note and the output's tail, then
+    the final entry.
+    """
+
+    def __init__(self, ctx: ToolOutputStreamingContext, tool_call_id: str, tool_name: str):
         from core.services import redis
-        
+
+        self.ctx = ctx
+        self.tool_call_id = tool_call_id
+        self.tool_name = tool_name
+        self._writer = redis.writer(span_name="tool_output_stream")
+        self._buffer: List[str] = []
+        self._buffered = 0
+        self._streamed = 0
+        self._omitted = 0
+        self._tail = ""
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._closed = False
+
+    def write(self, chunk: str) -> None:
+        if self._closed or not chunk:
+            return
+        if self._streamed + self._buffered >= TOOL_OUTPUT_MAX_STREAMED_CHARS:
+            # Over the cap: keep only a rolling tail for the end
+            self._omitted += len(chunk)
+            self._tail = (self._tail + chunk)[-TOOL_OUTPUT_TAIL_CHARS:]
+            return
+        self._buffer.append(chunk)
+        self._buffered += len(chunk)
+        if self._buffered >= TOOL_OUTPUT_MAX_BATCH_CHARS:
+            self._flush_buffer()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(TOOL_OUTPUT_FLUSH_MS / 1000, self._flush_buffer)
+
+    def _send(self, output: str, is_final: bool = False) -> None:
+        from core.services import stream_envelope
+
         message = {
             "type": "tool_output_stream",
-            "tool_call_id": tool_call_id,
-            "tool_name": tool_name,
-            "output": output_chunk,
+            "tool_call_id": self.tool_call_id,
+            "tool_name": self.tool_name,
+            "output": output,
             "is_final": is_final,
-            "agent_run_id": ctx.agent_run_id
+            "agent_run_id": self.ctx.agent_run_id
         }
-        
-        message_json = json.dumps(message)
-        
-        logger.debug(f"[TOOL OUTPUT] Writing to stream {ctx.stream_key}: tool_call_id={tool_call_id}, chunk_len={len(output_chunk)}, is_final={is_final}")
-        
-        await redis.stream_add(
-            ctx.stream_key,
-            {"data": message_json},
-            maxlen=200,
+        self._writer.write(
+            "xadd",
+            self.ctx.stream_key,
+            stream_envelope.encode(message),
+            maxlen=stream_envelope.AGENT_RUN_STREAM_MAXLEN,
             approximate=True
         )
-        
-    except Exception as e:
-        logger.warning(f"Failed to stream tool output: {e}")
+
+    def _flush_buffer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._buffer:
+            return
+        output = "".join(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+        self._streamed += len(output)
+        self._send(output)
+
+    async def close(self, is_final: bool = True) -> None:
+        """Send what's left (and the final marker) and wait for the writes."""
+        if self._closed:
+            return
+        self._closed = True
+        self._flush_buffer()
+        if self._omitted:
+            omitted = self._omitted - len(self._tail)
+            note = f"\n[... {omitted} characters of output not streamed ...]\n" if omitted > 0 else ""
+            self._send(note + self._tail)
+        if is_final:
+            self._send("", is_final=True)
+        try:
+            await self._writer.close()
+        except Exception as e:
+            logger.warning(f"Failed to stream tool output: {e}")
+
+
+def open_tool_output_stream(tool_call_id: str, tool_name: str = "execute_command") -> Optional[ToolOutputStream]:
+    """Coalescing output stream for a tool call; None without a streaming context."""
+    ctx = get_tool_output_streaming_context()
+    if not ctx:
+        return None
+    return ToolOutputStream(ctx, tool_call_id, tool_name)
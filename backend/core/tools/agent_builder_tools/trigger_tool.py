@@ -13,6 +13,7 @@ import os
 import httpx
 from core.composio_integration.composio_profile_service import ComposioProfileService
 from core.composio_integration.composio_trigger_service import ComposioTriggerService
+from core.services.http_client import http_clients
 
 @tool_metadata(
     display_name="Triggers & Automation",
@@ -497,7 +498,7 @@ class TriggerTool(AgentBuilderBaseTool):
             coerced_config = dict(trigger_config or {})
             try:
                 type_url = f"{api_base}/api/v3/triggers_types/{slug}"
-                async with httpx.AsyncClient(timeout=10) as http_client:
+                async with http_clients.borrow(type_url, timeout=10) as http_client:
                     tr = await http_client.get(type_url, headers=headers)
                     if tr.status_code == 200:
                         tdata = tr.json()
@@ -543,7 +544,7 @@ class TriggerTool(AgentBuilderBaseTool):
 
             # Upsert trigger instance
             upsert_url = f"{api_base}/api/v3/trigger_instances/{slug}/upsert"
-            async with httpx.AsyncClient(timeout=20) as http_client:
+            async with http_clients.borrow(upsert_url, timeout=20) as http_client:
                 resp = await http_client.post(upsert_url, headers=headers, json=body)
                 try:
                     resp.raise_for_status()
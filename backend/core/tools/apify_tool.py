@@ -192,6 +192,9 @@ from core.sandbox.tool_base import SandboxToolsBase
 """
 )
 class ApifyTool(SandboxToolsBase):
+    concurrency_class = "external"
+    upstream = "apify"
+
     def __init__(self, project_id: str, thread_manager: Optional[ThreadManager] = None):
         super().__init__(project_id, thread_manager)
         self.credit_manager = CreditManager()
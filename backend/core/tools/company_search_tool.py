@@ -57,6 +57,9 @@ from core.services.supabase import DBConnection
 """
 )
 class CompanySearchTool(Tool):
+    concurrency_class = "external"
+    upstream = "exa"
+
     def __init__(self, thread_manager: ThreadManager):
         super().__init__()
         self.thread_manager = thread_manager
@@ -1,5 +1,6 @@
 from core.agentpress.tool import Tool, ToolResult, openapi_schema, tool_metadata
 from core.agentpress.thread_manager import ThreadManager
+from core.agentpress.tool_result_blobs import hydrate_rows
 from typing import List
 import json
 
@@ -77,6 +78,7 @@ class ExpandMessageTool(Tool):
                 return self.fail_response(f"Message with ID {message_id} not found in thread {self.thread_id}")
 
             message_data = message.data[0]
+            await hydrate_rows([message_data])
             message_content = message_data['content']
             final_content = message_content
             if isinstance(message_content, dict) and 'content' in message_content:
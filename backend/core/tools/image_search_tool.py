@@ -6,6 +6,7 @@ from core.sandbox.tool_base import SandboxToolsBase
 from core.agentpress.thread_manager import ThreadManager
 import json
 import logging
+from core.services.http_client import http_clients
 from typing import Union, List
 
 @tool_metadata(
@@ -46,6 +47,9 @@ from typing import Union, List
 class SandboxImageSearchTool(SandboxToolsBase):
     """Tool for performing image searches using SERPER API."""
 
+    concurrency_class = "external"
+    upstream = "serper"
+
     def __init__(self, project_id: str, thread_manager: ThreadManager):
         super().__init__(project_id, thread_manager)
         # Load environment variables
@@ -150,7 +154,7 @@ class SandboxImageSearchTool(SandboxToolsBase):
                 payload = {"q": queries[0], "num": num_results}
             
             # SERPER API request
-            async with httpx.AsyncClient() as client:
+            async with http_clients.borrow("https://google.serper.dev") as client:
                 headers = {
                     "X-API-KEY": self.serper_api_key,
                     "Content-Type": "application/json"
@@ -117,6 +117,9 @@ _redis_cache = MCPSchemaRedisCache(ttl_seconds=3600)
     visible=False
 )
 class MCPToolWrapper(Tool):
+    concurrency_class = "external"
+    upstream = "mcp"
+
     def __init__(self, mcp_configs: Optional[List[Dict[str, Any]]] = None, use_cache: bool = True):
         self.mcp_manager = mcp_service
         self.mcp_configs = mcp_configs or []
@@ -53,6 +53,9 @@ from core.utils.logger import logger
 """
 )
 class MessageTool(Tool):
+    # wait() sleeps up to 300s, the local class deadline
+    timeout_seconds = 330
+
     def __init__(self):
         super().__init__()
 
@@ -1,11 +1,12 @@
 from typing import Optional, Dict, Any
 import asyncio
 import json
-import aiohttp
+import httpx
 import time
 from core.agentpress.tool import Tool, ToolResult, openapi_schema, tool_metadata
 from core.utils.config import config
 from core.utils.logger import logger
+from core.services.http_client import http_clients
 from core.agentpress.thread_manager import ThreadManager
 
 @tool_metadata(
@@ -54,6 +55,9 @@ from core.agentpress.thread_manager import ThreadManager
 """
 )
 class PaperSearchTool(Tool):
+    concurrency_class = "external"
+    upstream = "semantic_scholar"
+
     def __init__(self, thread_manager: ThreadManager):
         super().__init__()
         self.thread_manager = thread_manager
@@ -85,38 +89,38 @@ class PaperSearchTool(Tool):
             
             for attempt in range(max_retries):
                 try:
-                    async with aiohttp.ClientSession() as session:
-                        async with session.get(url, params=params, headers=headers) as response:
-                            self.last_request_time = time.time()
+                    async with http_clients.borrow(self.base_url) as client:
+                        response = await client.get(url, params=params, headers=headers)
+                        self.last_request_time = time.time()
+                        
+                        if response.status_code == 429:
+                            retry_after = int(response.headers.get('Retry-After', 2 ** attempt))
+                            logger.warning(f"Rate limited, waiting {retry_after}s before retry {attempt + 1}/{max_retries}")
+                            await asyncio.sleep(retry_after)
+                            continue
+                        
+                        if response.status_code == 200:
+                            return response.json()
+                        else:
+                            error_text = response.text
+                            logger.error(f"API request failed with status {response.status_code}: {error_text}")
                             
-                            if response.status == 429:
-                                retry_after = int(response.headers.get('Retry-After', 2 ** attempt))
-                                logger.warning(f"Rate limited, waiting {retry_after}s before retry {attempt + 1}/{max_retries}")
-                                await asyncio.sleep(retry_after)
+                            if response.status_code >= 500 and attempt < max_retries - 1:
+                                wait_time = 2 ** attempt
+                                logger.info(f"Server error, retrying in {wait_time}s")
+                                await asyncio.sleep(wait_time)
                                 continue
                             
-                            if response.status == 200:
-                                return await response.json()
-                            else:
-                                error_text = await response.text()
-                                logger.error(f"API request failed with status {response.status}: {error_text}")
-                                
-                                if response.status >= 500 and attempt < max_retries - 1:
-                                    wait_time = 2 ** attempt
-                                    logger.info(f"Server error, retrying in {wait_time}s")
-                                    await asyncio.sleep(wait_time)
-                                    continue
-                                
-                                raise Exception(f"API request failed: {response.status} - {error_text}")
+                            raise Exception(f"API request failed: {response.status_code} - {error_text}")
                 
-                except asyncio.TimeoutError:
+                except httpx.TimeoutException:
                     if attempt < max_retries - 1:
                         wait_time = 2 ** attempt
                         logger.warning(f"Request timeout, retrying in {wait_time}s")
                         await asyncio.sleep(wait_time)
                         continue
                     raise
-                except aiohttp.ClientError as e:
+                except httpx.TransportError as e:
                     if attempt < max_retries - 1:
                         wait_time = 2 ** attempt
                         logger.warning(f"Request error: {e}, retrying in {wait_time}s")
@@ -58,6 +58,9 @@ from core.services.supabase import DBConnection
 """
 )
 class PeopleSearchTool(Tool):
+    concurrency_class = "external"
+    upstream = "exa"
+
     def __init__(self, thread_manager: ThreadManager):
         super().__init__()
         self.thread_manager = thread_manager
@@ -74,6 +74,10 @@ When a user asks you to check if an image, audio, or video is a deepfake, manipu
 class RealityDefenderTool(SandboxToolsBase):
     """Tool for detecting deepfakes and AI-generated content using Reality Defender."""
 
+    concurrency_class = "external"
+    upstream = "reality_defender"
+    path_access = {'detect_deepfake': ('read', ('file_path',))}
+
     def __init__(self, project_id: str, thread_manager: ThreadManager):
         super().__init__(project_id, thread_manager)
         self.api_key = config.REALITY_DEFENDER_API_KEY
@@ -2,11 +2,11 @@ from typing import Optional
 from core.agentpress.tool import ToolResult, openapi_schema, tool_metadata
 from core.sandbox.tool_base import SandboxToolsBase
 from core.agentpress.thread_manager import ThreadManager
-import httpx
 from io import BytesIO
 import uuid
 from litellm import aimage_generation, aimage_edit
 import base64
+from core.services.http_client import http_clients
 
 @tool_metadata(
     display_name="Design & Graphics",
@@ -335,7 +335,7 @@ class SandboxDesignerTool(SandboxToolsBase):
 
     async def _download_image_from_url(self, url: str) -> bytes | ToolResult:
         try:
-            async with httpx.AsyncClient() as client:
+            async with http_clients.borrow(url) as client:
                 response = await client.get(url)
                 response.raise_for_status()
                 return response.content
@@ -53,6 +53,11 @@ KB_VERSION = "0.1.2"
 """
 )
 class SandboxFileReaderTool(SandboxToolsBase):
+    path_access = {
+        'read_file': ('read', ('file_path', 'file_paths')),
+        'search_file': ('read', ('file_path', 'file_paths')),
+    }
+
     def __init__(self, project_id: str, thread_manager: ThreadManager):
         super().__init__(project_id, thread_manager)
         self._kb_ready = False
@@ -60,6 +60,14 @@ from typing import Optional
 class SandboxFilesTool(SandboxToolsBase):
     """Tool for executing file system operations in a Daytona sandbox. All operations are performed relative to the /workspace directory."""
 
+    path_access = {
+        'create_file': ('write', ('file_path',)),
+        'str_replace': ('write', ('file_path',)),
+        'full_file_rewrite': ('write', ('file_path',)),
+        'delete_file': ('write', ('file_path',)),
+        'edit_file': ('write', ('target_file',)),
+    }
+
     def __init__(self, project_id: str, thread_manager: ThreadManager):
         super().__init__(project_id, thread_manager)
         self.SNIPPET_LINES = 4  # Number of context lines to show around edits
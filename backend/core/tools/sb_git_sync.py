@@ -79,6 +79,9 @@ class SandboxGitTool(SandboxToolsBase):
     - Does NOT interact with any remote/origin.
     """
 
+    # Commits the whole working tree: wait for earlier file writes
+    path_access = {'git_commit': ('read', ())}
+
     def __init__(self, project_id: str, thread_manager: ThreadManager):
         super().__init__(project_id, thread_manager)
         from core.utils.db_helpers import get_initialized_db
@@ -2,7 +2,6 @@ from typing import Optional
 from core.agentpress.tool import ToolResult, openapi_schema, tool_metadata
 from core.sandbox.tool_base import SandboxToolsBase
 from core.agentpress.thread_manager import ThreadManager
-import httpx
 from io import BytesIO
 import uuid
 import replicate
@@ -20,6 +19,7 @@ from core.utils.config import get_config
 from core.billing.credits.media_integration import media_billing
 from core.billing.credits.media_calculator import select_image_quality, cap_quality_for_tier, FREE_TIERS
 from core.utils.image_processing import upscale_image_sync, remove_background_sync, UPSCALE_MODEL, REMOVE_BG_MODEL
+from core.services.http_client import http_clients
 
 
 def parse_image_paths(image_path: Optional[str | list[str]]) -> list[str]:
@@ -562,7 +562,7 @@ class SandboxImageEditTool(SandboxToolsBase):
             else:
                 # Fetch from URL if it's a URL string
                 url = str(first_output.url) if hasattr(first_output, 'url') else str(first_output)
-                async with httpx.AsyncClient() as client:
+                async with http_clients.borrow(url) as client:
                     response = await client.get(url)
                     response.raise_for_status()
                     result_bytes = response.content
@@ -682,14 +682,14 @@ class SandboxImageEditTool(SandboxToolsBase):
                 result_bytes = output.read()
             elif hasattr(output, 'url'):
                 url = str(output.url)
-                async with httpx.AsyncClient(timeout=120.0) as client:
+                async with http_clients.borrow(url, timeout=120.0) as client:
                     response = await client.get(url)
                     response.raise_for_status()
                     result_bytes = response.content
             else:
                 # Try to fetch from string URL
                 url = str(output)
-                async with httpx.AsyncClient(timeout=120.0) as client:
+                async with http_clients.borrow(url, timeout=120.0) as client:
                     response = await client.get(url)
                     response.raise_for_status()
                     result_bytes = response.content
@@ -872,7 +872,7 @@ class SandboxImageEditTool(SandboxToolsBase):
     async def _download_image_from_url(self, url: str) -> bytes | ToolResult:
         """Download image from URL."""
         try:
-            async with httpx.AsyncClient() as client:
+            async with http_clients.borrow(url) as client:
                 response = await client.get(url)
                 response.raise_for_status()
                 return response.content
@@ -932,7 +932,7 @@ class SandboxImageEditTool(SandboxToolsBase):
             placeholder_url = f"https://picsum.photos/1024/1024?random={random_id}"
             
             # Download the image
-            async with httpx.AsyncClient() as client:
+            async with http_clients.borrow(placeholder_url) as client:
                 response = await client.get(placeholder_url, follow_redirects=True)
                 response.raise_for_status()
                 image_data = response.content
@@ -9,6 +9,7 @@ from datetime import datetime
 import re
 import asyncio
 import httpx
+from core.services.http_client import http_clients, BorrowedClient
 from urllib.parse import unquote
 
 @tool_metadata(
@@ -1352,7 +1353,7 @@ class SandboxPresentationTool(SandboxToolsBase):
         presentation_path: str, 
         format_type: str,
         store_locally: bool,
-        client: httpx.AsyncClient
+        client: BorrowedClient
     ) -> Dict:
         """Internal helper to export to a specific format (pptx or pdf)"""
         try:
@@ -1457,7 +1458,7 @@ class SandboxPresentationTool(SandboxToolsBase):
             total_slides = len(metadata.get("slides", {}))
             
             # Run both exports in parallel
-            async with httpx.AsyncClient(timeout=120.0) as client:
+            async with http_clients.borrow(self.sandbox_url, timeout=120.0) as client:
                 pptx_task = self._export_to_format(
                     presentation_name, safe_name, presentation_path, "pptx", store_locally, client
                 )
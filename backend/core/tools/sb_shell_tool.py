@@ -5,7 +5,7 @@ from uuid import uuid4
 from core.agentpress.tool import ToolResult, openapi_schema, tool_metadata
 from core.sandbox.tool_base import SandboxToolsBase
 from core.agentpress.thread_manager import ThreadManager
-from core.tool_output_streaming_context import stream_tool_output, get_tool_output_streaming_context, get_current_tool_call_id
+from core.tool_output_streaming_context import open_tool_output_stream, get_current_tool_call_id
 from core.utils.logger import logger
 
 @tool_metadata(
@@ -61,6 +61,9 @@ class SandboxShellTool(SandboxToolsBase):
     """Tool for executing tasks in a Daytona sandbox with browser-use capabilities. 
     Uses sessions for maintaining state between commands and provides comprehensive process management."""
 
+    # Commands may read anything in the workspace: wait for earlier file writes
+    path_access = {'execute_command': ('read', ())}
+
     def __init__(self, project_id: str, thread_manager: ThreadManager):
         super().__init__(project_id, thread_manager)
         self._sessions: Dict[str, str] = {}  # Maps session names to session IDs
@@ -179,31 +182,25 @@ class SandboxShellTool(SandboxToolsBase):
             
             if blocking:
                 # Use PTY for blocking commands with real-time streaming
-                tool_output_ctx = get_tool_output_streaming_context()
                 # Use the actual tool_call_id from LLM, or generate fallback
                 tool_call_id = get_current_tool_call_id() or f"cmd_{str(uuid4())[:8]}"
                 logger.debug(f"[SHELL STREAMING] Using tool_call_id: {tool_call_id}")
+                # Batches PTY chunks into few stream entries (None without a streaming context)
+                output_stream = open_tool_output_stream(tool_call_id, "execute_command")
                 
                 # Track output for streaming
                 output_buffer = []
-                last_streamed_len = 0
                 command_completed = asyncio.Event()
                 exit_code = 0
                 
                 async def on_pty_data(data: bytes):
-                    nonlocal last_streamed_len
                     try:
                         text = data.decode("utf-8", errors="replace")
                         output_buffer.append(text)
                         
                         # Stream output to frontend if we have a tool output streaming context
-                        if tool_output_ctx:
-                            await stream_tool_output(
-                                tool_call_id=tool_call_id,
-                                output_chunk=text,
-                                is_final=False,
-                                tool_name="execute_command"
-                            )
+                        if output_stream:
+                            output_stream.write(text)
                     except Exception as e:
                         logger.warning(f"Error processing PTY output: {e}")
                 
@@ -274,25 +271,22 @@ class SandboxShellTool(SandboxToolsBase):
                     ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
                     final_output = ansi_escape.sub('', final_output)
                     
-                    # Stream final message
-                    if tool_output_ctx:
-                        await stream_tool_output(
-                            tool_call_id=tool_call_id,
-                            output_chunk="",
-                            is_final=True,
-                            tool_name="execute_command"
-                        )
+                    # Flush remaining output and stream final message
+                    if output_stream:
+                        await output_stream.close()
                     
                     return self.success_response({
                         "output": final_output.strip(),
                         "cwd": cwd,
                         "completed": True,
                         "exit_code": exit_code,
-                        "streamed": tool_output_ctx is not None
+                        "streamed": output_stream is not None
                     })
                     
                 except Exception as pty_error:
                     logger.warning(f"PTY execution failed, falling back to tmux: {pty_error}")
+                    if output_stream:
+                        await output_stream.close(is_final=False)
                     # Fall back to tmux approach
                     marker = f"COMMAND_DONE_{str(uuid4())[:8]}"
                     completion_command = self._format_completion_command(command, marker)
@@ -12,6 +12,7 @@ from core.agentpress.thread_manager import ThreadManager
 from core.utils.logger import logger
 from core.vapi_config import vapi_config, DEFAULT_SYSTEM_PROMPT, DEFAULT_FIRST_MESSAGE
 from core.billing.shared.config import TOKEN_PRICE_MULTIPLIER
+from core.services.http_client import http_clients
 
 def normalize_phone_number(raw_number: str, default_region: str = "US") -> tuple[str, str, str]:
     import re
@@ -439,7 +440,7 @@ class VapiVoiceTool(Tool):
                 "assistant": assistant_config
             }
             
-            async with httpx.AsyncClient() as client:
+            async with http_clients.borrow(self.base_url) as client:
                 response = await client.post(
                     f"{self.base_url}/call/phone",
                     headers=self._get_headers(),
@@ -563,7 +564,7 @@ class VapiVoiceTool(Tool):
             return self.fail_response("VAPI_PRIVATE_KEY not configured")
         
         try:
-            async with httpx.AsyncClient() as client:
+            async with http_clients.borrow(self.base_url) as client:
                 response = await client.patch(
                     f"{self.base_url}/call/{call_id}",
                     headers=self._get_headers(),
@@ -619,7 +620,7 @@ class VapiVoiceTool(Tool):
             return self.fail_response("VAPI_PRIVATE_KEY not configured")
         
         try:
-            async with httpx.AsyncClient() as client:
+            async with http_clients.borrow(self.base_url) as client:
                 response = await client.get(
                     f"{self.base_url}/call/{call_id}",
                     headers=self._get_headers(),
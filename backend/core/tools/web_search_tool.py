@@ -10,6 +10,7 @@ import datetime
 import asyncio
 import logging
 import time
+from core.services.http_client import http_clients
 
 # TODO: add subpages, etc... in filters as sometimes its necessary 
 
@@ -95,6 +96,9 @@ import time
 class SandboxWebSearchTool(SandboxToolsBase):
     """Tool for performing web searches using Tavily API and web scraping using Firecrawl."""
 
+    concurrency_class = "external"
+    function_upstreams = {'web_search': 'tavily', 'scrape_webpage': 'firecrawl'}
+
     def __init__(self, project_id: str, thread_manager: ThreadManager):
         super().__init__(project_id, thread_manager)
         # Load environment variables
@@ -465,7 +469,7 @@ class SandboxWebSearchTool(SandboxToolsBase):
         try:
             # ---------- Firecrawl scrape endpoint ----------
             logging.info(f"Sending request to Firecrawl for URL: {url}")
-            async with httpx.AsyncClient() as client:
+            async with http_clients.borrow(self.firecrawl_url) as client:
                 headers = {
                     "Authorization": f"Bearer {self.firecrawl_api_key}",
                     "Content-Type": "application/json",
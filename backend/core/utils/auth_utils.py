@@ -1,7 +1,10 @@
 import hmac
+import json
+import time
 import sentry
+from collections import OrderedDict
 from fastapi import HTTPException, Request, Header
-from typing import Optional
+from typing import Optional, Dict, Any, List, Tuple
 import jwt
 from jwt.exceptions import PyJWTError
 from core.utils.logger import structlog
@@ -346,57 +349,178 @@ async def verify_and_get_agent_authorization(client, agent_id: str, user_id: str
         structlog.error(f"Error verifying agent access for agent {agent_id}, user {user_id}: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to verify agent access")
 
+# ========== Thread access decision cache ==========
+# Only "allow" decisions that can't be revoked behind the backend's back are
+# cached:
+# - the user owns the thread's (personal) account: cached locally and in Redis
+# - the project is public: cached in Redis only, and dropped by update_thread
+#   (the only path that changes publicity), so no worker serves a stale copy
+# Grants through team membership or an admin role are resolved on every
+# request, since members and roles are changed through basejump/Supabase
+# directly and the backend never sees those writes.
+# Each cached entry is indexed under the thread, project, account and user it
+# depends on so invalidate_thread_access_cache can drop it.
+THREAD_ACCESS_REDIS_TTL = 120
+THREAD_ACCESS_LOCAL_TTL = 10
+THREAD_ACCESS_LOCAL_MAX = 5000
+
+_thread_access_local: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+
+def _thread_access_key(thread_id: str, user_id: Optional[str]) -> str:
+    return f"thread_access:{thread_id}:{user_id or 'anon'}"
+
+
+def _thread_access_index_keys(thread_id: str, user_id: Optional[str], decision: Dict[str, Any]) -> List[str]:
+    keys = [f"thread_access:idx:thread:{thread_id}"]
+    if decision.get('project_id'):
+        keys.append(f"thread_access:idx:project:{decision['project_id']}")
+    if decision.get('account_id'):
+        keys.append(f"thread_access:idx:account:{decision['account_id']}")
+    if user_id:
+        keys.append(f"thread_access:idx:user:{user_id}")
+    return keys
+
+
+async def _get_cached_thread_access(thread_id: str, user_id: Optional[str]) -> bool:
+    key = _thread_access_key(thread_id, user_id)
+    entry = _thread_access_local.get(key)
+    if entry is not None:
+        if entry[0] > time.monotonic():
+            _thread_access_local.move_to_end(key)
+            return True
+        _thread_access_local.pop(key, None)
+    
+    try:
+        cached = await redis.get(key)
+    except Exception as e:
+        structlog.get_logger().warning(f"Thread access cache lookup failed: {e}")
+        return False
+    if not cached:
+        return False
+    
+    decision = json.loads(cached)
+    if _is_owner_decision(user_id, decision):
+        _remember_thread_access_locally(key, decision)
+    return True
+
+
+def _is_owner_decision(user_id: Optional[str], decision: Dict[str, Any]) -> bool:
+    return bool(user_id) and decision.get('account_id') == user_id
+
+
+def _remember_thread_access_locally(key: str, decision: Dict[str, Any]) -> None:
+    _thread_access_local[key] = (time.monotonic() + THREAD_ACCESS_LOCAL_TTL, decision)
+    _thread_access_local.move_to_end(key)
+    while len(_thread_access_local) > THREAD_ACCESS_LOCAL_MAX:
+        _thread_access_local.popitem(last=False)
+
+
+async def _cache_thread_access(thread_id: str, user_id: Optional[str], decision: Dict[str, Any]) -> None:
+    key = _thread_access_key(thread_id, user_id)
+    if _is_owner_decision(user_id, decision):
+        _remember_thread_access_locally(key, decision)
+    try:
+        client = await redis.get_client()
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.set(key, json.dumps(decision), ex=THREAD_ACCESS_REDIS_TTL)
+            for index_key in _thread_access_index_keys(thread_id, user_id, decision):
+                pipe.sadd(index_key, key)
+                pipe.expire(index_key, THREAD_ACCESS_REDIS_TTL)
+            await pipe.execute()
+    except Exception as e:
+        structlog.get_logger().warning(f"Failed to cache thread access decision: {e}")
+
+
+async def invalidate_thread_access_cache(
+    thread_id: Optional[str] = None,
+    project_id: Optional[str] = None,
+    account_id: Optional[str] = None,
+    user_id: Optional[str] = None
+) -> None:
+    """Drop cached thread access decisions depending on any of the given scopes.
+    
+    Call when project publicity changes or when a thread or project is
+    deleted.
+    """
+    scopes = {'thread': thread_id, 'project': project_id, 'account': account_id, 'user': user_id}
+    
+    for key, (_, decision) in list(_thread_access_local.items()):
+        _, cached_thread_id, cached_user_id = key.split(':', 2)
+        if (
+            (thread_id and cached_thread_id == thread_id)
+            or (project_id and decision.get('project_id') == project_id)
+            or (account_id and decision.get('account_id') == account_id)
+            or (user_id and cached_user_id == user_id)
+        ):
+            _thread_access_local.pop(key, None)
+    
+    index_keys = [f"thread_access:idx:{scope}:{value}" for scope, value in scopes.items() if value]
+    if not index_keys:
+        return
+    try:
+        client = await redis.get_client()
+        async with client.pipeline(transaction=False) as pipe:
+            for index_key in index_keys:
+                pipe.smembers(index_key)
+            member_sets = await pipe.execute()
+        members = set().union(*member_sets)
+        await client.delete(*members, *index_keys)
+    except Exception as e:
+        structlog.get_logger().warning(f"Failed to invalidate thread access cache: {e}")
+
+
+async def _resolve_thread_access(client, thread_id: str, user_id: Optional[str]) -> Dict[str, Any]:
+    """Resolve all facts needed for a thread access decision in one RPC."""
+    result = await client.rpc('authorize_thread_access', {
+        'p_thread_id': thread_id,
+        'p_user_id': user_id
+    }).execute()
+    return result.data or {'found': False}
+
+
 async def verify_and_authorize_thread_access(client, thread_id: str, user_id: Optional[str]):
     """
     Verify that a user has access to a thread.
     Supports both authenticated and anonymous access (for public threads).
     
+    Owner and public-project allow decisions are cached (see above); on a
+    miss the whole decision is resolved with a single
+    `authorize_thread_access` RPC.
+    
     Args:
         client: Supabase client
         thread_id: Thread ID to check
         user_id: User ID (can be None for anonymous users accessing public threads)
     """
     try:
-        # Get thread data first
-        thread_result = await client.table('threads').select('*').eq('thread_id', thread_id).execute()
-
-        if not thread_result.data or len(thread_result.data) == 0:
-            raise HTTPException(status_code=404, detail="Thread not found")
+        if await _get_cached_thread_access(thread_id, user_id):
+            return True
         
-        thread_data = thread_result.data[0]
+        decision = await _resolve_thread_access(client, thread_id, user_id)
+        
+        if not decision.get('found'):
+            raise HTTPException(status_code=404, detail="Thread not found")
         
         # Check if thread's project is public - allow anonymous access
-        project_id = thread_data.get('project_id')
-        if project_id:
-            project_result = await client.table('projects').select('is_public').eq('project_id', project_id).execute()
-            if project_result.data and len(project_result.data) > 0:
-                if project_result.data[0].get('is_public'):
-                    structlog.get_logger().debug(f"Public thread access granted: {thread_id}")
-                    return True
+        if decision.get('is_public'):
+            structlog.get_logger().debug(f"Public thread access granted: {thread_id}")
+            await _cache_thread_access(thread_id, user_id, decision)
+            return True
         
         # If not public, user must be authenticated
         if not user_id:
             raise HTTPException(status_code=403, detail="Authentication required for private threads")
         
-        # Check if user is an admin (admins have access to all threads)
-        admin_result = await client.table('user_roles').select('role').eq('user_id', user_id).execute()
-        if admin_result.data and len(admin_result.data) > 0:
-            role = admin_result.data[0].get('role')
-            if role in ('admin', 'super_admin'):
-                structlog.get_logger().debug(f"Admin access granted for thread {thread_id}", user_role=role)
-                return True
-        
-        # Check if user owns the thread
-        if thread_data['account_id'] == user_id:
+        # Admins have access to all threads; owners and team members to their account's threads
+        if decision.get('is_admin') or decision.get('is_member'):
+            if decision.get('is_admin'):
+                structlog.get_logger().debug(f"Admin access granted for thread {thread_id}")
+            # Membership and roles can change without the backend noticing; only ownership is cached
+            if _is_owner_decision(user_id, decision):
+                await _cache_thread_access(thread_id, user_id, decision)
             return True
         
-        # Check if user is a team member of the account
-        account_id = thread_data.get('account_id')
-        if account_id:
-            account_user_result = await client.schema('basejump').from_('account_user').select('account_role').eq('user_id', user_id).eq('account_id', account_id).execute()
-            if account_user_result.data and len(account_user_result.data) > 0:
-                return True
-        
         raise HTTPException(status_code=403, detail="Not authorized to access this thread")
     except HTTPException:
         raise
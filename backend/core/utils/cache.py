@@ -1,6 +1,6 @@
 import json
-from typing import Any
-from core.services.redis import get_client
+from typing import Any, Optional
+from core.services.redis import get_client, register_keys, unlink_registered_keys
 
 
 class _cache:
@@ -12,15 +12,22 @@ class _cache:
             return json.loads(result)
         return None
 
-    async def set(self, key: str, value: Any, ttl: int = 15 * 60):
+    async def set(self, key: str, value: Any, ttl: int = 15 * 60, owner: Optional[str] = None):
+        """`owner` registers the key so invalidate_owner can drop it without a SCAN."""
         redis = await get_client()
         key = f"cache:{key}"
         await redis.set(key, json.dumps(value), ex=ttl)
+        if owner:
+            await register_keys(f"cache:{owner}", [key], ttl=ttl)
 
     async def invalidate(self, key: str):
         redis = await get_client()
         key = f"cache:{key}"
         await redis.delete(key)
 
+    async def invalidate_owner(self, owner: str):
+        """Drop every key set with this `owner`."""
+        await unlink_registered_keys(f"cache:{owner}")
+
 
 Cache = _cache()
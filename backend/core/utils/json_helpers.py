@@ -8,6 +8,8 @@ them as proper JSONB objects in the database.
 import json
 from typing import Any, Union, Dict, List
 
+import orjson
+
 
 def ensure_dict(value: Union[str, Dict[str, Any], None], default: Dict[str, Any] = None) -> Dict[str, Any]:
     """
@@ -157,7 +159,7 @@ def to_json_string_fast(value: Any) -> str:
     Returns:
         JSON string representation
     """
-    return json.dumps(value, separators=(',', ':'))  # Compact JSON, no extra whitespace
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()  # Compact JSON, no extra whitespace
 
 
 def format_for_yield(message_object: Dict[str, Any]) -> Dict[str, Any]:
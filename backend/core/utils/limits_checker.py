@@ -1,143 +1,55 @@
 from typing import Dict, Any
-from datetime import datetime, timezone, timedelta
 from core.utils.logger import logger
 from core.utils.config import config
 from core.utils.cache import Cache
 
 
+async def _get_concurrent_runs_limit(account_id: str) -> int:
+    try:
+        from core.billing import subscription_service
+        # Use cache (60s TTL) - tiers don't change frequently
+        tier_info = await subscription_service.get_user_subscription_tier(account_id, skip_cache=False)
+        concurrent_runs_limit = tier_info.get('concurrent_runs', 1)
+        logger.debug(f"Account {account_id} tier: {tier_info['name']}, concurrent runs limit: {concurrent_runs_limit}")
+        return concurrent_runs_limit
+    except Exception as billing_error:
+        logger.warning(f"Could not get subscription tier for {account_id}: {str(billing_error)}, using global default")
+        return config.MAX_PARALLEL_AGENT_RUNS
+
+
+async def _get_running_thread_ids(client, run_ids) -> list:
+    if not run_ids:
+        return []
+    from core.utils.query_utils import batch_query_in
+    runs = await batch_query_in(
+        client=client,
+        table_name='agent_runs',
+        select_fields='thread_id',
+        in_field='id',
+        in_values=list(run_ids),
+    )
+    return [run['thread_id'] for run in runs]
+
+
 async def check_agent_run_limit(client, account_id: str) -> Dict[str, Any]:
+    """Read-only view of the account's run slots (see core.services.run_admission)."""
     try:
-        import time
         import asyncio
-        t_start = time.time()
-        
-        twenty_four_hours_ago = datetime.now(timezone.utc) - timedelta(hours=24)
-        twenty_four_hours_ago_iso = twenty_four_hours_ago.isoformat()
-        
-        logger.debug(f"Checking agent run limit for account {account_id} since {twenty_four_hours_ago_iso}")
-        
-        # FAST PATH: Check Redis cache for running runs (5s TTL)
-        from core.runtime_cache import get_cached_running_runs, set_cached_running_runs
-        cached_runs = await get_cached_running_runs(account_id)
-        
-        if cached_runs:
-            # Cache hit - get tier info only (cached 60s)
-            try:
-                from core.billing import subscription_service
-                tier_info = await subscription_service.get_user_subscription_tier(account_id, skip_cache=False)
-                concurrent_runs_limit = tier_info.get('concurrent_runs', 1)
-            except Exception:
-                concurrent_runs_limit = config.MAX_PARALLEL_AGENT_RUNS
-            
-            running_count = cached_runs['running_count']
-            running_thread_ids = cached_runs['running_thread_ids']
-            
-            query_time = (time.time() - t_start) * 1000
-            logger.debug(f"⚡ Running runs from cache: {running_count} runs in {query_time:.1f}ms")
-            
-            return {
-                'can_start': running_count < concurrent_runs_limit,
-                'running_count': running_count,
-                'running_thread_ids': running_thread_ids,
-                'limit': concurrent_runs_limit
-            }
-        
-        # CACHE MISS: Run tier lookup and join query in parallel
-        async def get_tier_info():
-            try:
-                from core.billing import subscription_service
-                # Use cache (60s TTL) - tiers don't change frequently
-                tier_info = await subscription_service.get_user_subscription_tier(account_id, skip_cache=False)
-                tier_name = tier_info['name']
-                concurrent_runs_limit = tier_info.get('concurrent_runs', 1)
-                logger.debug(f"Account {account_id} tier: {tier_name}, concurrent runs limit: {concurrent_runs_limit}")
-                return concurrent_runs_limit
-            except Exception as billing_error:
-                logger.warning(f"Could not get subscription tier for {account_id}: {str(billing_error)}, using global default")
-                return config.MAX_PARALLEL_AGENT_RUNS
-        
-        async def get_running_runs():
-            # OPTIMIZED: Query agent_runs directly with join to threads, filtering by account_id
-            # This avoids fetching all 244 threads first, then checking agent_runs
-            # Instead: Single query with join - MUCH faster!
-            try:
-                running_runs_result = await client.table('agent_runs').select(
-                    'id, thread_id, started_at, threads!inner(account_id)'
-                ).eq('threads.account_id', account_id).eq('status', 'running').gte('started_at', twenty_four_hours_ago_iso).execute()
-                
-                running_runs = running_runs_result.data or []
-                running_count = len(running_runs)
-                running_thread_ids = [run['thread_id'] for run in running_runs]
-                return running_count, running_thread_ids
-            except Exception as join_error:
-                # Fallback to old method if join syntax fails (shouldn't happen, but safety net)
-                logger.warning(f"Join query failed, falling back to batch method: {str(join_error)}")
-                raise
-        
-        # Run both queries in parallel
-        try:
-            concurrent_runs_limit, (running_count, running_thread_ids) = await asyncio.gather(
-                get_tier_info(),
-                get_running_runs()
-            )
-            
-            # Cache the running runs for next request (5s TTL)
-            await set_cached_running_runs(account_id, running_count, running_thread_ids)
-            
-            query_time = (time.time() - t_start) * 1000
-            logger.debug(f"⚡ Optimized query: Found {running_count} running runs in {query_time:.1f}ms (parallel tier + join query)")
-        except Exception as join_error:
-            # Fallback to old method if join syntax fails (shouldn't happen, but safety net)
-            logger.warning(f"Join query failed, falling back to batch method: {str(join_error)}")
-            
-            # Get tier info (fallback)
-            try:
-                from core.billing import subscription_service
-                tier_info = await subscription_service.get_user_subscription_tier(account_id, skip_cache=False)
-                concurrent_runs_limit = tier_info.get('concurrent_runs', 1)
-            except Exception:
-                concurrent_runs_limit = config.MAX_PARALLEL_AGENT_RUNS
-            
-            threads_result = await client.table('threads').select('thread_id').eq('account_id', account_id).execute()
-            
-            if not threads_result.data:
-                logger.debug(f"No threads found for account {account_id}")
-                return {
-                    'can_start': True,
-                    'running_count': 0,
-                    'running_thread_ids': [],
-                    'limit': concurrent_runs_limit
-                }
-            
-            thread_ids = [thread['thread_id'] for thread in threads_result.data]
-            logger.debug(f"Found {len(thread_ids)} threads for account {account_id}")
-            
-            from core.utils.query_utils import batch_query_in
-            
-            running_runs = await batch_query_in(
-                client=client,
-                table_name='agent_runs',
-                select_fields='id, thread_id, started_at',
-                in_field='thread_id',
-                in_values=thread_ids,
-                additional_filters={
-                    'status': 'running',
-                    'started_at_gte': twenty_four_hours_ago_iso
-                }
-            )
-            
-            running_count = len(running_runs)
-            running_thread_ids = [run['thread_id'] for run in running_runs]
-        
+        from core.services.run_admission import run_admission
+
+        concurrent_runs_limit, running_run_ids = await asyncio.gather(
+            _get_concurrent_runs_limit(account_id),
+            run_admission.running_run_ids(client, account_id),
+        )
+        running_count = len(running_run_ids)
         logger.debug(f"Account {account_id} has {running_count}/{concurrent_runs_limit} running agent runs")
-        
-        result = {
+
+        return {
             'can_start': running_count < concurrent_runs_limit,
             'running_count': running_count,
-            'running_thread_ids': running_thread_ids,
+            'running_thread_ids': await _get_running_thread_ids(client, running_run_ids),
             'limit': concurrent_runs_limit
         }
-        return result
 
     except Exception as e:
         logger.error(f"Error checking agent run limit for account {account_id}: {str(e)}")
@@ -149,6 +61,35 @@ async def check_agent_run_limit(client, account_id: str) -> Dict[str, Any]:
         }
 
 
+async def reserve_agent_run_slot(client, account_id: str, agent_run_id: str) -> Dict[str, Any]:
+    """Take a concurrent run slot for `agent_run_id` (released by the worker when the run ends)."""
+    try:
+        from core.services.run_admission import run_admission
+
+        concurrent_runs_limit = await _get_concurrent_runs_limit(account_id)
+        admitted, running_count = await run_admission.reserve(client, account_id, agent_run_id, concurrent_runs_limit)
+        result = {
+            'can_start': admitted,
+            'running_count': running_count,
+            'running_thread_ids': [],
+            'limit': concurrent_runs_limit
+        }
+        if not admitted:
+            # Only the rejection path needs thread ids (shown to the user)
+            running_run_ids = await run_admission.running_run_ids(client, account_id)
+            result['running_thread_ids'] = await _get_running_thread_ids(client, running_run_ids)
+        return result
+
+    except Exception as e:
+        logger.error(f"Error reserving agent run slot for account {account_id}: {str(e)}")
+        return {
+            'can_start': True,
+            'running_count': 0,
+            'running_thread_ids': [],
+            'limit': 1
+        }
+
+
 async def check_agent_count_limit(client, account_id: str) -> Dict[str, Any]:
     try:
         if config.ENV_MODE.value == "local":
@@ -1,19 +1,47 @@
 import structlog, logging, os
+import atexit
+import queue
+import sys
+import zlib
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+import orjson
 
 ENV_MODE = os.getenv("ENV_MODE", "LOCAL")
 
 # Set default logging level based on environment
 if ENV_MODE.upper() == "PRODUCTION":
-    default_level = "DEBUG"
+    default_level = "INFO"
 else:
-    default_level = "DEBUG" 
+    default_level = "DEBUG"
     # default_level = "INFO"
 
 LOGGING_LEVEL = logging.getLevelNamesMapping().get(
-    os.getenv("LOGGING_LEVEL", default_level).upper(), 
-    logging.DEBUG  
+    os.getenv("LOGGING_LEVEL", default_level).upper(),
+    logging.DEBUG
 )
 
+# Performance mode: callsite info only for WARNING+, per-run debug sampling,
+# rendering (orjson) on a background thread fed by a bounded queue
+LOG_PERF_MODE = os.getenv("LOG_PERF_MODE", "true" if ENV_MODE.upper() == "PRODUCTION" else "false").lower() == "true"
+# Fraction of agent runs (by agent_run_id) whose debug logs are kept when LOGGING_LEVEL is above DEBUG
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+_CALLSITE_METHODS = frozenset({"warning", "warn", "error", "exception", "critical", "fatal"})
+_METHOD_LEVELS = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "msg": logging.INFO,
+    "warning": logging.WARNING,
+    "warn": logging.WARNING,
+    "error": logging.ERROR,
+    "exception": logging.ERROR,
+    "critical": logging.CRITICAL,
+    "fatal": logging.CRITICAL,
+}
+
 # Use different exception formatting based on output mode
 # dict_tracebacks works with JSONRenderer, format_exc_info works with ConsoleRenderer
 if ENV_MODE.lower() == "local".lower() or ENV_MODE.lower() == "staging".lower():
@@ -23,24 +51,193 @@ else:
     exception_processor = structlog.processors.dict_tracebacks
     renderer = [structlog.processors.JSONRenderer()]
 
-structlog.configure(
-    processors=[
-        structlog.stdlib.add_log_level,
-        structlog.stdlib.PositionalArgumentsFormatter(),
-        exception_processor,
-        structlog.processors.CallsiteParameterAdder(
-            {
-                structlog.processors.CallsiteParameter.FILENAME,
-                structlog.processors.CallsiteParameter.FUNC_NAME,
-                structlog.processors.CallsiteParameter.LINENO,
-            }
-        ),
-        structlog.processors.TimeStamper(fmt="iso"),
-        structlog.contextvars.merge_contextvars,
-        *renderer,
-    ],
-    cache_logger_on_first_use=True,
-    wrapper_class=structlog.make_filtering_bound_logger(LOGGING_LEVEL),
+_callsite_adder = structlog.processors.CallsiteParameterAdder(
+    {
+        structlog.processors.CallsiteParameter.FILENAME,
+        structlog.processors.CallsiteParameter.FUNC_NAME,
+        structlog.processors.CallsiteParameter.LINENO,
+    },
+    additional_ignores=[__name__],
 )
 
+
+def _callsite_for_warnings(logger, method_name, event_dict):
+    """Stack inspection is the most expensive processor; only pay it where it is read."""
+    if method_name in _CALLSITE_METHODS:
+        return _callsite_adder(logger, method_name, event_dict)
+    return event_dict
+
+
+def _run_is_sampled(agent_run_id: str) -> bool:
+    return zlib.crc32(agent_run_id.encode()) % 10000 < LOG_DEBUG_SAMPLE_RATE * 10000
+
+
+def _sample_debug(logger, method_name, event_dict):
+    """Keep debug events only for the sampled fraction of agent runs.
+
+    The bound logger lets everything from DEBUG up through when sampling is
+    on, so other events below LOGGING_LEVEL are dropped here.
+    """
+    if _METHOD_LEVELS.get(method_name, logging.INFO) >= LOGGING_LEVEL:
+        return event_dict
+    if method_name == "debug":
+        agent_run_id = structlog.contextvars.get_contextvars().get("agent_run_id")
+        if agent_run_id and _run_is_sampled(str(agent_run_id)):
+            return event_dict
+    raise structlog.DropEvent
+
+
+def _capture_exc_info(logger, method_name, event_dict):
+    """Resolve exc_info=True here; the render thread has no current exception."""
+    exc_info = event_dict.get("exc_info")
+    if exc_info is True:
+        event_dict["exc_info"] = sys.exc_info()
+    elif isinstance(exc_info, BaseException):
+        event_dict["exc_info"] = (type(exc_info), exc_info, exc_info.__traceback__)
+    return event_dict
+
+
+def _record_timestamp(logger, method_name, event_dict):
+    """Event time (not render time), in the same format as TimeStamper(fmt="iso")."""
+    created = datetime.fromtimestamp(event_dict["_record"].created, tz=timezone.utc)
+    event_dict["timestamp"] = created.isoformat().replace("+00:00", "Z")
+    return event_dict
+
+
+def _render_orjson(logger, method_name, event_dict) -> str:
+    return orjson.dumps(event_dict, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """Enqueues the raw structlog event; formatting happens on the listener thread."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Never block the event loop on a slow stdout
+            self.dropped += 1
+
+
+class _QueueLogger:
+    """Hands events straight to the queue handler, skipping stdlib's Logger
+    (and its findCaller stack walk on every record)."""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def _log(self, level: int, event_dict, extra=None) -> None:
+        record = logging.LogRecord(self.name, level, "", 0, event_dict, None, None)
+        if extra:
+            record.__dict__.update(extra)
+        _queue_handler.handle(record)
+
+    def debug(self, event_dict, extra=None) -> None:
+        self._log(logging.DEBUG, event_dict, extra)
+
+    def info(self, event_dict, extra=None) -> None:
+        self._log(logging.INFO, event_dict, extra)
+
+    def warning(self, event_dict, extra=None) -> None:
+        self._log(logging.WARNING, event_dict, extra)
+
+    def error(self, event_dict, extra=None) -> None:
+        self._log(logging.ERROR, event_dict, extra)
+
+    def critical(self, event_dict, extra=None) -> None:
+        self._log(logging.CRITICAL, event_dict, extra)
+
+    warn = warning
+    exception = error
+    fatal = critical
+    msg = info
+
+
+_queue_handler: _NonBlockingQueueHandler = None
+_listener: QueueListener = None
+
+
+def _start_listener() -> None:
+    global _listener
+    output_handler = logging.StreamHandler(sys.stdout)
+    output_handler.setFormatter(structlog.stdlib.ProcessorFormatter(
+        processors=[
+            _record_timestamp,
+            structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+            structlog.processors.dict_tracebacks,
+            _render_orjson,
+        ],
+    ))
+    _listener = QueueListener(_queue_handler.queue, output_handler)
+    _listener.start()
+
+
+def _restart_listener_after_fork() -> None:
+    # The listener thread does not survive fork; the queue's lock may not either
+    _queue_handler.queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _start_listener()
+
+
+def _stop_listener() -> None:
+    if _listener is not None:
+        _listener.stop()
+
+
+def dropped_log_records() -> int:
+    """Log records discarded because the render queue was full (performance mode only)."""
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
+if LOG_PERF_MODE:
+    _queue_handler = _NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    _queue_logger = _QueueLogger("app")
+    _start_listener()
+    atexit.register(_stop_listener)
+    os.register_at_fork(after_in_child=_restart_listener_after_fork)
+
+    # Sampled runs need debug calls to reach the sampler; everything else is
+    # filtered by the bound logger before any processor runs
+    filter_level = logging.DEBUG if LOG_DEBUG_SAMPLE_RATE > 0 else LOGGING_LEVEL
+    structlog.configure(
+        processors=[
+            _sample_debug,
+            structlog.stdlib.add_log_level,
+            structlog.stdlib.PositionalArgumentsFormatter(),
+            _capture_exc_info,
+            _callsite_for_warnings,
+            structlog.contextvars.merge_contextvars,
+            structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
+        ],
+        logger_factory=lambda *args: _queue_logger,
+        cache_logger_on_first_use=True,
+        wrapper_class=structlog.make_filtering_bound_logger(filter_level),
+    )
+else:
+    structlog.configure(
+        processors=[
+            structlog.stdlib.add_log_level,
+            structlog.stdlib.PositionalArgumentsFormatter(),
+            exception_processor,
+            structlog.processors.CallsiteParameterAdder(
+                {
+                    structlog.processors.CallsiteParameter.FILENAME,
+                    structlog.processors.CallsiteParameter.FUNC_NAME,
+                    structlog.processors.CallsiteParameter.LINENO,
+                }
+            ),
+            structlog.processors.TimeStamper(fmt="iso"),
+            structlog.contextvars.merge_contextvars,
+            *renderer,
+        ],
+        cache_logger_on_first_use=True,
+        wrapper_class=structlog.make_filtering_bound_logger(LOGGING_LEVEL),
+    )
+
 logger: structlog.stdlib.BoundLogger = structlog.get_logger()
@@ -1,74 +1,204 @@
 """
 Rate limiting utilities for API endpoints.
 
-This module provides in-memory rate limiting for sensitive endpoints
-to prevent brute force attacks and DoS.
+This module provides GCRA (generic cell rate algorithm) rate limiting for
+sensitive endpoints to prevent brute force attacks and DoS:
+
+- RedisGCRABackend: shared across all API workers/replicas, one Lua script
+  call per check, so limits don't scale with replica count.
+- InMemoryGCRABackend: O(1) per check (one stored timestamp per client),
+  used in local mode and as a fallback when Redis is unavailable.
+
+RateLimiter can be awaited directly (`await limiter.check(id)`) or used as a
+FastAPI dependency (`Depends(limiter)`).
 """
 
+import asyncio
 import hashlib
+import math
+import os
 import time
+from abc import ABC, abstractmethod
 from collections import OrderedDict
-from typing import Optional
-from fastapi import Request
+from typing import Dict, Optional, Tuple
+from fastapi import HTTPException, Request
+
+from core.utils.logger import logger
+
+
+class RateLimitBackend(ABC):
+    @abstractmethod
+    async def acquire(self, key: str, limit: int, window_seconds: int, cost: int = 1, carry: int = 0) -> Tuple[bool, int, int]:
+        """
+        Charge `cost` requests against `key`.
+        
+        `carry` requests (already served locally) are charged first,
+        unconditionally; only `cost` can be rejected. Pass cost=0 to charge
+        `carry` alone.
+        
+        Returns:
+            tuple: (is_limited, retry_after_seconds, remaining_burst)
+        """
+
+
+class InMemoryGCRABackend(RateLimitBackend):
+    """
+    Per-process GCRA limiter.
+    
+    Stores a single theoretical arrival time (TAT) per key instead of a list
+    of timestamps, with LRU eviction to bound memory.
+    """
+    
+    def __init__(self, max_entries: int = 10000):
+        self._tat: OrderedDict[str, float] = OrderedDict()
+        self._max_entries = max_entries
+    
+    async def acquire(self, key: str, limit: int, window_seconds: int, cost: int = 1, carry: int = 0) -> Tuple[bool, int, int]:
+        return self.acquire_sync(key, limit, window_seconds, cost, carry)
+    
+    def _store(self, key: str, tat: float) -> None:
+        self._tat[key] = tat
+        self._tat.move_to_end(key)
+        while len(self._tat) > self._max_entries:
+            self._tat.popitem(last=False)
+    
+    def acquire_sync(self, key: str, limit: int, window_seconds: int, cost: int = 1, carry: int = 0) -> Tuple[bool, int, int]:
+        now = time.monotonic()
+        emission = window_seconds / limit
+        tat = max(self._tat.get(key, now), now) + emission * carry
+        new_tat = tat + emission * cost
+        diff = now - (new_tat - emission * limit)
+        
+        if diff < 0:
+            if carry:
+                self._store(key, tat)
+            return True, max(1, math.ceil(-diff)), 0
+        
+        self._store(key, new_tat)
+        return False, 0, int(diff / emission)
+
+
+# KEYS[1] = limiter key; ARGV = emission interval (ms), burst (limit), cost, carry
+_GCRA_LUA = """
+local emission = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local carry = tonumber(ARGV[4])
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if not tat or tat < now then
+    tat = now
+end
+tat = tat + emission * carry
+local new_tat = tat + emission * cost
+local diff = now - (new_tat - emission * burst)
+if diff < 0 then
+    if carry > 0 then
+        redis.call('SET', KEYS[1], tat, 'PX', math.ceil(tat - now) + 1)
+    end
+    return {1, math.ceil(-diff), 0}
+end
+redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil(new_tat - now) + 1)
+return {0, 0, math.floor(diff / emission)}
+"""
+
+
+class RedisGCRABackend(RateLimitBackend):
+    """
+    Distributed GCRA limiter: one atomic Lua call per check.
+    
+    Falls back to a per-process limiter if Redis is unreachable, so a Redis
+    outage degrades to per-worker limits rather than rejecting traffic.
+    """
+    
+    def __init__(self):
+        self._script = None
+        self._script_client = None
+        self._fallback = InMemoryGCRABackend()
+    
+    async def _get_script(self):
+        from core.services import redis
+        client = await redis.get_client()
+        if self._script is None or self._script_client is not client:
+            self._script = client.register_script(_GCRA_LUA)
+            self._script_client = client
+        return self._script
+    
+    async def acquire(self, key: str, limit: int, window_seconds: int, cost: int = 1, carry: int = 0) -> Tuple[bool, int, int]:
+        emission_ms = window_seconds * 1000 / limit
+        try:
+            script = await self._get_script()
+            limited, retry_after_ms, remaining = await script(
+                keys=[f"ratelimit:{key}"], args=[emission_ms, limit, cost, carry]
+            )
+        except Exception as e:
+            logger.warning(f"Redis rate limiter unavailable, using local limiter: {e}")
+            return self._fallback.acquire_sync(key, limit, window_seconds, cost, carry)
+        
+        if int(limited):
+            return True, max(1, math.ceil(int(retry_after_ms) / 1000)), 0
+        return False, 0, int(remaining)
 
 
 class RateLimiter:
     """
-    In-memory rate limiter using sliding window approach.
+    GCRA rate limiter with a pluggable backend.
     
     Features:
     - Per-client rate limiting based on real IP
-    - Automatic cleanup of expired entries
-    - LRU eviction to prevent unbounded memory growth
+    - Distributed limits via Redis (one Lua call per check)
+    - Local short-circuit: when Redis reports plenty of headroom, this
+      process is granted its share of it (headroom / RATE_LIMIT_API_PROCESSES)
+      for a second. Requests served from the grant are charged to Redis in
+      bulk, unconditionally, on the next check or when the grant expires, so
+      clearly-allowed clients skip most round-trips and all processes
+      together stay within max_requests
     
     Usage:
-        limiter = RateLimiter(max_requests=100, window_seconds=60)
-        is_limited, retry_after = limiter.is_rate_limited(client_id)
+        limiter = RateLimiter(max_requests=100, window_seconds=60, name="auth")
+        is_limited, retry_after = await limiter.check(client_id)
+        
+        @router.get("/x", dependencies=[Depends(limiter)])
     """
     
-    def __init__(self, max_requests: int = 60, window_seconds: int = 60):
+    # API processes sharing a limit (all replicas); each is granted at most 1/N of the headroom
+    LOCAL_PROCESSES = int(os.getenv("RATE_LIMIT_API_PROCESSES", "32"))
+    LOCAL_GRANT_SECONDS = 1.0  # How long a local grant is valid
+    
+    def __init__(
+        self,
+        max_requests: int = 60,
+        window_seconds: int = 60,
+        name: str = "default",
+        backend: Optional[RateLimitBackend] = None
+    ):
         """
         Initialize rate limiter.
         
         Args:
             max_requests: Maximum requests allowed per window
             window_seconds: Time window in seconds
+            name: Namespace for limiter keys
+            backend: Storage backend (defaults to the process-wide backend)
         """
         self.max_requests = max_requests
         self.window_seconds = window_seconds
-        self.requests: OrderedDict[str, list] = OrderedDict()
-        self._last_cleanup = time.time()
-        self._cleanup_interval = 60  # Cleanup every minute
-        self._max_entries = 10000  # Prevent unbounded memory growth
-    
-    def _cleanup(self):
-        """Remove expired entries and enforce max size."""
-        current_time = time.time()
-        
-        # Only cleanup periodically
-        if current_time - self._last_cleanup < self._cleanup_interval:
-            return
-            
-        self._last_cleanup = current_time
-        cutoff = current_time - self.window_seconds
-        
-        # Remove expired timestamps from all keys
-        keys_to_remove = []
-        for key, timestamps in self.requests.items():
-            self.requests[key] = [t for t in timestamps if t > cutoff]
-            if not self.requests[key]:
-                keys_to_remove.append(key)
-        
-        for key in keys_to_remove:
-            del self.requests[key]
-        
-        # Enforce max entries (LRU eviction)
-        while len(self.requests) > self._max_entries:
-            self.requests.popitem(last=False)
+        self.name = name
+        self._backend = backend
+        # identifier -> (grant_expires_at, local_allowance_left, uncharged_requests)
+        self._local_grants: Dict[str, Tuple[float, int, int]] = {}
+        self._flush_tasks: set = set()
+    
+    @property
+    def backend(self) -> RateLimitBackend:
+        if self._backend is None:
+            self._backend = get_default_backend()
+        return self._backend
     
-    def is_rate_limited(self, identifier: str) -> tuple[bool, int]:
+    async def check(self, identifier: str) -> Tuple[bool, int]:
         """
-        Check if the identifier is rate limited.
+        Check (and record) a request for the identifier.
         
         Args:
             identifier: Unique client identifier (e.g., hashed IP)
@@ -76,31 +206,72 @@ class RateLimiter:
         Returns:
             tuple: (is_limited: bool, retry_after_seconds: int)
         """
-        self._cleanup()
+        now = time.monotonic()
+        expires_at, allowance, uncharged = self._local_grants.get(identifier, (0.0, 0, 0))
         
-        current_time = time.time()
-        cutoff = current_time - self.window_seconds
+        if allowance > 0 and now < expires_at:
+            self._local_grants[identifier] = (expires_at, allowance - 1, uncharged + 1)
+            return False, 0
         
-        # Get or create request list
-        if identifier not in self.requests:
-            self.requests[identifier] = []
+        # Requests already served locally are charged whether or not this one is allowed
+        self._local_grants.pop(identifier, None)
+        is_limited, retry_after, remaining = await self.backend.acquire(
+            self._key(identifier), self.max_requests, self.window_seconds, cost=1, carry=uncharged
+        )
         
-        # Filter to only recent requests
-        recent = [t for t in self.requests[identifier] if t > cutoff]
-        self.requests[identifier] = recent
+        grant = remaining // self.LOCAL_PROCESSES
+        if not is_limited and grant > 0:
+            expires_at = time.monotonic() + self.LOCAL_GRANT_SECONDS
+            self._local_grants[identifier] = (expires_at, grant, 0)
+            task = asyncio.create_task(self._flush_grant(identifier, expires_at))
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
         
-        # Check limit
-        if len(recent) >= self.max_requests:
-            # Calculate retry-after
-            oldest = min(recent)
-            retry_after = int(oldest + self.window_seconds - current_time) + 1
-            return True, max(1, retry_after)
-        
-        # Record this request
-        self.requests[identifier].append(current_time)
-        self.requests.move_to_end(identifier)  # LRU update
-        
-        return False, 0
+        return is_limited, retry_after
+    
+    def _key(self, identifier: str) -> str:
+        return f"{self.name}:{identifier}"
+    
+    async def _flush_grant(self, identifier: str, expires_at: float) -> None:
+        """Charge what was served from a grant that expired without a follow-up check."""
+        await asyncio.sleep(max(0.0, expires_at - time.monotonic()))
+        grant = self._local_grants.get(identifier)
+        if grant is None or grant[0] != expires_at:
+            # Already charged by a later check
+            return
+        del self._local_grants[identifier]
+        if grant[2] > 0:
+            try:
+                await self.backend.acquire(
+                    self._key(identifier), self.max_requests, self.window_seconds, cost=0, carry=grant[2]
+                )
+            except Exception as e:
+                logger.warning(f"Failed to charge {grant[2]} locally granted requests for {self.name}: {e}")
+    
+    async def __call__(self, request: Request) -> None:
+        """FastAPI dependency: raises 429 when the client is over the limit."""
+        is_limited, retry_after = await self.check(get_client_identifier(request))
+        if is_limited:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests. Please try again later.",
+                headers={"Retry-After": str(retry_after)}
+            )
+
+
+_default_backend: Optional[RateLimitBackend] = None
+
+
+def get_default_backend() -> RateLimitBackend:
+    """Redis-backed limits everywhere except local mode."""
+    global _default_backend
+    if _default_backend is None:
+        from core.utils.config import config, EnvMode
+        if config.ENV_MODE == EnvMode.LOCAL:
+            _default_backend = InMemoryGCRABackend()
+        else:
+            _default_backend = RedisGCRABackend()
+    return _default_backend
 
 
 def get_real_client_ip(request: Request) -> str:
@@ -158,20 +329,12 @@ def get_client_identifier(request: Request) -> str:
 
 # Auth/webhook endpoints: 100 requests per minute per client
 # Protects against credential brute force attacks
-auth_rate_limiter = RateLimiter(max_requests=100, window_seconds=60)
+auth_rate_limiter = RateLimiter(max_requests=100, window_seconds=60, name="auth")
 
 # API key management: 60 requests per minute per client
 # Protects against key enumeration/brute force
-api_key_rate_limiter = RateLimiter(max_requests=60, window_seconds=60)
+api_key_rate_limiter = RateLimiter(max_requests=60, window_seconds=60, name="api_keys")
 
 # Admin endpoints: 300 requests per minute per client
 # Higher limit for legitimate admin operations
-admin_rate_limiter = RateLimiter(max_requests=300, window_seconds=60)
-
-
-
-
-
-
-
-
+admin_rate_limiter = RateLimiter(max_requests=300, window_seconds=60, name="admin")
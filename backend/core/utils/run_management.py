@@ -1,8 +1,7 @@
 """Agent run management utilities - starting, stopping, and monitoring agent runs."""
-import json
 from typing import Optional, List
 from fastapi import HTTPException
-from core.services import redis
+from core.services import redis, stream_envelope
 from ..utils.logger import logger
 from run_agent_background import update_agent_run_status, cleanup_redis_keys_for_agent_run
 
@@ -35,7 +34,7 @@ async def stop_agent_run_with_helpers(agent_run_id: str, error_message: Optional
     all_responses = []
     try:
         stream_entries = await redis.xrange(stream_key)
-        all_responses = [json.loads(entry[1].get('data', '{}')) for entry in stream_entries] if stream_entries else []
+        all_responses = stream_envelope.expand(stream_entries) if stream_entries else []
         logger.debug(f"Fetched {len(all_responses)} responses from Redis stream for DB update on stop/fail: {agent_run_id}")
     except Exception as e:
         logger.error(f"Failed to fetch responses from Redis stream for {agent_run_id} during stop/fail: {e}")
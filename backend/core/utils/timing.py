@@ -0,0 +1,190 @@
+"""Timing spans for the agent run lifecycle.
+
+Phases (queue wait, bootstrap, prompt build, message fetch, compression,
+prompt caching, TTFT, tool execution, stream writes, ...) are recorded into
+Prometheus histograms, so regressions show up at p95/p99 instead of only in
+`⏱️ [TIMING]` log lines. Each run also keeps its own phase totals in a
+contextvar, logged once as a summary when the run ends.
+
+Usage:
+    with timing.span("message_fetch") as s:
+        messages = await self.get_llm_messages(thread_id)
+    logger.debug(f"get_llm_messages(): {s.elapsed_ms:.1f}ms")
+
+    timing.observe("ttft", seconds)         # durations measured elsewhere
+    with timing.tool_span("web_search"):    # per-tool histogram
+        ...
+
+With TIMING_SPANS_ENABLED=false spans still measure elapsed time (for the
+log lines) but record nothing.
+
+Exposition: the API serves `/v1/metrics/prometheus`; workers call
+start_metrics_server() (WORKER_METRICS_PORT). Set PROMETHEUS_MULTIPROC_DIR
+to aggregate all processes of a host; otherwise the process that binds the
+port first serves its own metrics only.
+"""
+
+import os
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+
+from core.utils.logger import logger
+
+TIMING_SPANS_ENABLED = os.getenv("TIMING_SPANS_ENABLED", "true").lower() == "true"
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9191"))
+
+# Seconds; dense below 1s (fetch/caching phases), sparse up to long tool calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 120, 300)
+
+PHASE_SECONDS = Histogram(
+    "agent_run_phase_seconds",
+    "Duration of agent run lifecycle phases",
+    ["phase"],
+    buckets=LATENCY_BUCKETS,
+)
+TOOL_SECONDS = Histogram(
+    "agent_run_tool_seconds",
+    "Tool execution time per tool",
+    ["tool"],
+    buckets=LATENCY_BUCKETS,
+)
+REDIS_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+REDIS_ROUND_TRIP_SECONDS = Histogram(
+    "redis_round_trip_seconds",
+    "Redis round-trip time per command type (a pipeline counts once per command type in it)",
+    ["command"],
+    buckets=REDIS_LATENCY_BUCKETS,
+)
+REDIS_COMMANDS = Counter(
+    "redis_commands",
+    "Redis commands sent, including those inside pipelines",
+    ["command"],
+)
+REDIS_COMMAND_ERRORS = Counter(
+    "redis_command_errors",
+    "Redis commands that failed",
+    ["command"],
+)
+
+# Phase totals of the current run: phase -> (count, seconds)
+_run_phases: ContextVar[Optional[Dict[str, Tuple[int, float]]]] = ContextVar("timing_run_phases", default=None)
+
+
+def _add_to_run(phase: str, seconds: float) -> None:
+    phases = _run_phases.get()
+    if phases is not None:
+        count, total = phases.get(phase, (0, 0.0))
+        phases[phase] = (count + 1, total + seconds)
+
+
+def observe(phase: str, seconds: float) -> None:
+    """Record a phase duration measured by the caller."""
+    if not TIMING_SPANS_ENABLED:
+        return
+    PHASE_SECONDS.labels(phase).observe(seconds)
+    _add_to_run(phase, seconds)
+
+
+def observe_tool(tool_name: str, seconds: float) -> None:
+    if not TIMING_SPANS_ENABLED:
+        return
+    TOOL_SECONDS.labels(tool_name).observe(seconds)
+    _add_to_run("tool_execution", seconds)
+
+
+def observe_redis(commands, seconds: float, failed=()) -> None:
+    """Record one Redis round-trip carrying `commands` (see RedisClient._record)."""
+    if not TIMING_SPANS_ENABLED:
+        return
+    for name in commands:
+        REDIS_COMMANDS.labels(name).inc()
+    for name in dict.fromkeys(commands):
+        REDIS_ROUND_TRIP_SECONDS.labels(name).observe(seconds)
+    for name in failed:
+        REDIS_COMMAND_ERRORS.labels(name).inc()
+
+
+class _Span:
+    __slots__ = ("name", "is_tool", "start", "elapsed")
+
+    def __init__(self, name: str, is_tool: bool = False):
+        self.name = name
+        self.is_tool = is_tool
+        self.elapsed = 0.0
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.elapsed = time.perf_counter() - self.start
+        if self.is_tool:
+            observe_tool(self.name, self.elapsed)
+        else:
+            observe(self.name, self.elapsed)
+        return False
+
+    @property
+    def elapsed_ms(self) -> float:
+        return self.elapsed * 1000
+
+
+def span(phase: str) -> _Span:
+    """Context manager timing `phase`; works across awaits within one task."""
+    return _Span(phase)
+
+
+def tool_span(tool_name: str) -> _Span:
+    return _Span(tool_name, is_tool=True)
+
+
+def start_run() -> None:
+    """Start collecting phase totals for the run in the current context."""
+    if TIMING_SPANS_ENABLED:
+        _run_phases.set({})
+
+
+def finish_run() -> Dict[str, Dict[str, float]]:
+    """Phase totals of the current run ({phase: {count, ms}}), logged as one line."""
+    phases = _run_phases.get()
+    _run_phases.set(None)
+    if not phases:
+        return {}
+    summary = {phase: {"count": count, "ms": round(total * 1000, 1)} for phase, (count, total) in phases.items()}
+    logger.info("⏱️ [TIMING] Run phase summary", phases=summary)
+    return summary
+
+
+def _exposition_registry() -> CollectorRegistry:
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def render_latest() -> Tuple[bytes, str]:
+    """Prometheus text exposition and its content type."""
+    return generate_latest(_exposition_registry()), CONTENT_TYPE_LATEST
+
+
+def start_metrics_server(port: int = WORKER_METRICS_PORT) -> bool:
+    """Serve /metrics from this process; False if another process already does."""
+    try:
+        start_http_server(port, registry=_exposition_registry())
+    except OSError:
+        return False
+    logger.info(f"Serving Prometheus metrics on :{port}")
+    return True
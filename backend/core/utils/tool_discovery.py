@@ -8,14 +8,16 @@ PERFORMANCE OPTIMIZATION:
 - Tool classes are pre-imported at startup via warm_up_tools_cache()
 - Tool schemas are pre-computed and cached globally to avoid per-request overhead
 - The schema cache uses tool class identity as key for O(1) lookups
+- Per (tool class, enabled methods) OpenAPI function lists are frozen and
+  shared by every registry in the process
 """
 
 import importlib
 import inspect
-from typing import Dict, List, Any, Optional, Type
+from typing import Dict, FrozenSet, List, Any, Optional, Tuple, Type
 from pathlib import Path
 
-from core.agentpress.tool import Tool, ToolMetadata, MethodMetadata, ToolSchema
+from core.agentpress.tool import Tool, ToolMetadata, MethodMetadata, ToolSchema, SchemaType
 from core.utils.logger import logger
 
 
@@ -23,6 +25,9 @@ from core.utils.logger import logger
 # This is populated at startup and reused across all agent runs
 _SCHEMA_CACHE: Dict[Type[Tool], Dict[str, List[ToolSchema]]] = {}
 
+# Frozen OpenAPI (function name, schema) pairs keyed by (tool class, enabled methods)
+_OPENAPI_FUNCTIONS_CACHE: Dict[Tuple[Type[Tool], Optional[FrozenSet[str]]], Tuple[Tuple[str, ToolSchema], ...]] = {}
+
 # Global cache for pre-instantiated stateless tools
 # Tools that don't require per-request state can be reused
 _STATELESS_TOOL_INSTANCES: Dict[Type[Tool], Tool] = {}
@@ -78,6 +83,39 @@ def get_cached_schemas(tool_class: Type[Tool]) -> Optional[Dict[str, List[ToolSc
     return _SCHEMA_CACHE.get(tool_class)
 
 
+def get_openapi_functions(tool_class: Type[Tool], function_names: Optional[List[str]] = None) -> Tuple[Tuple[str, ToolSchema], ...]:
+    """Get the OpenAPI functions a tool class exposes, filtered to `function_names`.
+    
+    Computed once per (class, enabled methods) and shared across agent runs.
+    
+    Args:
+        tool_class: The tool class to get functions for
+        function_names: Enabled method names, or None for all
+        
+    Returns:
+        Tuple of (function name, schema) pairs in declaration order
+    """
+    key = (tool_class, frozenset(function_names) if function_names is not None else None)
+    functions = _OPENAPI_FUNCTIONS_CACHE.get(key)
+    if functions is not None:
+        return functions
+    
+    schemas = _SCHEMA_CACHE.get(tool_class)
+    if schemas is None:
+        schemas = _precompute_schemas_for_class(tool_class)
+        _SCHEMA_CACHE[tool_class] = schemas
+    
+    functions = tuple(
+        (func_name, schema)
+        for func_name, schema_list in schemas.items()
+        if function_names is None or func_name in function_names
+        for schema in schema_list
+        if schema.schema_type == SchemaType.OPENAPI
+    )
+    _OPENAPI_FUNCTIONS_CACHE[key] = functions
+    return functions
+
+
 def get_cached_tool_instance(tool_class: Type[Tool]) -> Optional[Tool]:
     """Get a pre-instantiated tool instance if available.
     
@@ -7,9 +7,13 @@ import json
 import traceback
 from datetime import datetime, timezone
 from typing import Optional, Dict, Any, Tuple
-from core.services import redis
+from core.services import redis, stream_envelope
+from core.services.run_control import run_control
+from core.services.run_admission import run_admission
+from core.services.stream_compaction import StreamCompactor
 from core.run import run_agent
 from core.utils.logger import logger, structlog
+from core.utils import timing
 from core.utils.tool_discovery import warm_up_tools_cache
 import dramatiq
 import uuid
@@ -37,15 +41,51 @@ def get_queue_name(base_name: str) -> str:
         return f"{QUEUE_PREFIX}{base_name}"
     return base_name
 
+class WorkerResourcesMiddleware(dramatiq.Middleware):
+    """Release per-worker async resources (pooled HTTP clients, run control tasks, usage ledger) on shutdown.
+
+    Must run before the AsyncIO middleware stops the event loop.
+    """
+
+    def before_worker_shutdown(self, broker, worker):
+        from dramatiq.asyncio import get_event_loop_thread
+        from core.services.http_client import http_clients
+        from core.billing.credits.usage_ledger import usage_ledger
+        event_loop_thread = get_event_loop_thread()
+        if event_loop_thread is None:
+            return
+        try:
+            event_loop_thread.run_coroutine(run_control.close())
+        except Exception as e:
+            logger.warning(f"Failed to stop run control dispatcher: {e}")
+        try:
+            event_loop_thread.run_coroutine(usage_ledger.close())
+        except Exception as e:
+            logger.warning(f"Failed to drain usage ledger: {e}")
+        try:
+            event_loop_thread.run_coroutine(http_clients.close())
+        except Exception as e:
+            logger.warning(f"Failed to close pooled HTTP clients: {e}")
+
+class TimingMiddleware(dramatiq.Middleware):
+    """Record agent run queue wait and serve this host's timing histograms."""
+
+    def after_process_boot(self, broker):
+        timing.start_metrics_server()
+
+    def before_process_message(self, broker, message):
+        if message.actor_name == "run_agent_background":
+            timing.observe("queue_wait", max(0.0, time.time() - message.message_timestamp / 1000))
+
 if redis_config["url"]:
     auth_info = f" (user={redis_username})" if redis_username else ""
     queue_info = f" (queue prefix: '{QUEUE_PREFIX}')" if QUEUE_PREFIX else ""
     logger.info(f"🔧 Configuring Dramatiq broker with Redis at {redis_host}:{redis_port}{auth_info}{queue_info}")
-    redis_broker = RedisBroker(url=redis_config["url"], middleware=[dramatiq.middleware.AsyncIO()])
+    redis_broker = RedisBroker(url=redis_config["url"], middleware=[WorkerResourcesMiddleware(), TimingMiddleware(), dramatiq.middleware.AsyncIO()])
 else:
     queue_info = f" (queue prefix: '{QUEUE_PREFIX}')" if QUEUE_PREFIX else ""
     logger.info(f"🔧 Configuring Dramatiq broker with Redis at {redis_host}:{redis_port}{queue_info}")
-    redis_broker = RedisBroker(host=redis_host, port=redis_port, middleware=[dramatiq.middleware.AsyncIO()])
+    redis_broker = RedisBroker(host=redis_host, port=redis_port, middleware=[WorkerResourcesMiddleware(), TimingMiddleware(), dramatiq.middleware.AsyncIO()])
 
 dramatiq.set_broker(redis_broker)
 
@@ -299,6 +339,11 @@ async def send_failure_notification(client, thread_id: str, error_message: str):
         logger.warning(f"Failed to send failure notification: {notif_error}")
 
 
+def run_key_owner(agent_run_id: str) -> str:
+    """Key registry owner for Redis keys created on behalf of an agent run."""
+    return f"agent_run:{agent_run_id}"
+
+
 def create_redis_keys(agent_run_id: str, instance_id: str) -> Dict[str, str]:
     return {
         'response_stream': f"agent_run:{agent_run_id}:stream",
@@ -321,80 +366,74 @@ async def process_agent_responses(
     final_status = "running"
     error_message = None
     first_response_logged = False
+    first_assistant_seen = False
     complete_tool_called = False
     total_responses = 0
     redis_streaming_enabled = True
     
     stream_key = redis_keys['response_stream']
-    stream_ttl_set = False  # Track if we've set initial TTL on the stream
-    
-    async for response in agent_gen:
-        if not first_response_logged:
-            first_token_time = (time.time() - worker_start) * 1000
-            logger.info(f"⏱️ [TIMING] 🎯 FIRST RESPONSE from agent: {first_token_time:.1f}ms from job start")
-            first_response_logged = True
-        
-        if stop_signal_checker_state.get('stop_signal_received'):
-            stop_reason = stop_signal_checker_state.get('stop_reason', 'external_stop_signal')
-            logger.warning(f"🛑 Agent run {agent_run_id} stopped by signal. Reason: {stop_reason}. Total responses processed: {total_responses}")
-            final_status = "stopped"
-            error_message = f"Stopped by {stop_reason}"
-            trace.span(name="agent_run_stopped").end(status_message=f"agent_run_stopped: {stop_reason}", level="WARNING")
-            break
-
-        response_json = json.dumps(response)
-        
-        # Write to stream directly - no fire-and-forget, no pubsub
-        if redis_streaming_enabled:
-            try:
-                await redis.stream_add(
-                    stream_key,
-                    {"data": response_json},
-                    maxlen=200,
-                    approximate=True
-                )
-                
-                # Set initial TTL on stream after first entry is added (safety net if cleanup fails)
-                if not stream_ttl_set:
-                    try:
-                        await asyncio.wait_for(redis.expire(stream_key, REDIS_STREAM_TTL_SECONDS), timeout=2.0)
-                        stream_ttl_set = True
-                        logger.debug(f"Set initial TTL ({REDIS_STREAM_TTL_SECONDS}s) on stream {stream_key}")
-                    except (asyncio.TimeoutError, Exception) as e:
-                        logger.debug(f"Failed to set initial TTL on stream (non-critical): {e}")
-            except Exception as e:
-                logger.warning(f"Failed to write to stream for {agent_run_id}: {e}")
-                # Don't disable streaming on single failure - redis-py will retry
-        
-        total_responses += 1
-        stop_signal_checker_state['total_responses'] = total_responses
-
-        # Refresh stream TTL periodically
-        if total_responses % 50 == 0:
-            try:
-                await asyncio.wait_for(redis.expire(stream_key, REDIS_STREAM_TTL_SECONDS), timeout=2.0)
-            except (asyncio.TimeoutError, Exception):
-                pass
-
-        terminating_tool = check_terminating_tool_call(response)
-        if terminating_tool == 'complete':
-            complete_tool_called = True
-            logger.info(f"Complete tool was called in agent run {agent_run_id}")
-        elif terminating_tool == 'ask':
-            logger.debug(f"Ask tool was called in agent run {agent_run_id} (terminating but no notification)")
-
-        if response.get('type') == 'status':
-            status_val = response.get('status')
+    # Entries and TTL refreshes are coalesced into one pipeline per few ms
+    stream_writer = redis.writer(span_name="stream_write")
+    compactor = StreamCompactor(stream_key)
+    try:
+        async for response in agent_gen:
+            if not first_response_logged:
+                first_token_time = (time.time() - worker_start) * 1000
+                logger.info(f"⏱️ [TIMING] 🎯 FIRST RESPONSE from agent: {first_token_time:.1f}ms from job start")
+                timing.observe("first_response", first_token_time / 1000)
+                first_response_logged = True
+            if not first_assistant_seen and response.get('type') == 'assistant':
+                # TTFT: first model output (chunk or message) relative to job start
+                timing.observe("ttft", time.time() - worker_start)
+                first_assistant_seen = True
             
-            if status_val in ['completed', 'failed', 'stopped', 'error']:
-                logger.info(f"Agent run {agent_run_id} finished with status: {status_val}")
-                final_status = status_val if status_val != 'error' else 'failed'
-                if status_val in ['failed', 'stopped', 'error']:
-                    error_message = response.get('message', f"Run ended with status: {status_val}")
-                    logger.error(f"Agent run failed: {error_message}")
+            if stop_signal_checker_state.get('stop_signal_received'):
+                stop_reason = stop_signal_checker_state.get('stop_reason', 'external_stop_signal')
+                logger.warning(f"🛑 Agent run {agent_run_id} stopped by signal. Reason: {stop_reason}. Total responses processed: {total_responses}")
+                final_status = "stopped"
+                error_message = f"Stopped by {stop_reason}"
+                trace.span(name="agent_run_stopped").end(status_message=f"agent_run_stopped: {stop_reason}", level="WARNING")
                 break
+
+            # Write to stream - no pubsub; failures are logged by the writer
+            if redis_streaming_enabled:
+                fields = stream_envelope.encode(response)
+                stream_writer.write("xadd", stream_key, fields, maxlen=stream_envelope.AGENT_RUN_STREAM_MAXLEN, approximate=True)
+                # Set TTL with the first entry (safety net if cleanup fails) and refresh it periodically
+                if total_responses % 50 == 0:
+                    stream_writer.write("expire", stream_key, REDIS_STREAM_TTL_SECONDS)
+                compactor.observe(response, fields['data'])
+                if compactor.should_snapshot():
+                    # The snapshot must land after the entries it replaces
+                    await stream_writer.flush()
+                    await compactor.write_snapshot()
+                elif stream_writer.pending >= MAX_PENDING_REDIS_OPS:
+                    await stream_writer.flush()
+            
+            total_responses += 1
+            stop_signal_checker_state['total_responses'] = total_responses
+
+            terminating_tool = check_terminating_tool_call(response)
+            if terminating_tool == 'complete':
+                complete_tool_called = True
+                logger.info(f"Complete tool was called in agent run {agent_run_id}")
+            elif terminating_tool == 'ask':
+                logger.debug(f"Ask tool was called in agent run {agent_run_id} (terminating but no notification)")
+
+            if response.get('type') == 'status':
+                status_val = response.get('status')
+            
+                if status_val in ['completed', 'failed', 'stopped', 'error']:
+                    logger.info(f"Agent run {agent_run_id} finished with status: {status_val}")
+                    final_status = status_val if status_val != 'error' else 'failed'
+                    if status_val in ['failed', 'stopped', 'error']:
+                        error_message = response.get('message', f"Run ended with status: {status_val}")
+                        logger.error(f"Agent run failed: {error_message}")
+                    break
+    finally:
+        # Flush buffered entries before any status written by the caller
+        await stream_writer.close()
     
-    # All stream writes are synchronous now, so no pending operations to await
     return final_status, error_message, complete_tool_called, total_responses
 
 
@@ -409,13 +448,12 @@ async def handle_normal_completion(
     logger.info(f"Agent run {agent_run_id} completed normally (duration: {duration:.2f}s, responses: {total_responses})")
     completion_message = {"type": "status", "status": "completed", "message": "Worker run completed successfully"}
     trace.span(name="agent_run_completed").end(status_message="agent_run_completed")
-    completion_json = json.dumps(completion_message)
     try:
         await asyncio.wait_for(
             redis.stream_add(
                 redis_keys['response_stream'],
-                {'data': completion_json},
-                maxlen=200,
+                stream_envelope.encode(completion_message),
+                maxlen=stream_envelope.AGENT_RUN_STREAM_MAXLEN,
                 approximate=True
             ),
             timeout=5.0
@@ -468,6 +506,7 @@ async def run_agent_background(
         thread_id=thread_id,
         request_id=request_id,
     )
+    timing.start_run()
     
     logger.info(f"⏱️ [TIMING] Worker received job at {worker_start}")
 
@@ -478,6 +517,7 @@ async def run_agent_background(
         logger.critical(f"Failed to initialize worker resources (Redis/DB): {e}")
         raise e
     timings['initialize'] = (time.time() - t) * 1000
+    timing.observe("worker_init", timings['initialize'] / 1000)
 
     client = None
     try:
@@ -491,6 +531,7 @@ async def run_agent_background(
         
         timings['lock_acquisition'] = (time.time() - worker_start) * 1000 - timings['initialize']
         logger.info(f"⏱️ [TIMING] Worker init: {timings['initialize']:.1f}ms | Lock: {timings['lock_acquisition']:.1f}ms")
+        timing.observe("lock_acquisition", timings['lock_acquisition'] / 1000)
         logger.info(f"Starting background agent run: {agent_run_id} for thread: {thread_id} (Instance: {instance_id})")
         
         from core.ai_models import model_manager
@@ -498,7 +539,6 @@ async def run_agent_background(
         logger.info(f"🚀 Using model: {effective_model}")
         
         start_time = datetime.now(timezone.utc)
-        stop_checker = None
         cancellation_event = asyncio.Event()
 
         redis_keys = create_redis_keys(agent_run_id, instance_id)
@@ -529,41 +569,20 @@ async def run_agent_background(
         return
     stop_signal_checker_state = {'stop_signal_received': False, 'total_responses': 0, 'stop_reason': None}
     
-    async def check_for_stop_signal():
-        """Simple polling-based stop signal checker using Redis key."""
-        while not stop_signal_checker_state.get('stop_signal_received'):
-            try:
-                # Check stop signal key
-                if await redis.check_stop_signal(agent_run_id):
-                    logger.warning(f"🛑 Received STOP signal for agent run {agent_run_id}")
-                    stop_signal_checker_state['stop_signal_received'] = True
-                    stop_signal_checker_state['stop_reason'] = 'stop_signal_key'
-                    cancellation_event.set()
-                    break
-                
-                # Refresh instance_active TTL periodically
-                if stop_signal_checker_state.get('total_responses', 0) % 50 == 0:
-                    try:
-                        await asyncio.wait_for(
-                            redis.expire(redis_keys['instance_active'], redis.REDIS_KEY_TTL),
-                            timeout=3.0
-                        )
-                    except (asyncio.TimeoutError, Exception):
-                        pass
-                
-                await asyncio.sleep(0.5)  # Poll every 500ms
-            except asyncio.CancelledError:
-                logger.debug(f"Stop signal checker cancelled for {agent_run_id}")
-                break
-            except Exception as e:
-                logger.error(f"Error in stop signal checker for {agent_run_id}: {e}", exc_info=True)
-                await asyncio.sleep(1)
-    
-    stop_checker = asyncio.create_task(check_for_stop_signal())
+    def on_stop_signal(reason: str):
+        stop_signal_checker_state['stop_signal_received'] = True
+        stop_signal_checker_state['stop_reason'] = reason
+        cancellation_event.set()
+
+    # Stop events, instance_active TTL and run slot lease refresh are handled per worker, not per run
+    await run_control.register(agent_run_id, on_stop_signal, keepalive_keys=[redis_keys['instance_active']], account_id=account_id)
     try:
         try:
             await asyncio.wait_for(
-                redis.set(redis_keys['instance_active'], "running", ex=redis.REDIS_KEY_TTL),
+                asyncio.gather(
+                    redis.set(redis_keys['instance_active'], "running", ex=redis.REDIS_KEY_TTL),
+                    redis.register_keys(run_key_owner(agent_run_id), [redis_keys['instance_active']]),
+                ),
                 timeout=5.0
             )
         except asyncio.TimeoutError:
@@ -571,7 +590,8 @@ async def run_agent_background(
         except Exception as e:
             logger.warning(f"Redis error setting instance_active key for {agent_run_id}: {e} - continuing without")
 
-        agent_config = await load_agent_config(agent_id, account_id)
+        with timing.span("agent_config"):
+            agent_config = await load_agent_config(agent_id, account_id)
 
         # Set tool output streaming context for tools to publish real-time output
         set_tool_output_streaming_context(
@@ -591,6 +611,7 @@ async def run_agent_background(
         
         total_to_ready = (time.time() - worker_start) * 1000
         logger.info(f"⏱️ [TIMING] 🏁 Worker ready for first LLM call: {total_to_ready:.1f}ms from job start")
+        timing.observe("bootstrap", total_to_ready / 1000)
 
         final_status, error_message, complete_tool_called, total_responses = await process_agent_responses(
             agent_gen, agent_run_id, redis_keys, trace, worker_start, stop_signal_checker_state
@@ -623,12 +644,11 @@ async def run_agent_background(
 
         error_response = {"type": "status", "status": "error", "message": error_message}
         try:
-            error_json = json.dumps(error_response)
             await asyncio.wait_for(
                 redis.stream_add(
                     redis_keys['response_stream'],
-                    {'data': error_json},
-                    maxlen=200,
+                    stream_envelope.encode(error_response),
+                    maxlen=stream_envelope.AGENT_RUN_STREAM_MAXLEN,
                     approximate=True
                 ),
                 timeout=5.0
@@ -644,18 +664,13 @@ async def run_agent_background(
         # Clear tool output streaming context
         clear_tool_output_streaming_context()
         
-        if stop_checker and not stop_checker.done():
-            stop_checker.cancel()
-            try:
-                await stop_checker
-            except asyncio.CancelledError:
-                pass
-            except Exception as e:
-                logger.warning(f"Error during stop_checker cancellation: {e}")
+        run_control.unregister(agent_run_id)
         
         # Comprehensive cleanup of all Redis keys for this agent run
         await cleanup_redis_keys_for_agent_run(agent_run_id, instance_id)
 
+        timing.finish_run()
+
         if final_status == "completed" and account_id:
             try:
                 from core.memory.background_jobs import extract_memories_from_conversation
@@ -693,7 +708,7 @@ async def cleanup_redis_keys_for_agent_run(agent_run_id: str, instance_id: Optio
     - Response stream (deleted immediately)
     - Run lock key
     - Instance active key (if instance_id provided)
-    - Any other instance active keys for this agent run
+    - Any other keys registered for this agent run (e.g. other instances' active keys)
     
     Args:
         agent_run_id: The ID of the agent run to clean up
@@ -701,47 +716,20 @@ async def cleanup_redis_keys_for_agent_run(agent_run_id: str, instance_id: Optio
     """
     logger.debug(f"Cleaning up Redis keys for agent run: {agent_run_id}")
     
-    # List of keys to delete
-    keys_to_delete = []
-    
-    # Response stream - delete immediately
-    stream_key = f"agent_run:{agent_run_id}:stream"
-    keys_to_delete.append(stream_key)
-    
-    # Run lock key
-    run_lock_key = f"agent_run_lock:{agent_run_id}"
-    keys_to_delete.append(run_lock_key)
-    
-    # Instance-specific active key (if instance_id provided)
+    keys_to_delete = [
+        f"agent_run:{agent_run_id}:stream",
+        f"agent_run_lock:{agent_run_id}",
+    ]
     if instance_id:
-        instance_active_key = f"active_run:{instance_id}:{agent_run_id}"
-        keys_to_delete.append(instance_active_key)
-    
-    # Delete all keys
-    for key in keys_to_delete:
-        try:
-            deleted = await redis.delete(key)
-            if deleted:
-                logger.debug(f"Deleted Redis key: {key}")
-        except Exception as e:
-            logger.warning(f"Failed to delete Redis key {key}: {str(e)}")
+        keys_to_delete.append(f"active_run:{instance_id}:{agent_run_id}")
     
-    # Also find and clean up any other instance active keys for this agent run
-    # (in case there are stale keys from other instances)
+    # Registered keys include active_run keys left by other instances that
+    # processed this run, so no keyspace SCAN is needed to find them.
     try:
-        # Use scan_keys instead of keys() to avoid blocking Redis
-        instance_keys = await redis.scan_keys(f"active_run:*:{agent_run_id}")
-        for key in instance_keys:
-            # Decode bytes if needed
-            key_str = key.decode('utf-8') if isinstance(key, bytes) else key
-            if key_str not in keys_to_delete:
-                try:
-                    await redis.delete(key_str)
-                    logger.debug(f"Deleted stale instance active key: {key_str}")
-                except Exception as e:
-                    logger.warning(f"Failed to delete stale instance active key {key_str}: {str(e)}")
+        deleted = await redis.unlink_registered_keys(run_key_owner(agent_run_id), extra_keys=keys_to_delete)
+        logger.debug(f"Unlinked {deleted} Redis keys for agent run {agent_run_id}")
     except Exception as e:
-        logger.warning(f"Failed to find and clean up instance active keys for {agent_run_id}: {str(e)}")
+        logger.warning(f"Failed to clean up Redis keys for {agent_run_id}: {str(e)}")
     
     logger.debug(f"Completed Redis cleanup for agent run: {agent_run_id}")
 
@@ -773,11 +761,8 @@ async def update_agent_run_status(
                         completed_at = verify_result.data[0].get('completed_at')
                     
                     if account_id:
-                        try:
-                            from core.runtime_cache import invalidate_running_runs_cache
-                            await invalidate_running_runs_cache(account_id)
-                        except Exception as cache_error:
-                            logger.warning(f"Failed to invalidate running runs cache: {cache_error}")
+                        # Free the concurrent run slot (see core.services.run_admission)
+                        await run_admission.release(account_id, agent_run_id)
                         
                         # Invalidate account-state cache to refresh concurrent runs limit
                         try:
@@ -0,0 +1,57 @@
+BEGIN;
+
+-- Resolve a thread access decision in a single round-trip.
+-- Replaces the sequential thread / project / user_roles / account_user
+-- lookups previously done by verify_and_authorize_thread_access.
+CREATE OR REPLACE FUNCTION authorize_thread_access(p_thread_id UUID, p_user_id UUID DEFAULT NULL)
+RETURNS JSONB
+SECURITY DEFINER
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    v_account_id UUID;
+    v_project_id UUID;
+    v_is_public BOOLEAN := FALSE;
+    v_is_admin BOOLEAN := FALSE;
+    v_is_member BOOLEAN := FALSE;
+BEGIN
+    SELECT t.account_id, t.project_id, COALESCE(p.is_public, FALSE)
+    INTO v_account_id, v_project_id, v_is_public
+    FROM threads t
+    LEFT JOIN projects p ON p.project_id = t.project_id
+    WHERE t.thread_id = p_thread_id;
+
+    IF NOT FOUND THEN
+        RETURN jsonb_build_object('found', FALSE);
+    END IF;
+
+    IF p_user_id IS NOT NULL THEN
+        SELECT EXISTS (
+            SELECT 1 FROM user_roles
+            WHERE user_id = p_user_id AND role IN ('admin', 'super_admin')
+        ) INTO v_is_admin;
+
+        IF v_account_id IS NOT NULL THEN
+            SELECT v_account_id = p_user_id OR EXISTS (
+                SELECT 1 FROM basejump.account_user
+                WHERE user_id = p_user_id AND account_id = v_account_id
+            ) INTO v_is_member;
+        END IF;
+    END IF;
+
+    RETURN jsonb_build_object(
+        'found', TRUE,
+        'account_id', v_account_id,
+        'project_id', v_project_id,
+        'is_public', v_is_public,
+        'is_admin', v_is_admin,
+        'is_member', v_is_member
+    );
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION authorize_thread_access(UUID, UUID) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION authorize_thread_access(UUID, UUID) TO service_role;
+
+COMMIT;
@@ -0,0 +1,139 @@
+BEGIN;
+
+-- One row per billed LLM response. The primary key makes usage deduction
+-- idempotent on message_id, so a usage event redelivered from the Redis
+-- stream (worker crash before XACK) is never charged twice.
+CREATE TABLE IF NOT EXISTS public.credit_usage_events (
+    message_id TEXT PRIMARY KEY,
+    account_id UUID NOT NULL,
+    thread_id TEXT,
+    model TEXT,
+    amount NUMERIC(18, 8) NOT NULL,
+    transaction_id UUID,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_credit_usage_events_account_created
+    ON public.credit_usage_events (account_id, created_at DESC);
+
+ALTER TABLE public.credit_usage_events ENABLE ROW LEVEL SECURITY;
+
+-- Apply a batch of usage events in one round-trip.
+-- p_events: [{"message_id", "account_id", "amount", "thread_id", "model"}, ...]
+-- Events whose message_id was already recorded are skipped. The remaining
+-- amounts are summed per (account, thread, model) and charged with one
+-- atomic_use_credits call per group, so credit_ledger rows keep their
+-- thread_id and "{model} usage" description; the group's message_ids and
+-- model are added to the ledger row's metadata.
+-- A group whose deduction fails has its credit_usage_events rows removed
+-- again, so redelivering those events retries the charge. Every result
+-- carries the group's message_ids.
+CREATE OR REPLACE FUNCTION atomic_use_credits_batch(p_events JSONB)
+RETURNS JSONB
+SECURITY DEFINER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_group RECORD;
+    v_result JSONB;
+    v_ledger_id UUID;
+    v_results JSONB := '[]'::JSONB;
+BEGIN
+    CREATE TEMP TABLE IF NOT EXISTS _new_usage_events (
+        message_id TEXT,
+        account_id UUID,
+        thread_id TEXT,
+        model TEXT,
+        amount NUMERIC(18, 8)
+    ) ON COMMIT DROP;
+    TRUNCATE _new_usage_events;
+
+    WITH inserted AS (
+        INSERT INTO public.credit_usage_events (message_id, account_id, thread_id, model, amount)
+        SELECT DISTINCT ON (e->>'message_id')
+            e->>'message_id',
+            (e->>'account_id')::UUID,
+            e->>'thread_id',
+            e->>'model',
+            (e->>'amount')::NUMERIC
+        FROM jsonb_array_elements(p_events) AS e
+        WHERE e->>'message_id' IS NOT NULL
+        ON CONFLICT (message_id) DO NOTHING
+        RETURNING message_id, account_id, thread_id, model, amount
+    )
+    INSERT INTO _new_usage_events SELECT message_id, account_id, thread_id, model, amount FROM inserted;
+
+    FOR v_group IN
+        SELECT
+            account_id,
+            thread_id,
+            model,
+            SUM(amount) AS total,
+            COUNT(*) AS event_count,
+            jsonb_agg(message_id ORDER BY message_id) AS message_ids
+        FROM _new_usage_events
+        GROUP BY account_id, thread_id, model
+    LOOP
+        IF v_group.total <= 0 THEN
+            CONTINUE;
+        END IF;
+
+        v_result := atomic_use_credits(
+            v_group.account_id,
+            v_group.total,
+            CASE
+                WHEN v_group.event_count = 1 THEN format('%s usage', COALESCE(v_group.model, 'LLM'))
+                ELSE format('%s usage (%s responses)', COALESCE(v_group.model, 'LLM'), v_group.event_count)
+            END,
+            v_group.thread_id,
+            CASE WHEN v_group.event_count = 1 THEN v_group.message_ids->>0 ELSE NULL END
+        );
+
+        IF (v_result->>'success')::BOOLEAN THEN
+            v_ledger_id := (v_result->>'transaction_id')::UUID;
+
+            UPDATE public.credit_ledger
+            SET metadata = COALESCE(metadata, '{}'::JSONB) || jsonb_build_object(
+                'message_ids', v_group.message_ids,
+                'model', v_group.model
+            )
+            WHERE id = v_ledger_id;
+
+            UPDATE public.credit_usage_events u
+            SET transaction_id = v_ledger_id
+            FROM _new_usage_events n
+            WHERE u.message_id = n.message_id
+              AND n.account_id = v_group.account_id
+              AND n.thread_id IS NOT DISTINCT FROM v_group.thread_id
+              AND n.model IS NOT DISTINCT FROM v_group.model;
+        ELSE
+            DELETE FROM public.credit_usage_events u
+            USING _new_usage_events n
+            WHERE u.message_id = n.message_id
+              AND n.account_id = v_group.account_id
+              AND n.thread_id IS NOT DISTINCT FROM v_group.thread_id
+              AND n.model IS NOT DISTINCT FROM v_group.model;
+        END IF;
+
+        v_results := v_results || jsonb_build_array(
+            v_result || jsonb_build_object(
+                'account_id', v_group.account_id,
+                'thread_id', v_group.thread_id,
+                'model', v_group.model,
+                'event_count', v_group.event_count,
+                'amount', v_group.total,
+                'message_ids', v_group.message_ids,
+                'transaction_id', v_ledger_id
+            )
+        );
+        v_ledger_id := NULL;
+    END LOOP;
+
+    RETURN v_results;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION atomic_use_credits_batch(JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION atomic_use_credits_batch(JSONB) TO service_role;
+
+COMMIT;
@@ -0,0 +1,59 @@
+BEGIN;
+
+-- Private bucket for large tool results stored out of line (core/services/blob_store.py).
+-- Objects are content-addressed: sha256/<2 hex>/<hash>, referenced from
+-- messages.metadata->'blob_ref'->>'sha256'. Only the service role reads or writes it.
+INSERT INTO storage.buckets (id, name, public)
+VALUES ('blobs', 'blobs', false)
+ON CONFLICT (id) DO NOTHING;
+
+CREATE INDEX IF NOT EXISTS idx_messages_blob_ref_sha256
+    ON messages ((metadata->'blob_ref'->>'sha256'))
+    WHERE metadata ? 'blob_ref';
+
+-- Blobs are shared by content, so they are not deleted with a message, thread,
+-- project or account. Once no message references a blob any more it is removed
+-- here. The grace period covers blobs uploaded for a message not yet inserted;
+-- it runs from updated_at, since re-uploading an existing blob only upserts it.
+CREATE OR REPLACE FUNCTION cleanup_unreferenced_blobs(
+    p_grace INTERVAL DEFAULT INTERVAL '1 day',
+    p_limit INTEGER DEFAULT 5000
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    v_deleted INTEGER;
+BEGIN
+    WITH unreferenced AS (
+        SELECT o.id
+        FROM storage.objects o
+        WHERE o.bucket_id = 'blobs'
+          AND o.updated_at < NOW() - p_grace
+          AND NOT EXISTS (
+              SELECT 1 FROM public.messages m
+              WHERE m.metadata ? 'blob_ref'
+                AND m.metadata->'blob_ref'->>'sha256' = (storage.filename(o.name))
+          )
+        LIMIT p_limit
+    )
+    DELETE FROM storage.objects o
+    USING unreferenced u
+    WHERE o.id = u.id;
+
+    GET DIAGNOSTICS v_deleted = ROW_COUNT;
+    RETURN v_deleted;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION cleanup_unreferenced_blobs(INTERVAL, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION cleanup_unreferenced_blobs(INTERVAL, INTEGER) TO service_role;
+
+SELECT cron.schedule(
+    'cleanup-unreferenced-blobs',
+    '30 * * * *',
+    $$SELECT cleanup_unreferenced_blobs()$$
+);
+
+COMMIT;